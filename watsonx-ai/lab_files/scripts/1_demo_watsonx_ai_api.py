@@ -26,8 +26,13 @@ from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMet
 from ibm_watsonx_ai import APIClient
 
 # For invocation of LLM with REST API
-import requests, json
-from ibm_cloud_sdk_core import IAMTokenManager
+import json
+# Access tokens are cached and refreshed in the background by a process-wide token manager
+import iam_token
+# Connections to watsonx.ai are kept alive and reused by a process-wide HTTP transport
+import http_transport
+# REST invocations for a local stand-in of watsonx.ai (watsonx_stub_server.py)
+import rest_model
 
 # These global variables will be updated in get_credentials() functions
 watsonx_project_id = ""
@@ -54,7 +59,10 @@ def get_model(model_type,max_tokens,min_tokens,decoding,temperature,stop_sequenc
         GenParams.STOP_SEQUENCES:stop_sequences
     }
 
-    model = Model(
+    # The SDK only connects to IBM Cloud, a local stand-in is called with the REST API
+    model_class = rest_model.RESTModel if rest_model.is_local_url(url) else Model
+
+    model = model_class(
         model_id=model_type,
         params=generate_params,
         credentials={
@@ -151,15 +159,19 @@ def answer_questions():
 
 def invoke_template(question, space_id,deployment_id):
 
-    credentials = {
-        "url": url,
-        "apikey": api_key
-    }
+    if rest_model.is_local_url(url):
+        generated_response = rest_model.generate_deployment_text(url, api_key, space_id, deployment_id,
+                                                                 {"question": question})
+    else:
+        credentials = {
+            "url": url,
+            "apikey": api_key
+        }
 
-    client = APIClient(credentials)
-    client.set.default_space(space_id)
+        client = APIClient(credentials)
+        client.set.default_space(space_id)
 
-    generated_response = client.deployments.generate_text(deployment_id, params={"prompt_variables": {"question":question}})
+        generated_response = client.deployments.generate_text(deployment_id, params={"prompt_variables": {"question":question}})
 
     print("--------------------------Invocation of a prompt template -------------------------------------------")
     print("Question: " + question)
@@ -199,7 +211,8 @@ def invoke_with_REST():
         "project_id": watsonx_project_id
     }
 
-    response = requests.post(rest_url, headers=headers, data=json.dumps(data))
+    # The shared transport reuses an open connection instead of opening a new TCP/TLS connection for every call
+    response = http_transport.get_transport().post(rest_url, headers=headers, data=json.dumps(data))
     generated_response = response.json()['results'][0]['generated_text']
 
     print("--------------------------Invocation with REST-------------------------------------------")
@@ -210,7 +223,10 @@ def invoke_with_REST():
 def get_auth_token():
 
     # Access token is required for REST invocation of the LLM
-    access_token = IAMTokenManager(apikey=api_key,url="https://iam.cloud.ibm.com/identity/token").get_token()
+    # The token manager is shared by the process, so only the first call (and the refresh before the token
+    # expires) sends a request to IAM
+    # For a local stand-in of watsonx.ai (watsonx_stub_server.py), the token comes from the stand-in
+    access_token = iam_token.get_token_manager(api_key, iam_token.get_iam_url(url)).get_token()
     return access_token
 
 def demo_LLM_invocation():
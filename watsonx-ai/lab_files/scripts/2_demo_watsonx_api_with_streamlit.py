@@ -29,10 +29,16 @@ from dotenv import load_dotenv
 import streamlit as st
 
 # watsonx.ai python SDK
-from ibm_watsonx_ai.foundation_models import Model
 from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
 from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMethods
 
+# Cache of watsonx.ai Model objects
+import model_cache
+# Time to first token and total time of streamed responses
+import streaming
+# Answers are reused for questions similar to previous questions
+import semantic_cache
+
 DISPLAY_MODEL_LLAMA2 = "llama2"
 DISPLAY_MODEL_GRANITE= "granite"
 DISPLAY_MODEL_FLAN = "flan"
@@ -72,15 +78,11 @@ def get_model(model_type,max_tokens,min_tokens,decoding,stop_sequences):
         GenParams.STOP_SEQUENCES:stop_sequences
     }
 
-    model = Model(
-        model_id=model_type,
-        params=generate_params,
-        credentials={
-            "apikey": api_key,
-            "url": url
-        },
-        project_id=watsonx_project_id
-        )
+    # Model objects are cached and reused by requests with the same settings, so only the first
+    # request pays for authentication and validation of the model
+    model = model_cache.get_model(model_type, generate_params,
+                                  {"apikey": api_key, "url": url},
+                                  watsonx_project_id)
 
     return model
 
@@ -168,17 +170,42 @@ def answer_questions(user_question, selected_model):
     decoding = DecodingMethods.GREEDY
     stop_sequences = ['.', '\n']
 
-    # Get the model
-    model = get_model(model_type, max_tokens, min_tokens, decoding,stop_sequences)
+    def generate():
+        # Get the model
+        model = get_model(model_type, max_tokens, min_tokens, decoding,stop_sequences)
+
+        # Generate response
+        generated_response = model.generate(prompt=final_prompt)
+        return generated_response['results'][0]['generated_text']
 
-    # Generate response
-    generated_response = model.generate(prompt=final_prompt)
-    model_output = generated_response['results'][0]['generated_text']
+    # A question similar to a previous question of the same model gets the cached answer
+    model_output = semantic_cache.get_cache().get_answer(selected_model, user_question, generate)
     # For debugging
     print("Answer: " + model_output)
 
     return model_output
 
+def answer_questions_stream(user_question, selected_model):
+
+    # Same as answer_questions(), but returns the answer as a stream of text chunks.
+    # The UI can render the chunks as they're generated instead of waiting for the whole answer
+    final_prompt = get_prompt(user_question, selected_model)
+
+    print("***final prompt***")
+    print(final_prompt)
+    print("***end of final prompt***")
+
+    model_type = selected_model
+    max_tokens = 300
+    min_tokens = 50
+    decoding = DecodingMethods.GREEDY
+    stop_sequences = ['.', '\n']
+
+    model = get_model(model_type, max_tokens, min_tokens, decoding,stop_sequences)
+
+    # The generation request is sent when the stream is first read
+    return model.generate_text_stream(prompt=final_prompt)
+
 
 def main():
 
@@ -216,13 +243,31 @@ def main():
     answer_question_clicked = st.button("Answer")
 
     if answer_question_clicked:
-        model_output = answer_questions(user_question,llm)
-
-        # Display output on the Web page
-        formatted_output = f"""
-                **Answer to your question:** {model_output}
-                """
-        st.markdown(formatted_output, unsafe_allow_html=True)
+        st.markdown("**Answer to your question:**")
+
+        # Look for the answer of a similar question first. Answers are cached separately for each model
+        cache = semantic_cache.get_cache()
+        cached_answer, embedding = cache.lookup(llm, user_question)
+
+        if cached_answer is not None:
+            model_output = cached_answer
+            st.write(model_output)
+            st.caption("Answer of a similar question")
+        else:
+            # Display output on the Web page as it's generated
+            timings = {}
+            model_output = st.write_stream(streaming.timed_stream(answer_questions_stream(user_question, llm),
+                                                                  timings))
+            # Perceived latency is the time to the first token
+            st.caption(streaming.format_timings(timings))
+            cache.add(llm, user_question, model_output, timings["total_time"], embedding)
+
+        # For debugging
+        print("Answer: " + model_output)
+
+    cache_stats = semantic_cache.get_cache().get_stats()
+    st.sidebar.caption(f"Semantic cache hit rate: {cache_stats['hit_rate']:.0%}, "
+                       f"generation time saved: {cache_stats['latency_saved']:.1f} s")
 
 
 if __name__ == "__main__":
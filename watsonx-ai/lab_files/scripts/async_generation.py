@@ -0,0 +1,158 @@
+"""
+This code sample shows how to invoke LLMs in watsonx.ai from asyncio code.
+
+The Model class of the watsonx.ai SDK is blocking: a thread waits for every generation. The
+AsyncGenerationClient calls the watsonx.ai text generation REST API with a pooled httpx.AsyncClient,
+so one event loop can have hundreds of generations in flight. A semaphore limits the number of
+concurrent requests.
+
+generate() and generate_text() send the requests of the client through the same response cache, rate
+limiter, deadline and retry policy as the Model objects of the sync entry points, so a response generated by
+either path is reused by the other, and threads and coroutines share the quotas of the project.
+The use_case_* modules have async versions of their entry points (for example,
+use_case_summary.get_summary_async) that call them.
+
+# Install httpx in your Python env prior to running this example:
+# pip install httpx
+"""
+
+import asyncio
+import weakref
+
+import httpx
+
+# Access tokens are shared by the process and refreshed in the background
+import iam_token
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+# Client-side scheduling within the rate limits of watsonx.ai
+import rate_limiter
+# Deadline, retries and hedging of the requests
+import resilience
+
+GENERATION_PATH = "/ml/v1/text/generation?version=2023-05-29"
+
+DEFAULT_MAX_CONCURRENCY = 100
+DEFAULT_TIMEOUT = 120
+
+# Clients shared by all callers on the same event loop, keyed by the credentials.
+# An httpx.AsyncClient can only be used on the event loop it was created on
+clients = weakref.WeakKeyDictionary()
+
+
+class AsyncGenerationClient:
+
+    def __init__(self, url, api_key, project_id, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 timeout=DEFAULT_TIMEOUT, iam_url=None):
+
+        if not url:
+            raise ValueError("The watsonx.ai url is not set - set url in the .env file or pass it to the client")
+
+        self.url = url.rstrip("/")
+        self.project_id = project_id
+        # IBM Cloud IAM, or the token endpoint of a local stand-in of watsonx.ai
+        self.token_manager = iam_token.get_token_manager(api_key, iam_url or iam_token.get_iam_url(url))
+
+        # Connections are kept alive and reused by all requests, up to max_concurrency connections
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        self.http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate(self, model_id, prompt, params):
+
+        # Returns the response of the REST API - the same dictionary that Model.generate() returns
+        data = {
+            "model_id": get_value(model_id),
+            "input": prompt,
+            "parameters": {name: get_value(value) for name, value in params.items()},
+            "project_id": self.project_id
+        }
+
+        async with self.semaphore:
+            access_token = await self.token_manager.get_token_async()
+            try:
+                response = await self.http_client.post(
+                    self.url + GENERATION_PATH,
+                    headers={"Content-Type": "application/json", "Accept": "application/json",
+                             "Authorization": "Bearer " + access_token},
+                    json=data)
+            # httpx errors don't derive from the built-in ones that resilience.is_retryable() retries
+            except httpx.TimeoutException as e:
+                raise TimeoutError(str(e)) from e
+            except httpx.TransportError as e:
+                raise ConnectionError(str(e)) from e
+            response.raise_for_status()
+
+        return response.json()
+
+    async def generate_text(self, model_id, prompt, params):
+
+        generated_response = await self.generate(model_id, prompt, params)
+
+        return generated_response['results'][0]['generated_text']
+
+    async def close(self):
+
+        await self.http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def get_value(value):
+
+    # The SDK enums (ModelTypes, DecodingMethods) are sent to the REST API as their string values
+    return getattr(value, "value", value)
+
+def get_client(url, api_key, project_id, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+
+    # Returns the client shared by all coroutines of the running event loop for these credentials
+    loop_clients = clients.setdefault(asyncio.get_running_loop(), {})
+    key = (url, api_key, project_id)
+    if key not in loop_clients:
+        loop_clients[key] = AsyncGenerationClient(url, api_key, project_id, max_concurrency)
+
+    return loop_clients[key]
+
+async def generate(url, api_key, project_id, model_id, prompt, params):
+
+    # Async version of response_cache.generate() for a RateLimitedModel: returns the response of the REST API,
+    # from the cache if the same model, parameters and prompt were generated before in this project.
+    # Like the generations of the sync path, every request waits for the rate limiter, then has a deadline
+    # and retries of transient failures (see resilience.ResilientModel)
+    client = get_client(url, api_key, project_id)
+    model_id = get_value(model_id)
+    controller = rate_limiter.get_controller()
+    request = lambda: controller.call_async(project_id, model_id, lambda: resilience.call_async(
+        lambda: client.generate(model_id, prompt, params), name="generate:" + model_id,
+        hedge=resilience.HEDGE_GENERATIONS))
+
+    cache = response_cache.get_cache()
+    if not response_cache.is_cacheable(params):
+        cache.bypass()
+        return await request()
+
+    # The cache is stored in SQLite, so lookups run in a worker thread instead of blocking the event loop
+    key = response_cache.get_key(model_id, params, prompt, client.url, project_id)
+    response = await asyncio.to_thread(cache.get, key)
+    if response is None:
+        response = await request()
+        await asyncio.to_thread(cache.put, key, response)
+
+    return response
+
+async def generate_text(url, api_key, project_id, model_id, prompt, params):
+
+    generated_response = await generate(url, api_key, project_id, model_id, prompt, params)
+
+    return generated_response['results'][0]['generated_text']
+
+async def close_clients():
+
+    # Call before the event loop is closed to close the connections of the shared clients
+    loop_clients = clients.pop(asyncio.get_running_loop(), {})
+    for client in loop_clients.values():
+        await client.close()
@@ -0,0 +1,77 @@
+"""
+This code sample shows how to run several generations with watsonx.ai at the same time.
+
+A generation mostly waits for the remote model, so running the prompts of a batch in a bounded thread pool
+brings the wall time of the batch close to the time of the slowest generation instead of the sum of all
+generations. Results are returned in the order of the prompts, and a failed generation is reported
+in its own result instead of failing the whole batch.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+# Client-side scheduling within the rate limits of watsonx.ai
+import rate_limiter
+
+# Upper bound of the thread pool. The rate limiter adapts the number of requests in flight to the quota
+DEFAULT_MAX_CONCURRENCY = 8
+
+def generate_one(model, item):
+
+    # An item is a prompt, or a (prompt, params) pair - params override the parameters of the model
+    prompt, params = item if isinstance(item, tuple) else (item, None)
+
+    result = {"prompt": prompt, "response": None, "generated_text": None, "error": None}
+    start = time.perf_counter()
+    try:
+        result["response"] = response_cache.generate(model, prompt, params)
+        result["generated_text"] = result["response"]['results'][0]['generated_text']
+    except Exception as e:
+        result["error"] = str(e)
+    result["latency"] = time.perf_counter() - start
+
+    return result
+
+def generate_batch(model, items, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+
+    # Returns a dictionary with the results (one per item, in the same order as the items) and the
+    # aggregate statistics of the batch
+    start = time.perf_counter()
+
+    # Throttled (HTTP 429) requests are retried and slow down the other requests of the batch
+    model = rate_limiter.RateLimitedModel(model)
+
+    if items:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as executor:
+            # map() returns the results in the same order as the items
+            results = list(executor.map(lambda item: generate_one(model, item), items))
+    else:
+        results = []
+
+    wall_time = time.perf_counter() - start
+    total_latency = sum(result["latency"] for result in results)
+    errors = sum(1 for result in results if result["error"] is not None)
+
+    batch = {
+        "results": results,
+        "wall_time": wall_time,
+        # Time the batch would have taken with one generation at a time
+        "total_latency": total_latency,
+        "throughput": len(results) / wall_time if wall_time else 0.0,
+        "errors": errors
+    }
+
+    print(f"Generated {len(results)} prompts in {wall_time:.2f} s ({batch['throughput']:.2f} prompts/s, "
+          f"{total_latency:.2f} s one at a time), errors: {errors}")
+
+    return batch
+
+def get_text(result):
+
+    # Generated text of a result, or the error message if the generation failed
+    if result["error"] is not None:
+        return "Generation failed: " + result["error"]
+
+    return result["generated_text"]
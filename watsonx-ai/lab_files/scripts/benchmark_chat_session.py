@@ -0,0 +1,75 @@
+"""
+This code sample measures the cost of a chat turn with the ConversationMemory of chat_session.
+
+A long session of TURNS messages (random lengths) is added to the history, and the prompt with the history
+is read after every message, like the AI Assistant does. For several token budgets, it compares:
+- a list that is trimmed to the budget by recounting the tokens of all messages, list.pop(0) and
+  ' '.join() on every turn (a token budget added to the original implementation)
+- the ConversationMemory: tokens are counted once per message, messages are dropped from a deque
+  and the prompt is updated as messages are added and dropped
+Both use the approximate token count, so that the results don't depend on the tokenizer download.
+
+Run from the scripts directory:
+# python benchmark_chat_session.py
+"""
+
+import random
+import re
+import time
+
+import chat_session
+
+TURNS = 5000
+TOKEN_BUDGETS = (512, 2048, 8192, 32768)
+WORDS = ("the", "customer", "asked", "about", "interest", "rates", "and", "the", "assistant", "explained",
+         "how", "to", "write", "a", "Python", "function", "that", "parses", "dates", "correctly")
+
+
+def approximate_tokens(text):
+
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+def get_session():
+
+    random.seed(1)
+    return [" ".join(random.choice(WORDS) for _ in range(random.randint(5, 120))) for _ in range(TURNS)]
+
+def run_list(session, token_budget):
+
+    messages = []
+    start = time.perf_counter()
+    for message in session:
+        messages.append(message)
+        while sum(approximate_tokens(text) for text in messages) > token_budget and len(messages) > 1:
+            messages.pop(0)
+        prompt = " ".join(messages)
+    total_time = time.perf_counter() - start
+
+    return total_time, len(prompt)
+
+def run_memory(session, token_budget):
+
+    memory = chat_session.ConversationMemory(token_budget, count_tokens=approximate_tokens)
+    start = time.perf_counter()
+    for message in session:
+        memory.add_message(message)
+        prompt = memory.convert_to_prompt()
+    total_time = time.perf_counter() - start
+
+    return total_time, len(prompt)
+
+def main():
+
+    session = get_session()
+    print(f"{TURNS} messages of 5 to 120 words")
+
+    for token_budget in TOKEN_BUDGETS:
+        list_time, list_size = run_list(session, token_budget)
+        memory_time, memory_size = run_memory(session, token_budget)
+        assert list_size == memory_size
+        print(f"Budget {token_budget:6d} tokens   list: {list_time / TURNS * 1e6:9.1f} µs/turn   "
+              f"ConversationMemory: {memory_time / TURNS * 1e6:7.1f} µs/turn   "
+              f"speedup: {list_time / memory_time:6.1f}x   prompt: {memory_size} characters")
+
+if __name__ == "__main__":
+    main()
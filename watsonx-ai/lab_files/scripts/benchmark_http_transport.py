@@ -0,0 +1,114 @@
+"""
+This code sample compares bare requests.post() calls with the shared HTTPTransport under concurrent load.
+
+A local stub server stands in for the watsonx.ai text generation endpoint. On localhost, opening a
+connection is almost free, so the stub waits CONNECT_LATENCY seconds on every new connection to emulate
+the TCP and TLS handshakes with a remote server, and RESPONSE_LATENCY seconds for every request.
+CALLERS threads send REQUESTS_PER_CALLER requests each, first with requests.post(), then with the transport.
+
+Run from the scripts directory:
+# python benchmark_http_transport.py
+"""
+
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import http_transport
+
+CALLERS = 64
+REQUESTS_PER_CALLER = 20
+CONNECT_LATENCY = 0.05
+RESPONSE_LATENCY = 0.01
+
+
+class StubGenerationHandler(BaseHTTPRequestHandler):
+
+    # HTTP/1.1 keeps the connection open between requests
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        # Called once per connection - emulates the cost of opening a connection to a remote server
+        time.sleep(CONNECT_LATENCY)
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(RESPONSE_LATENCY)
+        body = json.dumps({"results": [{"generated_text": "Paris is the capital of France."}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    # Enough room for all callers connecting at the same time
+    request_queue_size = 256
+
+
+def run_load(post):
+
+    # Returns the latency of every request and the total time
+    data = {"model_id": "google/flan-ul2", "input": "Write a paragraph about the capital of France."}
+
+    def caller():
+        latencies = []
+        for _ in range(REQUESTS_PER_CALLER):
+            start = time.perf_counter()
+            response = post(data)
+            response.json()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CALLERS) as executor:
+        results = list(executor.map(lambda _: caller(), range(CALLERS)))
+    total_time = time.perf_counter() - start
+
+    return sorted(latency for latencies in results for latency in latencies), total_time
+
+def print_results(label, latencies, total_time):
+
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{label:<36} median: {statistics.median(latencies) * 1000:8.1f} ms   p95: {p95 * 1000:8.1f} ms   "
+          f"throughput: {len(latencies) / total_time:8.1f} requests/s")
+
+def main():
+
+    server = StubServer(("127.0.0.1", 0), StubGenerationHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/ml/v1/text/generation?version=2023-05-29"
+    headers = {"Content-Type": "application/json", "Accept": "application/json"}
+
+    print(f"{CALLERS} concurrent callers, {REQUESTS_PER_CALLER} requests each")
+
+    # New connection for every call (the connection is closed when the response is read)
+    latencies, total_time = run_load(lambda data: requests.post(url, headers=headers, data=json.dumps(data)))
+    print_results("requests.post (new connection)", latencies, total_time)
+
+    # Pooled connections, reused by all callers
+    transport = http_transport.HTTPTransport(pool_size=CALLERS)
+    latencies, total_time = run_load(lambda data: transport.post(url, headers=headers, data=json.dumps(data)))
+    print_results("HTTPTransport (pooled connections)", latencies, total_time)
+
+    for host, host_metrics in transport.get_metrics().items():
+        print(f"{host}: {host_metrics['requests']} requests, {host_metrics['new_connections']} new connections, "
+              f"connection reuse: {host_metrics['connection_reuse']:.1%}, errors: {host_metrics['errors']}")
+
+    transport.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+This code sample runs the entry points of the scripts under load against the local stand-in of watsonx.ai.
+
+It starts watsonx_stub_server.py in this process (or uses a running stand-in with --url) and sends
+--requests invocations from --concurrency callers through:
+- use_case_summary.get_summary (Model cache, resilience layer, REST API of the stand-in)
+- use_case_summary.get_summary_async (AsyncGenerationClient, rate limiter)
+- watsonx_engine.invoke_prompt_template (prompt template deployment)
+- watsonx_engine.invoke_prompt_template_stream (streamed deployment, time to first token)
+It prints the throughput and latency percentiles of every entry point and the statistics of the stand-in.
+The settings of the stand-in (latency, token rate, errors, throttling) can be passed as well.
+
+Run from the scripts directory:
+# pip install fastapi uvicorn
+# python benchmark_load.py --requests 200 --concurrency 32 --error-rate 0.02 --throttle-rate 0.02
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import async_generation
+import http_transport
+import iam_token
+import rate_limiter
+import streaming
+import use_case_summary
+import watsonx_engine
+import watsonx_stub_server
+
+API_KEY = "stub-api-key"
+PROJECT_ID = "stub-project"
+SPACE_ID = "stub-space"
+DEPLOYMENT_ID = "stub-deployment"
+MODEL_ID = "meta-llama/llama-2-70b-chat"
+REVIEW = ("I applied for a mortgage online and the process was quick, but the interest rate was higher "
+          "than advertised and nobody answered my questions about it.")
+
+
+def print_results(label, latencies, failures, total_time):
+
+    latencies = sorted(latencies)
+
+    def percentile(value):
+        return latencies[min(len(latencies) - 1, int(value * len(latencies)))] * 1000 if latencies else 0.0
+
+    median = statistics.median(latencies) * 1000 if latencies else 0.0
+    print(f"{label:<32} throughput: {len(latencies) / total_time:6.1f} requests/s   p50: {median:7.1f} ms   "
+          f"p95: {percentile(0.95):7.1f} ms   p99: {percentile(0.99):7.1f} ms   failures: {failures}")
+
+def run(label, function, requests_count, concurrency):
+
+    def timed_call(index):
+        start = time.perf_counter()
+        try:
+            function(index)
+            return time.perf_counter() - start, False
+        except Exception as e:
+            print(f"{label} failed: {str(e)}")
+            return time.perf_counter() - start, True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_call, range(requests_count)))
+    total_time = time.perf_counter() - start
+
+    print_results(label, [latency for latency, failed in results if not failed],
+                  sum(1 for latency, failed in results if failed), total_time)
+
+def run_async(label, requests_count, concurrency):
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed_call(index):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await use_case_summary.get_summary_async(API_KEY, PROJECT_ID, f"{REVIEW} ({index})",
+                                                             use_case_summary.REVIEW_TYPE_DEFAULT, MODEL_ID)
+                    return time.perf_counter() - start, False
+                except Exception as e:
+                    print(f"{label} failed: {str(e)}")
+                    return time.perf_counter() - start, True
+
+        try:
+            return await asyncio.gather(*[timed_call(index) for index in range(requests_count)])
+        finally:
+            await async_generation.close_clients()
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    total_time = time.perf_counter() - start
+
+    print_results(label, [latency for latency, failed in results if not failed],
+                  sum(1 for latency, failed in results if failed), total_time)
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Load test of the scripts against the local stand-in of watsonx.ai")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="Address of a running stand-in (by default, one is started in this process)")
+    watsonx_stub_server.add_config_arguments(parser)
+    arguments = parser.parse_args()
+
+    server = None
+    url = arguments.url
+    if url is None:
+        for name in watsonx_stub_server.config:
+            watsonx_stub_server.config[name] = getattr(arguments, name)
+        server = watsonx_stub_server.start_server(arguments.port)
+        url = f"http://127.0.0.1:{arguments.port}"
+
+    # The scripts read the url from the environment (.env values don't override it). Local urls are only
+    # called with the REST API when the stand-in is enabled
+    os.environ["url"] = url
+    os.environ[iam_token.STAND_IN_SETTING] = "true"
+    # The async requests go through the rate limiter. It starts with a window of --concurrency requests and no
+    # request rate limit, so only the settings of the stand-in slow them down
+    rate_limiter.PROJECT_RATES[PROJECT_ID] = 1000
+    rate_limiter.shared_controller = rate_limiter.ConcurrencyController(initial_window=arguments.concurrency)
+    print(f"{arguments.requests} requests from {arguments.concurrency} callers against {url}")
+
+    # Every review is different, so the response cache doesn't answer the requests. The scripts print
+    # every prompt and response - the output is discarded
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        run("get_summary", lambda index: use_case_summary.get_summary(
+            API_KEY, PROJECT_ID, f"{REVIEW} ({index})", use_case_summary.REVIEW_TYPE_DEFAULT, MODEL_ID),
+            arguments.requests, arguments.concurrency)
+        run_async("get_summary_async", arguments.requests, arguments.concurrency)
+        run("invoke_prompt_template", lambda index: watsonx_engine.invoke_prompt_template(
+            url, API_KEY, SPACE_ID, DEPLOYMENT_ID, f"Summarize review {index}"),
+            arguments.requests, arguments.concurrency)
+
+        stream_timings = []
+        def invoke_stream(index):
+            timings = {}
+            chunks = watsonx_engine.invoke_prompt_template_stream(url, API_KEY, SPACE_ID, DEPLOYMENT_ID,
+                                                                  f"Summarize review {index}")
+            "".join(streaming.timed_stream(chunks, timings))
+            stream_timings.append(timings["time_to_first_token"])
+        run("invoke_prompt_template_stream", invoke_stream, arguments.requests, arguments.concurrency)
+
+    # Only the result lines of this script are printed
+    for line in output.getvalue().splitlines():
+        if line.startswith(("get_summary", "invoke_prompt_template")):
+            print(line)
+    if stream_timings:
+        print(f"Streaming time to first token - p50: {statistics.median(stream_timings) * 1000:.1f} ms")
+    print("Stand-in statistics: " + str(http_transport.get_transport().get(url + "/stub/stats").json()))
+
+    if server is not None:
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
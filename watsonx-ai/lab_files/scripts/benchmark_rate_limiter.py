@@ -0,0 +1,153 @@
+"""
+This code sample tests the ConcurrencyController against a local stub that throttles like watsonx.ai.
+
+The stub server accepts up to CONCURRENCY_QUOTA requests in flight and RATE_QUOTA requests per second.
+Requests above the quota get HTTP 429 with a Retry-After header, like the watsonx.ai rate limits.
+CALLERS threads send REQUESTS requests, first retrying throttled requests after Retry-After, then through
+the controller. The controller only knows the request rate of the plan - it finds the concurrency quota
+by itself. The live gauges of the controller are printed while the requests run.
+
+Run from the scripts directory:
+# python benchmark_rate_limiter.py
+"""
+
+import collections
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+
+CONCURRENCY_QUOTA = 6
+RATE_QUOTA = 40
+RETRY_AFTER = "1"
+GENERATION_LATENCY = 0.1
+CALLERS = 32
+REQUESTS = 400
+PROJECT_ID = "stub-project"
+MODEL_ID = "meta-llama/llama-2-70b-chat"
+
+
+class StubServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        # Start times of the requests accepted in the last second
+        self.accepted = collections.deque()
+        self.throttled = 0
+
+    def admit(self):
+        # Returns True if the request is within the quota
+        with self.lock:
+            now = time.monotonic()
+            while self.accepted and now - self.accepted[0] > 1:
+                self.accepted.popleft()
+            if self.in_flight >= CONCURRENCY_QUOTA or len(self.accepted) >= RATE_QUOTA:
+                self.throttled += 1
+                return False
+            self.in_flight += 1
+            self.accepted.append(now)
+            return True
+
+    def done(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class StubThrottlingHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if not self.server.admit():
+            body = json.dumps({"errors": [{"code": "too_many_requests"}]}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Retry-After", RETRY_AFTER)
+        else:
+            time.sleep(GENERATION_LATENCY)
+            self.server.done()
+            body = json.dumps({"results": [{"generated_text": "Paris"}]}).encode("utf-8")
+            self.send_response(200)
+
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(send, label):
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CALLERS) as executor:
+        list(executor.map(lambda _: send(), range(REQUESTS)))
+    total_time = time.perf_counter() - start
+
+    print(f"{label:<32} time: {total_time:6.2f} s   throughput: {REQUESTS / total_time:6.1f} requests/s")
+
+def print_gauges(controller, stop):
+
+    while not stop.wait(0.5):
+        for (project_id, model_id), gauges in controller.get_gauges().items():
+            print(f"    in flight: {gauges['in_flight']:3d}   window: {gauges['window']:5.1f}   "
+                  f"successes: {gauges['successes']:4d}   throttled: {gauges['throttled']:4d}")
+
+def main():
+
+    server = StubServer(("127.0.0.1", 0), StubThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/ml/v1/text/generation?version=2023-05-29"
+
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_maxsize=CALLERS))
+
+    def post():
+        response = session.post(url, json={"model_id": MODEL_ID, "input": "What is the capital of France?"})
+        # A throttled request raises an HTTPError with the response, like the watsonx.ai SDK
+        response.raise_for_status()
+        return response.json()
+
+    print(f"Quota: {CONCURRENCY_QUOTA} requests in flight, {RATE_QUOTA} requests/s. "
+          f"{CALLERS} callers, {REQUESTS} requests")
+
+    # Without the controller - every caller waits for Retry-After before it retries a throttled request
+    def send_without_controller():
+        while True:
+            try:
+                return post()
+            except requests.HTTPError as e:
+                time.sleep(float(e.response.headers.get("Retry-After", 1)))
+
+    run(send_without_controller, "Without controller")
+    print(f"    throttled requests: {server.throttled}")
+
+    # With the controller - the rate of the plan is known, the concurrency quota is not.
+    # Wait until the requests of the first run have left the rate window of the stub
+    time.sleep(1.5)
+    server.throttled = 0
+    controller = rate_limiter.ConcurrencyController(project_rates={PROJECT_ID: RATE_QUOTA})
+    stop = threading.Event()
+    threading.Thread(target=print_gauges, args=(controller, stop), daemon=True).start()
+
+    run(lambda: controller.call(PROJECT_ID, MODEL_ID, post), "With controller")
+    stop.set()
+    print(f"    throttled requests: {server.throttled}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
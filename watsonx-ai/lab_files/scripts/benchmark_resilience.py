@@ -0,0 +1,82 @@
+"""
+This code sample measures how retries and hedging change the tail latency of LLM invocations.
+
+A stub invocation stands in for watsonx.ai: most requests take about BASE_LATENCY seconds, STRAGGLER_RATE
+of them hit a slow replica and take STRAGGLER_LATENCY seconds, and ERROR_RATE of them fail with HTTP 502.
+The same CALLS are run without the resilience layer, with retries only, and with retries and hedging.
+
+Run from the scripts directory:
+# python benchmark_resilience.py
+"""
+
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import resilience
+
+BASE_LATENCY = 0.1
+STRAGGLER_LATENCY = 3.0
+STRAGGLER_RATE = 0.04
+ERROR_RATE = 0.02
+CALLS = 400
+CALLERS = 16
+
+
+class StubServerError(Exception):
+
+    status_code = 502
+
+
+def invoke():
+
+    # Every request picks its replica at random, so a hedged duplicate usually gets a fast one
+    outcome = random.random()
+    if outcome < ERROR_RATE:
+        time.sleep(BASE_LATENCY / 2)
+        raise StubServerError("502 Bad Gateway")
+    if outcome < ERROR_RATE + STRAGGLER_RATE:
+        time.sleep(STRAGGLER_LATENCY)
+    else:
+        time.sleep(random.uniform(0.8, 1.2) * BASE_LATENCY)
+
+    return "Paris"
+
+def run(label, call):
+
+    def timed_call(_):
+        start = time.perf_counter()
+        try:
+            call()
+            failed = False
+        except Exception:
+            failed = True
+        return time.perf_counter() - start, failed
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as executor:
+        results = list(executor.map(timed_call, range(CALLS)))
+
+    latencies = sorted(latency for latency, failed in results if not failed)
+    failures = sum(1 for latency, failed in results if failed)
+
+    def percentile(value):
+        return latencies[min(len(latencies) - 1, int(value * len(latencies)))] * 1000
+
+    print(f"{label:<24} p50: {statistics.median(latencies) * 1000:7.1f} ms   p95: {percentile(0.95):7.1f} ms   "
+          f"p99: {percentile(0.99):7.1f} ms   failures: {failures}")
+
+def main():
+
+    random.seed(1)
+    print(f"{CALLS} calls, {STRAGGLER_RATE:.0%} stragglers ({STRAGGLER_LATENCY} s), {ERROR_RATE:.0%} errors")
+
+    run("Single attempt", invoke)
+    run("Retries", lambda: resilience.call(invoke, name="retries", deadline=10))
+    run("Retries and hedging", lambda: resilience.call(invoke, name="hedging", deadline=10, hedge=True))
+
+    for name, metrics in resilience.get_metrics().items():
+        print(f"{name}: {metrics}")
+
+if __name__ == "__main__":
+    main()
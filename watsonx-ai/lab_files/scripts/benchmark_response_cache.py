@@ -0,0 +1,73 @@
+"""
+This code sample measures the latency of the response cache for repeated requests.
+
+A stub model stands in for a watsonx.ai Model: it takes GENERATION_LATENCY seconds to generate a response.
+The same PROMPTS are requested several times with greedy decoding (cached) and once with sample decoding
+(bypassed). The cache is stored in a temporary file, so the shared response_cache.db is not changed.
+
+Run from the scripts directory:
+# python benchmark_response_cache.py
+"""
+
+import os
+import statistics
+import tempfile
+import time
+
+import response_cache
+
+GENERATION_LATENCY = 0.2
+PROMPTS = [f"Summarize the review number {index} in at most 100 words." for index in range(20)]
+REPEATS = 5
+
+
+class StubModel:
+
+    def __init__(self, model_id, params):
+        self.model_id = model_id
+        self.params = params
+
+    def generate(self, prompt, params=None):
+        time.sleep(GENERATION_LATENCY)
+        return {"model_id": self.model_id,
+                "results": [{"generated_text": "Summary of: " + prompt, "generated_token_count": 12}]}
+
+
+def measure(model, prompts):
+
+    # Returns the latency of every request in microseconds
+    latencies = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        response_cache.generate(model, prompt)
+        latencies.append((time.perf_counter() - start) * 1000000)
+
+    return latencies
+
+def print_results(label, latencies):
+
+    print(f"{label:<28} median: {statistics.median(latencies):12.1f} us   max: {max(latencies):12.1f} us")
+
+def main():
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = response_cache.ResponseCache(os.path.join(directory, "response_cache.db"))
+        response_cache.shared_cache = cache
+
+        greedy_model = StubModel("google/flan-ul2", {"decoding_method": "greedy", "max_new_tokens": 300})
+        sample_model = StubModel("google/flan-ul2", {"decoding_method": "sample", "temperature": 0.7})
+
+        print_results("First request (miss)", measure(greedy_model, PROMPTS))
+        print_results("Repeated (memory hit)", measure(greedy_model, PROMPTS * REPEATS))
+
+        # Responses are read from SQLite when they're not in memory, for example after a restart
+        cache.memory.clear()
+        print_results("Repeated (disk hit)", measure(greedy_model, PROMPTS))
+
+        print_results("Sample decoding (bypassed)", measure(sample_model, PROMPTS[:5]))
+
+        print("Response cache stats: " + str(response_cache.get_stats()))
+        cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+This code sample compares the retrieval modes of use_case_RAG: dense (vector search only, the original
+behavior), lexical (BM25 keyword search only) and hybrid (both, combined with reciprocal rank fusion).
+
+Test questions are written by the LLM of use_case_RAG for a random sample of chunks of the document. The LLM
+is asked to use its own words, and a question that still repeats a run of COPIED_WORDS words of its chunk is
+dropped - questions copied from the text would favour keyword search. The questions are generated with greedy
+decoding, so they come from the response cache when the benchmark is run again. Recall@k is the share of
+questions for which the source chunk is retrieved in the top k results. Latency is measured per question and
+includes embedding the question (dense, hybrid).
+
+The questions are generated in watsonx.ai - set api_key, project_id and url in your .env file.
+
+Run from the scripts directory:
+# python benchmark_retrieval.py ./state_of_the_union.txt txt
+"""
+
+import re
+import sys
+import time
+import random
+import statistics
+
+import batch_generation
+import use_case_RAG
+
+SAMPLE_SIZE = 100
+SEED = 42
+
+QUESTION_PROMPT = ("Write one question that is answered by the following passage. Use your own words: "
+                   "don't repeat phrases of the passage. Return only the question.\n\n"
+                   "Passage: {chunk}\n\nQuestion:")
+MAX_QUESTION_TOKENS = 40
+# A question that repeats this many consecutive words of its chunk is not a paraphrase
+COPIED_WORDS = 4
+
+def get_words(text):
+
+    return re.findall(r"\w+", text.lower())
+
+def is_paraphrase(question, chunk, copied_words=COPIED_WORDS):
+
+    chunk_words = get_words(chunk)
+    chunk_runs = {tuple(chunk_words[i:i + copied_words]) for i in range(len(chunk_words) - copied_words + 1)}
+    question_words = get_words(question)
+
+    return not any(tuple(question_words[i:i + copied_words]) in chunk_runs
+                   for i in range(len(question_words) - copied_words + 1))
+
+def generate_questions(chunks, sample_size, seed):
+
+    # Returns (question, source chunk) pairs
+    generator = random.Random(seed)
+    sample = generator.sample(chunks, min(sample_size, len(chunks)))
+
+    use_case_RAG.get_credentials()
+    model = use_case_RAG.get_model(use_case_RAG.MODEL_TYPE, MAX_QUESTION_TOKENS, 1, use_case_RAG.DECODING,
+                                   use_case_RAG.TEMPERATURE)
+    batch = batch_generation.generate_batch(model, [QUESTION_PROMPT.format(chunk=chunk) for chunk in sample])
+
+    questions = []
+    copied = 0
+    for chunk, result in zip(sample, batch["results"]):
+        if result["error"] is not None:
+            continue
+        # The first line is the question, the model may go on with an answer
+        question = result["generated_text"].strip().split("\n")[0].strip()
+        if not question:
+            continue
+        if not is_paraphrase(question, chunk):
+            copied += 1
+            continue
+        questions.append((question, chunk))
+
+    print(f"Questions generated: {len(questions)}, dropped because they repeat the text of the chunk: {copied}, "
+          f"failed generations: {batch['errors']}")
+
+    return questions
+
+def main():
+
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "./state_of_the_union.txt"
+    file_type = sys.argv[2] if len(sys.argv) > 2 else use_case_RAG.FILE_TYPE_TXT
+
+    # Build (or reuse) the index and load the embedding model before measuring
+    collection = use_case_RAG.create_embeddings(file_path, file_type, "benchmark_retrieval")
+    use_case_RAG.warm_up()
+
+    chunks = collection.get(include=["documents"])["documents"]
+    questions = generate_questions(chunks, SAMPLE_SIZE, SEED)
+    print(f"Chunks in the index: {len(chunks)}, test questions: {len(questions)}")
+    if not questions:
+        print("No test questions - nothing to compare")
+        return
+
+    print("--------------------------------- Retrieval benchmark -----------------------------------")
+    for retrieval_mode in [use_case_RAG.RETRIEVAL_DENSE, use_case_RAG.RETRIEVAL_LEXICAL, use_case_RAG.RETRIEVAL_HYBRID]:
+        hits = 0
+        latencies = []
+        for question, source_chunk in questions:
+            start = time.perf_counter()
+            relevant_chunks = use_case_RAG.retrieve(collection, [question], use_case_RAG.N_RESULTS, retrieval_mode)[0]
+            latencies.append(time.perf_counter() - start)
+            if source_chunk in relevant_chunks:
+                hits += 1
+
+        recall = hits / len(questions)
+        latencies.sort()
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(f"{retrieval_mode:<8} recall@{use_case_RAG.N_RESULTS}: {recall:6.1%}   "
+              f"median: {statistics.median(latencies) * 1000:8.2f} ms   p95: {p95 * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
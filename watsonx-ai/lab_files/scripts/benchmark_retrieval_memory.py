@@ -0,0 +1,140 @@
+"""
+This code sample compares the size of the prompt with the history and what it remembers, for chat sessions
+of growing length, with three memories:
+- the full history (a ConversationMemory with an unlimited token budget)
+- the sliding window (a ConversationMemory with the default token budget)
+- the RetrievalMemory - the earlier messages relevant to the prompt and a short window of recent messages
+
+Every session starts with a few facts (an account number, a deadline, ...) followed by filler turns, and
+ends with questions about the facts. As in the AI Assistant, the prompt with the history is built for every
+user message. The benchmark prints, per session length, the tokens of the prompt with the history (averaged
+over the questions), the share of questions whose prompt contains the fact (recall), and the time the
+RetrievalMemory takes to build the prompt of a question (embedding the new messages in one batch and searching
+the index). The last table shows the time to embed the messages one by one and in batches.
+
+The hashed embedding only matches words, so a question that shares few words with its fact can be missed.
+Sessions of more than MAX_INDEXED_MESSAGES messages evict their oldest messages, facts included.
+
+Run from the scripts directory (by default, the hashed embedding of task_router.py is used, so that the
+benchmark doesn't need sentence-transformers):
+# python benchmark_retrieval_memory.py
+# python benchmark_retrieval_memory.py --embedding-model all-MiniLM-L6-v2
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+import chat_session
+import model_registry
+import retrieval_memory
+import task_router
+
+# Turns (a user message and a response) per session
+SESSION_LENGTHS = (10, 50, 100, 200, 400)
+BATCH_SIZES = (1, 8, 32)
+
+# Facts told at the start of the session, and the questions asked about them at the end
+FACTS = [
+    ("My account number is 48213-77.", "What was my account number again?", "48213-77"),
+    ("The project deadline is March 14.", "When is the project deadline?", "March 14"),
+    ("Our warehouse is in Rotterdam.", "Where did I say our warehouse is?", "Rotterdam"),
+    ("My manager is called Priya Raman.", "What is the name of my manager?", "Priya Raman"),
+    ("The budget for the campaign is 25000 dollars.", "How big is the budget for the campaign?", "25000")
+]
+
+FILLER_TOPICS = ["sales report", "customer survey", "marketing plan", "python script", "sql query",
+                 "quarterly revenue", "product launch", "support tickets", "hiring plan", "cloud costs",
+                 "travel policy", "team offsite", "pricing page", "data pipeline", "security review"]
+FILLER_QUESTIONS = ["Can you summarize the {topic}?", "What should I change in the {topic}?",
+                    "Give me three ideas for the {topic}.", "What are the risks of the {topic}?"]
+FILLER_RESPONSE = ("Here are a few points about the {topic}: review the numbers with the team, compare them "
+                   "with the previous period and write down the next steps.")
+
+
+def make_session(turns, generator):
+
+    # The facts and their acknowledgements, then filler turns
+    messages = []
+    for fact, question, answer in FACTS:
+        messages.append(fact)
+        messages.append("Thanks, I will keep that in mind.")
+    for _ in range(turns - len(FACTS)):
+        topic = generator.choice(FILLER_TOPICS)
+        messages.append(generator.choice(FILLER_QUESTIONS).format(topic=topic))
+        messages.append(FILLER_RESPONSE.format(topic=topic))
+
+    return messages
+
+def run(memory, messages, count_tokens, query=False):
+
+    # Adds the messages, then asks the questions about the facts. Returns the average tokens of the prompt,
+    # the recall and the average time to build the prompt of a question
+    for position, message in enumerate(messages):
+        memory.add_message(message)
+        # The prompt is built for every user message - the RetrievalMemory embeds the new messages then
+        if query and position % 2 == 0:
+            memory.convert_to_prompt(message)
+
+    tokens, found, times = [], 0, []
+    for fact, question, answer in FACTS:
+        memory.add_message(question)
+        start = time.perf_counter()
+        prompt = memory.convert_to_prompt(question) if query else memory.convert_to_prompt()
+        times.append(time.perf_counter() - start)
+        tokens.append(count_tokens(prompt))
+        found += answer in prompt
+        memory.add_message("I remember that.")
+
+    return statistics.mean(tokens), found / len(FACTS), statistics.mean(times)
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Prompt size and recall of the retrieval memory")
+    parser.add_argument("--embedding-model", default=None,
+                        help="sentence-transformers model (by default, the hashed embedding is used)")
+    arguments = parser.parse_args()
+
+    if arguments.embedding_model:
+        engine = model_registry.get_embedding_engine(arguments.embedding_model)
+        embed = engine.embed
+    else:
+        def embed(texts):
+            return np.stack([task_router.get_hashed_embedding(text) for text in texts])
+
+    # The same token count for all memories, so that the numbers are comparable
+    count_tokens = chat_session.count_tokens
+
+    print(f"Embedding: {arguments.embedding_model or 'hashed'}")
+    print(f"{'Turns':>6} | {'Full history':>21} | {'Sliding window':>21} | {'Retrieval memory':>33}")
+    print(f"{'':>6} | {'tokens':>10} {'recall':>10} | {'tokens':>10} {'recall':>10} | "
+          f"{'tokens':>10} {'recall':>10} {'prompt ms':>11}")
+    for turns in SESSION_LENGTHS:
+        messages = make_session(turns, random.Random(turns))
+
+        full_tokens, full_recall, _ = run(chat_session.ConversationMemory(10 ** 9, count_tokens), messages,
+                                          count_tokens)
+        window_tokens, window_recall, _ = run(chat_session.ConversationMemory(count_tokens=count_tokens), messages,
+                                              count_tokens)
+        memory = retrieval_memory.RetrievalMemory(embed=embed, count_tokens=count_tokens)
+        retrieval_tokens, retrieval_recall, prompt_time = run(memory, messages, count_tokens, query=True)
+
+        print(f"{turns:>6} | {full_tokens:>10.0f} {full_recall:>10.0%} | {window_tokens:>10.0f} "
+              f"{window_recall:>10.0%} | {retrieval_tokens:>10.0f} {retrieval_recall:>10.0%} "
+              f"{prompt_time * 1000:>11.2f}")
+
+    # Embedding the messages one by one (one call per message) and in batches
+    texts = make_session(64, random.Random(0))
+    print()
+    print(f"{'Batch size':>10} | {'ms per message':>14}")
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        for offset in range(0, len(texts), batch_size):
+            embed(texts[offset:offset + batch_size])
+        print(f"{batch_size:>10} | {(time.perf_counter() - start) * 1000 / len(texts):>14.3f}")
+
+if __name__ == "__main__":
+    main()
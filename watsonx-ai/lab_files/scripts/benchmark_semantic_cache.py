@@ -0,0 +1,89 @@
+"""
+This code sample replays logged questions through the semantic cache to choose a similarity threshold.
+
+Questions are replayed in order for every threshold in THRESHOLDS. A question that misses the cache is
+"answered" with a placeholder that took GENERATION_LATENCY seconds (no LLM is called), so the replay shows
+the hit rate, the generation time saved and the time spent on cache lookups.
+
+The default log has groups of questions with the same meaning. A hit is counted as false if the cached
+answer belongs to another group - false hits show that the threshold is too low.
+
+Run from the scripts directory with the default log, or with a file of logged questions (one per line):
+# python benchmark_semantic_cache.py
+# python benchmark_semantic_cache.py questions.txt
+"""
+
+import sys
+
+import model_registry
+import semantic_cache
+
+THRESHOLDS = [0.8, 0.85, 0.9, 0.95]
+# Typical time of a 300-token llama-2-70b generation
+GENERATION_LATENCY = 8.0
+MODEL_ID = "meta-llama/llama-2-70b-chat"
+
+# Groups of questions with the same meaning, as users type them
+QUESTION_GROUPS = [
+    ["What is IBM?", "what's ibm", "What is IBM", "Tell me what IBM is", "what does IBM stand for?"],
+    ["What is the capital of France?", "capital of france", "What's the capital city of France?",
+     "Which city is the capital of France?"],
+    ["How do I reset my password?", "how to reset password", "I forgot my password, how can I reset it?",
+     "reset my password"],
+    ["What is watsonx.ai?", "what's watsonx.ai", "Tell me about watsonx.ai", "What can I do with watsonx.ai?"],
+    ["What year was George Washington born?", "When was George Washington born?",
+     "george washington birth year"],
+    ["What language is spoken in Brazil?", "What do people speak in Brazil?", "brazil language"],
+    ["What is the capital of Germany?", "capital of germany", "Which city is the capital of Germany?"],
+    ["How do I apply for a mortgage?", "how to get a mortgage", "What are the steps to apply for a home loan?"]
+]
+
+def get_default_log():
+
+    # Returns (group, question) pairs in the order users would ask them: the first question of every group,
+    # then the variants
+    log = []
+    for position in range(max(len(group) for group in QUESTION_GROUPS)):
+        for group_index, group in enumerate(QUESTION_GROUPS):
+            if position < len(group):
+                log.append((group_index, group[position]))
+
+    return log
+
+def read_log(path):
+
+    # Logged questions have no groups, so false hits are not counted
+    with open(path, "r", encoding="utf-8") as file:
+        return [(None, line.strip()) for line in file if line.strip()]
+
+def replay(log, threshold):
+
+    cache = semantic_cache.SemanticCache(similarity_threshold=threshold)
+    false_hits = 0
+
+    for group, question in log:
+        # The answer records the group of the question it was generated for
+        answer, embedding = cache.lookup(MODEL_ID, question)
+        if answer is None:
+            cache.add(MODEL_ID, question, group, GENERATION_LATENCY, embedding)
+        elif group is not None and answer != group:
+            false_hits += 1
+
+    return cache.get_stats(), false_hits
+
+def main():
+
+    log = read_log(sys.argv[1]) if len(sys.argv) > 1 else get_default_log()
+    print(f"Replaying {len(log)} questions")
+
+    # Load the embedding model before timing the lookups
+    model_registry.warm_up(semantic_cache.EMBEDDING_MODEL_NAME)
+
+    for threshold in THRESHOLDS:
+        stats, false_hits = replay(log, threshold)
+        print(f"threshold: {threshold:.2f}   hit rate: {stats['hit_rate']:6.1%}   false hits: {false_hits:3d}   "
+              f"time saved: {stats['latency_saved']:7.1f} s   "
+              f"lookup: {stats['average_lookup_time'] * 1000:6.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+This code sample measures the latency that speculative routing saves in the AI Assistant.
+
+Stub invocations stand in for the prompt template deployments: the classifier takes about
+CLASSIFY_LATENCY seconds, the task prompts about TASK_LATENCY seconds. For several shares of programming
+messages, MESSAGES messages are routed sequentially (classification, then task) and with the
+SpeculativeRouter. The benchmark prints the latency percentiles, the hit rate of the speculation and the
+invocations that were wasted on wrong guesses.
+
+Run from the scripts directory:
+# python benchmark_speculative_routing.py
+"""
+
+import random
+import statistics
+import time
+
+import speculative_routing
+
+CLASSIFY_LATENCY = 0.1
+TASK_LATENCY = 0.4
+MESSAGES = 40
+PROGRAMMING_SHARES = (0.1, 0.3, 0.5)
+
+QUESTION_DEPLOYMENT = "question"
+PROGRAMMING_DEPLOYMENT = "programming"
+
+
+def invoke(latency):
+
+    time.sleep(random.uniform(0.8, 1.2) * latency)
+
+def print_results(label, latencies):
+
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"    {label:<12} p50: {statistics.median(latencies) * 1000:7.1f} ms   p95: {p95 * 1000:7.1f} ms")
+
+def main():
+
+    random.seed(1)
+    print(f"{MESSAGES} messages, classification {CLASSIFY_LATENCY * 1000:.0f} ms, task prompt {TASK_LATENCY * 1000:.0f} ms")
+
+    for share in PROGRAMMING_SHARES:
+        routes = [PROGRAMMING_DEPLOYMENT if random.random() < share else QUESTION_DEPLOYMENT
+                  for _ in range(MESSAGES)]
+
+        def classify(route):
+            invoke(CLASSIFY_LATENCY)
+            return route
+
+        def invoke_task(deployment_id):
+            invoke(TASK_LATENCY)
+            return "Response of the " + deployment_id + " prompt"
+
+        print(f"Programming messages: {share:.0%}")
+
+        sequential = []
+        for route in routes:
+            start = time.perf_counter()
+            invoke_task(classify(route))
+            sequential.append(time.perf_counter() - start)
+        print_results("Sequential", sequential)
+
+        router = speculative_routing.SpeculativeRouter()
+        speculative = []
+        for route in routes:
+            start = time.perf_counter()
+            router.call(lambda: classify(route), invoke_task, QUESTION_DEPLOYMENT)
+            speculative.append(time.perf_counter() - start)
+        print_results("Speculative", speculative)
+
+        stats = router.get_stats()
+        print(f"    hit rate: {stats['hit_rate']:.0%}   average latency saved: "
+              f"{stats['average_latency_saved'] * 1000:.1f} ms   wasted invocations: {stats['wasted_invocations']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+This code sample measures the startup time of the RAG modules.
+
+Each module is imported in a fresh Python process (so nothing is cached from a previous import) and
+the import time is reported, followed by the time of the explicit warm-up call that loads the embedding model.
+Importing the RAG modules (use_case_RAG, use_case_RAG_Web) should take milliseconds: they don't load torch,
+the embedding model, chromadb, langchain, the watsonx.ai SDK, httpx, requests or BeautifulSoup - the embedding
+model is loaded by warm_up(), the packages by the first call that uses them. demo_streamlit_RAG imports
+streamlit, which the app runs in, on top of use_case_RAG. For every import, the script lists the packages of
+HEAVY_PACKAGES that the import loaded.
+
+Run from the scripts directory:
+# python benchmark_startup.py
+"""
+
+import os
+import subprocess
+import sys
+import statistics
+
+MODULES = ["use_case_RAG", "use_case_RAG_Web", "demo_streamlit_RAG"]
+RUNS = 5
+
+# Packages that take tens or hundreds of milliseconds to import
+HEAVY_PACKAGES = ["torch", "sentence_transformers", "numpy", "chromadb", "langchain", "langchain_community",
+                  "ibm_watsonx_ai", "httpx", "requests", "bs4", "streamlit"]
+
+IMPORT_TIMER = """
+import sys
+import time
+start = time.perf_counter()
+import {module}
+end = time.perf_counter()
+print(",".join(name for name in {packages} if name in sys.modules) or "none")
+print(end - start)
+"""
+
+WARM_UP_TIMER = """
+import time
+import use_case_RAG
+start = time.perf_counter()
+use_case_RAG.warm_up()
+print(time.perf_counter() - start)
+"""
+
+def run_in_new_process(code):
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-c", code], cwd=script_dir, capture_output=True, text=True, check=True)
+
+    return result.stdout.strip().splitlines()
+
+def time_in_new_process(code):
+
+    # The timer is the last line of the output (modules may print while loading)
+    return float(run_in_new_process(code)[-1])
+
+def print_timings(label, timings):
+
+    print(f"{label:<30} median: {statistics.median(timings) * 1000:9.1f} ms   "
+          f"min: {min(timings) * 1000:9.1f} ms   max: {max(timings) * 1000:9.1f} ms")
+
+def main():
+
+    print("--------------------------------- Import time -----------------------------------")
+    for module in MODULES:
+        code = IMPORT_TIMER.format(module=module, packages=HEAVY_PACKAGES)
+        outputs = [run_in_new_process(code) for _ in range(RUNS)]
+        print_timings("import " + module, [float(output[-1]) for output in outputs])
+        print(f"{'':<30} heavy packages loaded: {outputs[0][-2]}")
+
+    print("--------------------------------- Warm-up time ----------------------------------")
+    timings = [time_in_new_process(WARM_UP_TIMER) for _ in range(RUNS)]
+    print_timings("use_case_RAG.warm_up()", timings)
+
+if __name__ == "__main__":
+    main()
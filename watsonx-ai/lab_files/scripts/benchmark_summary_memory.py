@@ -0,0 +1,105 @@
+"""
+This code sample measures how the summarizing chat memory changes the prompt size and latency of long chats.
+
+A chat session of TURNS turns (a user message and an assistant response, 40 to 100 words each) runs against
+the local stand-in of watsonx.ai (watsonx_stub_server.py), which reads PROMPT_TOKENS_PER_SECOND prompt tokens
+per second, so longer prompts take longer. The session is run with:
+- the full history (ConversationMemory with a budget large enough for the whole session)
+- a truncated history (ConversationMemory with the recent budget only - older context is lost)
+- the SummarizingMemory (the same recent budget plus a summary of the dropped messages)
+The benchmark prints the prompt tokens and the latency per turn for the first turns and the last turns,
+and the time spent on the chat history in the request path (the summaries are generated in the background,
+by the stand-in as well).
+
+Run from the scripts directory:
+# pip install fastapi uvicorn
+# python benchmark_summary_memory.py
+"""
+
+import os
+import random
+import re
+import statistics
+import time
+
+import chat_session
+import iam_token
+import rest_model
+import summary_memory
+import watsonx_stub_server
+
+TURNS = 40
+PORT = 8766
+PROMPT_TOKENS_PER_SECOND = 2000
+RESPONSE_TOKENS = 40
+FULL_HISTORY_BUDGET = 32768
+WORDS = ("the", "customer", "asked", "about", "interest", "rates", "and", "the", "assistant", "explained",
+         "how", "to", "write", "a", "Python", "function", "that", "parses", "dates", "correctly")
+
+
+def count_tokens(text):
+
+    # Approximate token count, so that the results don't depend on the tokenizer download
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+def run(label, memory, model, user_messages):
+
+    tokens = []
+    latencies = []
+    history_times = []
+    for turn, user_message in enumerate(user_messages):
+        start = time.perf_counter()
+        memory.add_message(user_message)
+        prompt = memory.convert_to_prompt()
+        history_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = model.generate_text(prompt)
+        latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        memory.add_message(response)
+        history_times.append(history_time + time.perf_counter() - start)
+        tokens.append(count_tokens(prompt))
+
+    first = slice(0, 10)
+    last = slice(TURNS - 10, TURNS)
+    print(f"{label:<20} prompt tokens: first 10 turns {statistics.mean(tokens[first]):6.0f}, "
+          f"last 10 turns {statistics.mean(tokens[last]):6.0f}   "
+          f"latency: first 10 turns {statistics.mean(latencies[first]) * 1000:6.0f} ms, "
+          f"last 10 turns {statistics.mean(latencies[last]) * 1000:6.0f} ms   "
+          f"history: {statistics.mean(history_times) * 1e6:6.0f} µs/turn")
+
+def main():
+
+    watsonx_stub_server.config.update({
+        "time_to_first_token": 0.05,
+        "time_to_first_token_sigma": 0.0,
+        "tokens_per_second": 200,
+        "prompt_tokens_per_second": PROMPT_TOKENS_PER_SECOND
+    })
+    server = watsonx_stub_server.start_server(PORT)
+    url = f"http://127.0.0.1:{PORT}"
+    # The summaries are generated by the stand-in as well
+    os.environ.update({"url": url, "api_key": "stub-api-key", "project_id": "stub-project",
+                       iam_token.STAND_IN_SETTING: "true"})
+
+    model = rest_model.RESTModel("meta-llama/llama-3-70b-instruct", {"max_new_tokens": RESPONSE_TOKENS},
+                                 {"url": url, "apikey": "stub-api-key"}, "stub-project")
+
+    random.seed(1)
+    user_messages = [" ".join(random.choice(WORDS) for _ in range(random.randint(40, 100))) for _ in range(TURNS)]
+    print(f"{TURNS} turns, the stand-in reads {PROMPT_TOKENS_PER_SECOND} prompt tokens per second")
+
+    run("Full history", chat_session.ConversationMemory(FULL_HISTORY_BUDGET, count_tokens), model, user_messages)
+    run("Truncated history", chat_session.ConversationMemory(summary_memory.RECENT_TOKEN_BUDGET, count_tokens),
+        model, user_messages)
+    memory = summary_memory.SummarizingMemory(count_tokens=count_tokens)
+    run("Summary and recent", memory, model, user_messages)
+    memory.wait_for_summary()
+    print(f"Summarizing memory: {memory.get_stats()}")
+
+    server.should_exit = True
+
+if __name__ == "__main__":
+    main()
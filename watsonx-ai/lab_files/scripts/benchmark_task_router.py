@@ -0,0 +1,115 @@
+"""
+This code sample compares the local TaskRouter with the classification prompt of the AI Assistant.
+
+The router is trained with the seed examples only and classifies TEST_MESSAGES, which are not in the seed
+examples. The classification prompt stands in as the reference: it's assumed to return the expected class
+and to take CLASSIFY_LATENCY seconds (a typical latency of the one-word classification invocation).
+The benchmark prints the accuracy and the routing time of the router and, for several confidence thresholds,
+the accuracy with the fallback to the classification prompt, the share of messages that fall back and the
+average classification latency per message. The current flow invokes the classification prompt for every
+message.
+
+Run from the scripts directory (set --embedding-model to try a sentence-transformers model):
+# python benchmark_task_router.py
+# python benchmark_task_router.py --embedding-model all-MiniLM-L6-v2
+"""
+
+import argparse
+import statistics
+import time
+
+import task_router
+
+CLASSIFY_LATENCY = 0.3
+REPEATS = 50
+# Confidence thresholds of the router to compare
+THRESHOLDS = (0.0, 0.05, 0.1, 0.15, 0.25)
+
+GENERAL = task_router.LABEL_GENERAL
+PROGRAMMING = task_router.LABEL_PROGRAMMING
+
+TEST_MESSAGES = [
+    ("Write a Python function that removes duplicates from a list.", PROGRAMMING),
+    ("How do I read a CSV file with pandas?", PROGRAMMING),
+    ("Write a SQL query to count the orders per customer.", PROGRAMMING),
+    ("Why do I get an IndexError: list index out of range in my loop?", PROGRAMMING),
+    ("Create a Java class for a bank account with deposit and withdraw methods.", PROGRAMMING),
+    ("Write a Python program that sorts a dictionary by value.", PROGRAMMING),
+    ("How can I call a REST API from Python with the requests library?", PROGRAMMING),
+    ("Write a function to check if a number is prime.", PROGRAMMING),
+    ("Refactor this function to use recursion.", PROGRAMMING),
+    ("What does the yield keyword do in Python?", PROGRAMMING),
+    ("Write a bash script that deletes files older than 7 days.", PROGRAMMING),
+    ("Implement binary search in C++.", PROGRAMMING),
+    ("How do I join two tables in SQL?", PROGRAMMING),
+    ("Write a Python class that reads a JSON configuration file.", PROGRAMMING),
+    ("Debug this code: for i in range(10) print(i)", PROGRAMMING),
+    ("What is the total revenue of the Northern region this year?", GENERAL),
+    ("Which product had the highest sales last month?", GENERAL),
+    ("What is the average age of our customers?", GENERAL),
+    ("Summarize the customer feedback from the last survey.", GENERAL),
+    ("What are the benefits of a high-yield savings account?", GENERAL),
+    ("How many customers did we gain in the second quarter?", GENERAL),
+    ("Write a short thank-you note to a new customer.", GENERAL),
+    ("What is the difference between a loan and a line of credit?", GENERAL),
+    ("Who is the account manager for the Eastern region?", GENERAL),
+    ("Give me a summary of the quarterly sales report.", GENERAL),
+    ("What is the return policy for online orders?", GENERAL),
+    ("List three ways to improve customer satisfaction.", GENERAL),
+    ("What was the churn rate in the last 12 months?", GENERAL),
+    ("Describe the main features of our premium plan.", GENERAL),
+    ("What is the weather like in Paris in spring?", GENERAL)
+]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Accuracy and latency of the local task router")
+    parser.add_argument("--embedding-model", default=None,
+                        help="sentence-transformers model (by default, the hashed embedding is used)")
+    arguments = parser.parse_args()
+
+    # Trained with the seed examples only, and nothing is written to the examples file
+    router = task_router.TaskRouter(examples=task_router.load_seed_examples(),
+                                    embedding_model_name=arguments.embedding_model, examples_path=None)
+
+    # Accuracy of the router on its own
+    correct = 0
+    for text, label in TEST_MESSAGES:
+        predicted, confidence = router.predict(text)
+        correct += predicted == label
+
+    # Routing time - every message is routed REPEATS times
+    route_times = []
+    for _ in range(REPEATS):
+        for text, label in TEST_MESSAGES:
+            start = time.perf_counter()
+            router.predict(text)
+            route_times.append(time.perf_counter() - start)
+    route_times.sort()
+
+    messages = len(TEST_MESSAGES)
+    print(f"{messages} test messages, embedding: {arguments.embedding_model or 'hashed'}")
+    print(f"Router only:       accuracy {correct / messages:.0%}")
+    print(f"Routing time:      p50 {statistics.median(route_times) * 1e6:.0f} µs, "
+          f"p99 {route_times[int(0.99 * len(route_times))] * 1e6:.0f} µs")
+    print(f"Classification prompt for every message: accuracy 100% (reference), "
+          f"classification latency {CLASSIFY_LATENCY * 1000:.0f} ms per message")
+
+    # The router with the classification prompt as the fallback, which returns the expected class.
+    # A fresh router for every threshold, so that the results don't depend on what the previous run learned
+    for threshold in THRESHOLDS:
+        router = task_router.TaskRouter(examples=task_router.load_seed_examples(), confidence_threshold=threshold,
+                                        embedding_model_name=arguments.embedding_model, examples_path=None)
+        fallback_correct = 0
+        for text, label in TEST_MESSAGES:
+            fallback_correct += router.route(text, lambda label=label: '"' + label + '"') == label
+        stats = router.get_stats()
+        # The current flow always waits for the classification prompt
+        local_latency = stats["average_route_time"] + stats["fallback_rate"] * CLASSIFY_LATENCY
+        print(f"Threshold {threshold:.2f}: accuracy {fallback_correct / messages:.0%}, classification prompt for "
+              f"{stats['fallback_rate']:.0%} of the messages, classification latency {local_latency * 1000:.1f} ms "
+              f"per message")
+
+if __name__ == "__main__":
+    main()
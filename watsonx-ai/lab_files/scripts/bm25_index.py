@@ -0,0 +1,98 @@
+"""
+This code sample shows how to maintain a sparse (keyword) index next to a chromadb collection.
+
+Dense (embedding) retrieval can miss questions about exact terms, such as policy numbers or statute names.
+The BM25Index is an inverted index with BM25 ranking, stored in SQLite (FTS5 full-text search, which
+chromadb also requires). Results of keyword and vector search are combined with reciprocal rank fusion.
+"""
+
+import re
+import sqlite3
+import threading
+
+# Constant used in reciprocal rank fusion. 60 is the value used in the original RRF paper
+RRF_K = 60
+
+# Words of the question used for the keyword search
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class BM25Index:
+
+    def __init__(self, path, name):
+
+        # One table per chroma collection. Collection names only contain letters, digits, "_" and "-"
+        self.table = '"bm25_' + name.replace('"', '') + '"'
+        # Streamlit serves each user session in its own thread, so the connection is shared and locked
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # The porter tokenizer matches different forms of a word, for example "claim" and "claims"
+        self.connection.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                                f"USING fts5(chunk_id UNINDEXED, content, tokenize='porter unicode61')")
+        self.connection.commit()
+
+    def add(self, chunk_ids, chunks):
+
+        with self.lock:
+            self.connection.executemany(f"INSERT OR REPLACE INTO {self.table} (rowid, chunk_id, content) "
+                                        f"VALUES (?, ?, ?)",
+                                        [(get_rowid(chunk_id), chunk_id, chunk)
+                                         for chunk_id, chunk in zip(chunk_ids, chunks)])
+            self.connection.commit()
+
+    def delete(self, chunk_ids):
+
+        with self.lock:
+            self.connection.executemany(f"DELETE FROM {self.table} WHERE rowid = ?",
+                                        [(get_rowid(chunk_id),) for chunk_id in chunk_ids])
+            self.connection.commit()
+
+    def clear(self):
+
+        with self.lock:
+            self.connection.execute(f"DELETE FROM {self.table}")
+            self.connection.commit()
+
+    def count(self):
+
+        with self.lock:
+            return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def search(self, query, n_results):
+
+        # Returns a list of (chunk_id, chunk) sorted by BM25 score, best first
+        terms = TERM_PATTERN.findall(query)
+        if not terms:
+            return []
+
+        # Any of the terms can match. Terms are quoted so that words like "AND" or "NOT" are not operators
+        match = " OR ".join('"' + term + '"' for term in terms)
+
+        with self.lock:
+            # bm25() returns lower values for better matches
+            rows = self.connection.execute(f"SELECT chunk_id, content FROM {self.table} WHERE {self.table} MATCH ? "
+                                           f"ORDER BY bm25({self.table}) LIMIT ?", (match, n_results)).fetchall()
+
+        return rows
+
+
+def get_rowid(chunk_id):
+
+    # Chunk ids are hex digests (see use_case_RAG.get_chunk_id). The first 15 hex digits make a 60-bit
+    # integer, which we use as the rowid, so that chunks can be replaced and deleted without a table scan
+    return int(chunk_id[:15], 16)
+
+def reciprocal_rank_fusion(result_lists, n_results):
+
+    # Each result list is a list of (chunk_id, chunk), best first. A chunk gets 1 / (RRF_K + rank)
+    # from every list it appears in, so chunks found by both searches are ranked first
+    scores = {}
+    chunks = {}
+    for results in result_lists:
+        for rank, (chunk_id, chunk) in enumerate(results):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            chunks[chunk_id] = chunk
+
+    ranked_ids = sorted(scores, key=scores.get, reverse=True)[:n_results]
+
+    return [(chunk_id, chunks[chunk_id]) for chunk_id in ranked_ids]
@@ -3,31 +3,146 @@ authors: Elena Lowery
 
 This code sample shows how to implement simple memory management for an
 AI Assistant application that's running in watsonx.ai
+
+The chat history is kept within a token budget: every message is tokenized once, when it's added, and the
+oldest messages are dropped until the history fits the budget. Adding or dropping a message doesn't touch
+the other messages: the token total and the prompt with the history are kept up to date as messages are
+added (appended to the prompt) and dropped (cut from the start of the prompt), so reading the prompt on
+every turn doesn't join the whole history again.
 """
 
-# Initialize the list of messages: LLM inference requests/responses
-messages = []
+import sys
+import threading
+from collections import deque
 
-def add_message(message):
+# Counts tokens with the tokenizer of the model, or estimates them
+import token_counter
+
+# Tokens of chat history sent to the LLM. Leave room in the context window of the model for the prompt
+# template and the generated response (Llama 3 models have 8192 tokens)
+TOKEN_BUDGET = 2048
+# Tokenizer used to count tokens - the tokenizer of the Llama 3 models (see token_counter.py)
+TOKENIZER_NAME = token_counter.TOKENIZER_NAME
+SEPARATOR = " "
+
+
+class ConversationMemory:
+
+    def __init__(self, token_budget=TOKEN_BUDGET, count_tokens=None, on_drop=None):
+
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens or globals()["count_tokens"]
+        # Called with every dropped message and its token count (see summary_memory.py)
+        self.on_drop = on_drop
+
+        # Messages and their token counts, oldest first
+        self.messages = deque()
+        self.token_counts = deque()
+        self.total_tokens = 0
+        # Memory held by the message strings
+        self.message_bytes = 0
+
+        # The messages joined with SEPARATOR, updated when a message is added or dropped
+        self.prompt = ""
+
+        # Like the other memories (summary_memory.py, retrieval_memory.py), the memory can be read by one
+        # thread while another one adds a message (see session_store.py)
+        self.lock = threading.Lock()
+
+    def add_message(self, message):
+
+        tokens = self.count_tokens(message)
+
+        with self.lock:
+            # Drop the oldest messages until the new message fits the budget. A message that is larger
+            # than the whole budget is kept on its own
+            while self.messages and self.total_tokens + tokens > self.token_budget:
+                self.drop_oldest()
+
+            self.prompt = self.prompt + SEPARATOR + message if self.messages else message
+            self.messages.append(message)
+            self.token_counts.append(tokens)
+            self.total_tokens += tokens
+            self.message_bytes += sys.getsizeof(message)
+
+    def drop_message(self):
+
+        with self.lock:
+            return self.drop_oldest()
+
+    def drop_oldest(self):
 
-   # Check how many messages we saved - we don't want to exceed the LLM context window (supported tokens)
-   # Since we know which LLM we are using and the limit for each prompt, this approach will work for a quick prototype
-   # In a production implementation, a better approach is to do token count
-    if len(messages) > 10:
-        drop_message()
+        # Must be called with the lock held. We are using the sliding window approach for maintaining
+        # history - first in, first out (first added prompt/response is dropped)
+        if not self.messages:
+            return None
 
-    messages.append(message)
+        message = self.messages.popleft()
+        tokens = self.token_counts.popleft()
+        self.total_tokens -= tokens
+        self.message_bytes -= sys.getsizeof(message)
+        self.prompt = self.prompt[len(message) + len(SEPARATOR):] if self.messages else ""
+        if self.on_drop is not None:
+            self.on_drop(message, tokens)
+
+        return message
+
+    @property
+    def history_length(self):
+
+        # Number of the latest messages of the conversation that the memory uses - the SessionStore keeps
+        # them when it saves a session
+        return len(self.messages)
+
+    def convert_to_prompt(self, query=None):
+
+        # The query (the current prompt) is used by the memories that retrieve earlier messages
+        # (see retrieval_memory.py)
+        with self.lock:
+            return self.prompt
+
+    def get_size(self):
+
+        # Bytes held by the messages and the joined prompt
+        with self.lock:
+            return sys.getsizeof(self.prompt) + self.message_bytes
+
+    def clear(self):
+
+        with self.lock:
+            self.messages.clear()
+            self.token_counts.clear()
+            self.total_tokens = 0
+            self.message_bytes = 0
+            self.prompt = ""
+
+
+def count_tokens(text):
+
+    return token_counter.count_tokens(text, TOKENIZER_NAME)
+
+# Chat history of the application
+memory = ConversationMemory()
+# The messages in the chat history, oldest first
+messages = memory.messages
+
+def add_message(message):
+
+    # Messages are dropped when the history doesn't fit the token budget of the LLM context window
+    messages_before = len(messages)
+    memory.add_message(message)
+    if len(messages) <= messages_before:
+        print("--------------------------------------------")
+        print("*** Dropping messages from chat history ***")
+        print("--------------------------------------------")
 
 def convert_to_prompt():
 
-    return ' '.join(messages)
+    return memory.convert_to_prompt()
 
 def drop_message():
 
-    # We are using the sliding window approach for maintaining
-    # history - first in, first out (first added prompt/response is dropped)
-    if messages:
-        messages.pop(0)
+    memory.drop_message()
 
     print("--------------------------------------------")
     print("*** Dropping messages from chat history ***")
@@ -37,4 +152,3 @@ def print_messages():
 
     for message in messages:
         print(message)
-
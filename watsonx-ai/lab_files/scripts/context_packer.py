@@ -0,0 +1,89 @@
+"""
+This code sample shows how to build the context of a RAG prompt within a token budget.
+
+Retrieved chunks often repeat text: chunks are created with an overlap (chunk_overlap in the text splitter),
+so two chunks that are next to each other in the document share a span of text. The packer removes these
+repeated spans, counts tokens with the tokenizer of the model (see token_counter.py) and adds chunks in score
+order until the budget is used.
+Every call prints how many of the retrieved tokens were removed as repeated text and how many were left out
+because they didn't fit the budget.
+"""
+
+import token_counter
+
+# Tokenizer of the model that answers the RAG prompts (llama-2-70b-chat). It's downloaded once and loaded lazily.
+# The Llama 2 repositories on Hugging Face are gated: accept the license of the model and set HF_TOKEN.
+# If the tokenizer can't be loaded, tokens are estimated (see token_counter.py)
+TOKENIZER_NAME = "meta-llama/Llama-2-70b-chat-hf"
+
+# Default budget for the context part of the prompt. llama-2-70b-chat accepts 4096 tokens in total
+# (prompt + generated tokens), so we leave room for the instruction, the question and the answer
+CONTEXT_TOKEN_BUDGET = 2048
+
+CHUNK_SEPARATOR = "\n\n\n"
+
+# Shorter common spans are likely to be a coincidence (for example, the same word) rather than an overlap
+MIN_OVERLAP_CHARS = 20
+
+def count_tokens(text):
+
+    return token_counter.count_tokens(text, TOKENIZER_NAME)
+
+def get_overlap(first, second):
+
+    # Length of the longest suffix of first that is also a prefix of second
+    for length in range(min(len(first), len(second)), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+
+    return 0
+
+def strip_overlap(chunk, packed_chunks):
+
+    # Remove the text that the chunk shares with chunks that are already in the context:
+    # the start of the chunk can repeat the end of a packed chunk (chunk follows it in the document)
+    # and the end of the chunk can repeat the start of a packed chunk (chunk precedes it)
+    for packed_chunk in packed_chunks:
+        if chunk in packed_chunk:
+            return ""
+        chunk = chunk[get_overlap(packed_chunk, chunk):]
+        overlap = get_overlap(chunk, packed_chunk)
+        if overlap:
+            chunk = chunk[:-overlap]
+
+    return chunk.strip()
+
+def pack(chunks, token_budget=CONTEXT_TOKEN_BUDGET, separator=CHUNK_SEPARATOR):
+
+    # Chunks are expected in score order (best first). Returns the context string
+    packed_chunks = []
+    packed_tokens = 0
+    separator_tokens = count_tokens(separator)
+    # Retrieved tokens left out as repeated text, and because they didn't fit the budget
+    overlap_tokens = 0
+    budget_tokens = 0
+
+    for original_chunk in chunks:
+        chunk = strip_overlap(original_chunk, packed_chunks)
+        stripped_tokens = count_tokens(chunk) if chunk else 0
+        overlap_tokens += count_tokens(original_chunk) - stripped_tokens
+        if not chunk:
+            continue
+
+        chunk_tokens = stripped_tokens + (separator_tokens if packed_chunks else 0)
+        # A chunk that doesn't fit is skipped, a shorter chunk with a lower score may still fit
+        if packed_tokens + chunk_tokens > token_budget:
+            budget_tokens += stripped_tokens
+            continue
+
+        packed_chunks.append(chunk)
+        packed_tokens += chunk_tokens
+
+    context = separator.join(packed_chunks)
+
+    original_tokens = count_tokens(separator.join(chunks))
+    context_tokens = count_tokens(context)
+    print(f"Context tokens: {context_tokens} of {original_tokens} retrieved - repeated text removed: "
+          f"{overlap_tokens}, over the budget: {budget_tokens}, chunks used: {len(packed_chunks)} of {len(chunks)}")
+
+    return context
@@ -18,6 +18,7 @@ This example shows a Question and Answer use case for a provided document
 
 # For reading credentials from the .env file
 import os
+import threading
 from dotenv import load_dotenv
 
 import streamlit as st
@@ -39,12 +40,25 @@ def get_credentials():
     globals()["url"] = os.getenv("url", None)
 
 
+# Streamlit runs this function only once per process (not on every rerun of the script)
+@st.cache_resource
+def start_warm_up():
+
+    # Load the embedding model in the background, so the UI is displayed right away and the model
+    # is usually ready by the time the first question is asked
+    warm_up_thread = threading.Thread(target=use_case_RAG.warm_up, daemon=True)
+    warm_up_thread.start()
+
+    return warm_up_thread
 
 def main():
 
     # Get the API key and project id and update global variables
     get_credentials()
 
+    # Start loading the embedding model
+    start_warm_up()
+
     # Declare variables
     file_path = ""
     collection_name = ""
@@ -0,0 +1,232 @@
+"""
+This code sample shows how to compute embeddings for RAG use cases efficiently on CPU-only machines.
+
+The EmbeddingEngine encodes texts in batches of a configurable size (which caps peak memory), can fan out
+the batches across a process pool, and can use either the sentence-transformers (torch) model or an
+ONNX Runtime version of the same model (fp32 or int8 on CPU, fp16 on a CUDA GPU).
+Embeddings are returned as one contiguous float32 NumPy array.
+
+The model is loaded on first use. With a process pool, only the worker processes load it - the parent
+process loads its own copy only if it has to embed a single batch. The workers are started with "spawn",
+so they don't inherit the thread pools of torch (forking a process after torch was loaded can deadlock),
+and the pool is shut down when the engine is closed or the process exits.
+
+# Install the packages in your Python env prior to running this example:
+# pip install sentence_transformers
+# pip install onnxruntime
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+
+PRECISION_FP32 = "fp32"
+PRECISION_FP16 = "fp16"
+PRECISION_INT8 = "int8"
+
+# ONNX exports of the sentence-transformers models are published in the "onnx" folder of the model repository.
+# The fp16 export (optimization level O4) only runs on CUDA
+ONNX_MODEL_FILES = {
+    PRECISION_FP32: "onnx/model.onnx",
+    PRECISION_FP16: "onnx/model_O4.onnx",
+    PRECISION_INT8: "onnx/model_quint8_avx2.onnx"
+}
+
+DEFAULT_BATCH_SIZE = 32
+# all-MiniLM-L6-v2 truncates input text to 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+# Engine used by the worker processes of the process pool - one per worker process
+worker_engine = None
+
+
+class EmbeddingEngine:
+
+    def __init__(self, model_name, batch_size=DEFAULT_BATCH_SIZE, num_workers=1,
+                 backend=BACKEND_TORCH, precision=PRECISION_FP32, threads=0):
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.backend = backend
+        self.precision = precision
+        self.threads = threads
+
+        if backend not in (BACKEND_TORCH, BACKEND_ONNX):
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+
+        # The model of this process and the process pool are created on the first call that needs them
+        self.model = None
+        self.session = None
+        self.tokenizer = None
+        self.embedding_dimension = None
+        self.pool = None
+        # The warm-up thread and the first requests (for example, two Streamlit sessions) can need the model
+        # at the same time. The lock makes sure that the model is loaded and the pool started only once
+        self.lock = threading.Lock()
+
+    def is_loaded(self):
+
+        return self.model is not None if self.backend == BACKEND_TORCH else self.session is not None
+
+    def load(self):
+
+        # Loads the model in this process, if it's not loaded yet
+        if self.is_loaded():
+            return
+
+        with self.lock:
+            if self.is_loaded():
+                return
+            print(f"Loading model: {self.model_name} ({self.backend}, {self.precision})")
+            if self.backend == BACKEND_TORCH:
+                self.model = load_torch_model(self.model_name)
+            else:
+                self.session, self.tokenizer = load_onnx_model(self.model_name, self.precision, self.threads)
+
+    @property
+    def dimension(self):
+
+        if self.embedding_dimension is None:
+            # The output shape of an ONNX export can be symbolic, so we get the dimension from a test embedding
+            self.embedding_dimension = self.embed_batch(["dimension"]).shape[-1]
+
+        return self.embedding_dimension
+
+    def embed(self, texts):
+
+        # Returns a (len(texts), dimension) float32 array. The output array is allocated once (when the first
+        # batch is done) and filled batch by batch, so we never hold more than one batch of intermediate model
+        # outputs in memory
+        import numpy as np
+
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+
+        if self.num_workers > 1 and len(batches) > 1:
+            results = self.get_pool().map(embed_batch_in_worker, batches)
+        else:
+            results = map(self.embed_batch, batches)
+
+        embeddings = None
+        start = 0
+        for batch_embeddings in results:
+            if embeddings is None:
+                self.embedding_dimension = batch_embeddings.shape[-1]
+                embeddings = np.empty((len(texts), self.embedding_dimension), dtype=np.float32)
+            embeddings[start:start + len(batch_embeddings)] = batch_embeddings
+            start += len(batch_embeddings)
+
+        return embeddings
+
+    def embed_batch(self, texts):
+
+        import numpy as np
+
+        self.load()
+        if self.backend == BACKEND_TORCH:
+            batch_embeddings = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+        else:
+            batch_embeddings = encode_with_onnx(self.session, self.tokenizer, texts)
+
+        return np.ascontiguousarray(batch_embeddings, dtype=np.float32)
+
+    def get_pool(self):
+
+        # Every worker process loads its own copy of the model, so we split the CPU cores between the workers
+        pool = self.pool
+        if pool is not None:
+            return pool
+
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.num_workers,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=init_worker,
+                                                initargs=(self.model_name, self.batch_size, self.backend,
+                                                          self.precision, self.num_workers))
+                atexit.register(self.close)
+
+            return self.pool
+
+    def close(self):
+
+        with self.lock:
+            pool = self.pool
+            self.pool = None
+        if pool is not None:
+            pool.shutdown()
+
+
+def load_torch_model(model_name):
+
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, device="cpu")
+
+def load_onnx_model(model_name, precision, threads=0):
+
+    import onnxruntime
+    from huggingface_hub import hf_hub_download
+    from transformers import AutoTokenizer
+
+    providers = ["CPUExecutionProvider"]
+    if precision == PRECISION_FP16:
+        if "CUDAExecutionProvider" not in onnxruntime.get_available_providers():
+            raise ValueError("The fp16 ONNX model runs on CUDA only (pip install onnxruntime-gpu). "
+                             "On CPU, use the int8 or fp32 precision")
+        providers = ["CUDAExecutionProvider"]
+
+    repo_id = model_name if "/" in model_name else "sentence-transformers/" + model_name
+    model_file = hf_hub_download(repo_id, ONNX_MODEL_FILES[precision])
+
+    options = onnxruntime.SessionOptions()
+    # 0 lets ONNX Runtime use all cores. Worker processes get their share of the cores
+    options.intra_op_num_threads = threads
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    session = onnxruntime.InferenceSession(model_file, options, providers=providers)
+    tokenizer = AutoTokenizer.from_pretrained(repo_id)
+
+    return session, tokenizer
+
+def encode_with_onnx(session, tokenizer, texts):
+
+    import numpy as np
+
+    tokens = tokenizer(texts, padding=True, truncation=True, max_length=MAX_SEQ_LENGTH, return_tensors="np")
+
+    # Feed only the inputs the exported model expects (some exports do not use token_type_ids)
+    input_names = [model_input.name for model_input in session.get_inputs()]
+    inputs = {name: tokens[name].astype(np.int64) for name in input_names}
+
+    token_embeddings = session.run(None, inputs)[0].astype(np.float32)
+
+    # Mean pooling over the non-padding tokens, then L2 normalization - same as the sentence-transformers model
+    mask = tokens["attention_mask"][..., np.newaxis].astype(np.float32)
+    embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+    return embeddings
+
+def init_worker(model_name, batch_size, backend, precision, num_workers):
+
+    threads = max(1, (os.cpu_count() or 1) // num_workers)
+
+    if backend == BACKEND_TORCH:
+        import torch
+        torch.set_num_threads(threads)
+
+    globals()["worker_engine"] = EmbeddingEngine(model_name, batch_size, 1, backend, precision, threads)
+    worker_engine.load()
+
+def embed_batch_in_worker(texts):
+
+    return worker_engine.embed_batch(texts)
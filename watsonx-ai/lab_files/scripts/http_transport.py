@@ -0,0 +1,199 @@
+"""
+This code sample shows how to share HTTP connections for REST invocations of watsonx.ai.
+
+requests.post() opens a new TCP (and TLS) connection for every call. The HTTPTransport keeps a pool of
+connections alive and reuses them for all requests of the process, with configurable pool size and timeouts.
+It also counts requests, new connections, errors and latency per host.
+
+HTTP/1.1 requests go through a requests.Session with a connection pool. HTTP/2 (optional) goes through
+httpx, which sends concurrent requests over one connection. Note that for HTTP/1.1 from many threads,
+the requests connection pool is faster than the httpx one. Streamed responses (server-sent events) are read
+with stream_lines(), which works the same way with both.
+
+# Install httpx and h2 in your Python env to use HTTP/2:
+# pip install httpx
+# pip install h2
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connections kept open per host. Set it to the number of threads that send requests at the same time
+POOL_SIZE = 100
+# Number of hosts with a connection pool
+MAX_HOSTS = 10
+CONNECT_TIMEOUT = 10
+# Generation of long responses can take a while
+READ_TIMEOUT = 120
+
+# Transport shared by the process - created in get_transport()
+shared_transport = None
+shared_transport_lock = threading.Lock()
+
+
+class HTTPTransport:
+
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 http2=False):
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = None
+        self.http2_client = None
+
+        if http2:
+            try:
+                # httpx raises ImportError for http2=True if h2 is not installed
+                import httpx
+                limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+                timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+                self.http2_client = httpx.Client(limits=limits, timeout=timeout, http2=True)
+            except ImportError:
+                print("HTTP/2 requires the httpx and h2 packages (pip install httpx h2). Using HTTP/1.1")
+
+        if self.http2_client is None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_HOSTS, pool_maxsize=pool_size)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+        self.metrics_lock = threading.Lock()
+        self.metrics = {}
+
+    def request(self, method, url, **kwargs):
+
+        # Returns a requests.Response (HTTP/1.1) or an httpx.Response (HTTP/2). Both have
+        # status_code, text and json()
+        host_metrics = self.get_host_metrics(urlsplit(url).netloc)
+
+        start = time.perf_counter()
+        try:
+            if self.http2_client is not None:
+                response = self.request_http2(method, url, host_metrics, **kwargs)
+            else:
+                response = self.session.request(method, url, timeout=kwargs.pop("timeout", self.timeout), **kwargs)
+        except Exception:
+            with self.metrics_lock:
+                host_metrics["errors"] += 1
+            raise
+        latency = time.perf_counter() - start
+
+        with self.metrics_lock:
+            host_metrics["requests"] += 1
+            host_metrics["total_latency"] += latency
+            if response.status_code >= 400:
+                host_metrics["errors"] += 1
+
+        return response
+
+    def request_http2(self, method, url, host_metrics, stream=False, **kwargs):
+
+        # httpx reports connection events through the "trace" extension - we count new TCP connections
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                with self.metrics_lock:
+                    host_metrics["new_connections"] += 1
+
+        # requests takes a request body as data, httpx as content
+        if isinstance(kwargs.get("data"), (str, bytes)):
+            kwargs["content"] = kwargs.pop("data")
+
+        request = self.http2_client.build_request(method, url, extensions={"trace": trace}, **kwargs)
+
+        return self.http2_client.send(request, stream=stream)
+
+    def stream_lines(self, method, url, **kwargs):
+
+        # Generator of the decoded lines of a streamed response. The body is read as it arrives, and the
+        # connection goes back to the pool when the generator is closed. Raises for error status codes
+        host_metrics = self.get_host_metrics(urlsplit(url).netloc)
+
+        start = time.perf_counter()
+        try:
+            if self.http2_client is not None:
+                response = self.request_http2(method, url, host_metrics, stream=True, **kwargs)
+            else:
+                response = self.session.request(method, url, timeout=kwargs.pop("timeout", self.timeout),
+                                                stream=True, **kwargs)
+        except Exception:
+            with self.metrics_lock:
+                host_metrics["errors"] += 1
+            raise
+        # Latency of a streamed request is the time to the response headers
+        latency = time.perf_counter() - start
+
+        with self.metrics_lock:
+            host_metrics["requests"] += 1
+            host_metrics["total_latency"] += latency
+            if response.status_code >= 400:
+                host_metrics["errors"] += 1
+
+        try:
+            if response.status_code >= 400 and self.http2_client is not None:
+                # httpx needs the body of a streamed response before raise_for_status() can include it
+                response.read()
+            response.raise_for_status()
+            if self.http2_client is not None:
+                yield from response.iter_lines()
+            else:
+                yield from response.iter_lines(decode_unicode=True)
+        finally:
+            response.close()
+
+    def post(self, url, **kwargs):
+
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+
+        return self.request("GET", url, **kwargs)
+
+    def get_host_metrics(self, host):
+
+        with self.metrics_lock:
+            return self.metrics.setdefault(host, {"requests": 0, "new_connections": 0, "errors": 0,
+                                                  "total_latency": 0.0})
+
+    def get_metrics(self):
+
+        # Per-host metrics. connection_reuse is the share of requests that didn't need a new connection
+        with self.metrics_lock:
+            metrics = {host: dict(host_metrics) for host, host_metrics in self.metrics.items()}
+
+        if self.session is not None:
+            # urllib3 counts the connections opened by each connection pool
+            for adapter in set(self.session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools[key]
+                    host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+                    if host in metrics:
+                        metrics[host]["new_connections"] += pool.num_connections
+
+        for host_metrics in metrics.values():
+            requests_count = host_metrics["requests"]
+            host_metrics["average_latency"] = host_metrics["total_latency"] / requests_count if requests_count else 0.0
+            host_metrics["connection_reuse"] = (1 - host_metrics["new_connections"] / requests_count
+                                                if requests_count else 0.0)
+
+        return metrics
+
+    def close(self):
+
+        if self.session is not None:
+            self.session.close()
+        if self.http2_client is not None:
+            self.http2_client.close()
+
+
+def get_transport(**kwargs):
+
+    # Returns the transport shared by the process. The settings are used when it's created by the first call
+    with shared_transport_lock:
+        if globals()["shared_transport"] is None:
+            globals()["shared_transport"] = HTTPTransport(**kwargs)
+
+        return globals()["shared_transport"]
@@ -0,0 +1,270 @@
+"""
+This code sample shows how to share IBM Cloud IAM access tokens across a process.
+
+REST invocations of watsonx.ai need an IAM access token. Requesting a new token for every invocation
+adds an authentication round trip to every request. The TokenManager caches the token and:
+- refreshes it in a background thread before it expires, so requests don't wait for authentication
+- makes only one token request when several threads (or coroutines) need a new token at the same time
+- counts token refreshes and measures authentication latency
+
+Run this module to try it against a local stub IAM server:
+# python iam_token.py
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+IAM_URL = "https://iam.cloud.ibm.com/identity/token"
+# The local stand-in of watsonx.ai (watsonx_stub_server.py) issues its own tokens. It's only used when
+# it's enabled explicitly with watsonx_stand_in=true in the .env file or the environment - otherwise
+# every url is treated as watsonx.ai, even a local one
+STAND_IN_SETTING = "watsonx_stand_in"
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1", "0.0.0.0")
+
+# Refresh the token in the background this many seconds before it expires (IAM tokens are valid for an hour).
+# For short-lived tokens, the token is refreshed after 80% of its lifetime
+REFRESH_MARGIN = 5 * 60
+# Tokens that expire within this many seconds are not returned to callers
+EXPIRY_SAFETY_MARGIN = 10
+
+# Token managers shared by the process, keyed by the API key and IAM URL
+token_managers = {}
+token_managers_lock = threading.Lock()
+
+
+class TokenManager:
+
+    def __init__(self, api_key, iam_url=IAM_URL, timeout=30, verify=True):
+
+        self.api_key = api_key
+        self.iam_url = iam_url
+        self.timeout = timeout
+        self.verify = verify
+
+        self.access_token = None
+        self.expiration = 0
+
+        self.lock = threading.Lock()
+        # Threads that need a token while another thread is requesting one wait for this condition
+        self.refresh_done = threading.Condition(self.lock)
+        self.refreshing = False
+        self.timer = None
+
+        self.metrics = {
+            "refresh_count": 0,
+            "background_refresh_count": 0,
+            "refresh_failures": 0,
+            "last_auth_latency": 0.0,
+            "max_auth_latency": 0.0,
+            "total_auth_latency": 0.0
+        }
+
+    def get_cached_token(self):
+
+        # Returns the cached token if it's still valid, otherwise None. The caller must hold the lock
+        if self.access_token and time.time() < self.expiration - EXPIRY_SAFETY_MARGIN:
+            return self.access_token
+
+        return None
+
+    def get_token(self):
+
+        with self.lock:
+            while True:
+                token = self.get_cached_token()
+                if token:
+                    return token
+                # Single flight: only one thread requests the token, the others wait for its result
+                if not self.refreshing:
+                    self.refreshing = True
+                    break
+                self.refresh_done.wait()
+
+        return self.refresh()
+
+    async def get_token_async(self):
+
+        # The cached token is returned without leaving the event loop. A new token is requested
+        # in a worker thread, so the event loop is not blocked during authentication
+        with self.lock:
+            token = self.get_cached_token()
+        if token:
+            return token
+
+        return await asyncio.to_thread(self.get_token)
+
+    def refresh(self):
+
+        # Must only be called by the thread that set self.refreshing
+        start = time.perf_counter()
+        try:
+            response = requests.post(
+                self.iam_url,
+                headers={"Content-Type": "application/x-www-form-urlencoded", "Accept": "application/json"},
+                data={"grant_type": "urn:ibm:params:oauth:grant-type:apikey", "apikey": self.api_key},
+                timeout=self.timeout,
+                verify=self.verify)
+            response.raise_for_status()
+            token = response.json()
+            # A response without a token fails here, while the waiting threads can still be released
+            access_token = token["access_token"]
+            expiration = token["expiration"]
+        except Exception:
+            with self.lock:
+                self.metrics["refresh_failures"] += 1
+                self.refreshing = False
+                self.refresh_done.notify_all()
+            raise
+
+        latency = time.perf_counter() - start
+
+        with self.lock:
+            self.access_token = access_token
+            self.expiration = expiration
+            self.metrics["refresh_count"] += 1
+            self.metrics["last_auth_latency"] = latency
+            self.metrics["max_auth_latency"] = max(self.metrics["max_auth_latency"], latency)
+            self.metrics["total_auth_latency"] += latency
+            self.refreshing = False
+            self.refresh_done.notify_all()
+            self.schedule_refresh(token.get("expires_in", self.expiration - time.time()))
+
+        return self.access_token
+
+    def schedule_refresh(self, expires_in):
+
+        # Must be called with the lock held
+        if self.timer is not None:
+            self.timer.cancel()
+
+        margin = min(REFRESH_MARGIN, 0.2 * expires_in)
+        delay = max(0.0, self.expiration - margin - time.time())
+        self.timer = threading.Timer(delay, self.background_refresh)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def background_refresh(self):
+
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+            self.metrics["background_refresh_count"] += 1
+
+        try:
+            self.refresh()
+        except Exception as e:
+            # The token is still valid for a while, the next get_token() call will retry
+            print(f"Background refresh of the access token failed: {str(e)}")
+
+    def get_metrics(self):
+
+        with self.lock:
+            metrics = dict(self.metrics)
+
+        refreshes = metrics["refresh_count"]
+        metrics["average_auth_latency"] = metrics["total_auth_latency"] / refreshes if refreshes else 0.0
+
+        return metrics
+
+    def close(self):
+
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+
+def get_token_manager(api_key, iam_url=IAM_URL, verify=True):
+
+    # Returns the token manager shared by the process for this API key
+    key = (api_key, iam_url, verify)
+    with token_managers_lock:
+        if key not in token_managers:
+            token_managers[key] = TokenManager(api_key, iam_url, verify=verify)
+
+        return token_managers[key]
+
+def is_stand_in_enabled():
+
+    # The setting is read on every call, because the scripts load the .env file after the imports
+    return os.getenv(STAND_IN_SETTING, "").strip().lower() in ("true", "yes", "1")
+
+def get_iam_url(url):
+
+    # IAM URL for the watsonx.ai url: IBM Cloud IAM, or the token endpoint of the local stand-in
+    # when the stand-in is enabled and the url is a local address
+    if is_stand_in_enabled() and url and urlsplit(url).hostname in LOCAL_HOSTS:
+        return url.rstrip("/") + "/identity/token"
+
+    return IAM_URL
+
+def start_stub_iam_server(token_lifetime, latency):
+
+    # Local stand-in for the IAM token endpoint that issues short-lived tokens
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    issued = {"count": 0}
+
+    class StubIAMHandler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            issued["count"] += 1
+            body = json.dumps({
+                "access_token": f"stub-token-{issued['count']}",
+                "token_type": "Bearer",
+                "expires_in": token_lifetime,
+                "expiration": int(time.time()) + token_lifetime
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubIAMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, issued
+
+def main():
+
+    # Tokens issued by the stub expire after 30 seconds, and the stub takes 200 ms to respond
+    server, issued = start_stub_iam_server(token_lifetime=30, latency=0.2)
+    manager = TokenManager("stub-api-key", f"http://127.0.0.1:{server.server_port}/identity/token")
+
+    # 50 threads need a token at the same time - only one request is sent to IAM
+    threads = [threading.Thread(target=manager.get_token) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"Tokens issued for 50 concurrent threads: {issued['count']}")
+
+    # 50 coroutines - the cached token is returned without a request
+    async def get_tokens():
+        return await asyncio.gather(*[manager.get_token_async() for _ in range(50)])
+    asyncio.run(get_tokens())
+    print(f"Tokens issued after 50 concurrent coroutines: {issued['count']}")
+
+    # The token is refreshed in the background after 80% of its lifetime (24 seconds)
+    time.sleep(26)
+    print(f"Tokens issued after the background refresh: {issued['count']}")
+    print("Token manager metrics: " + str(manager.get_metrics()))
+
+    manager.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
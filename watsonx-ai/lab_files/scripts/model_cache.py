@@ -0,0 +1,144 @@
+"""
+This code sample shows how to reuse watsonx.ai Model objects across requests.
+
+Creating a Model object authenticates with IBM Cloud and validates the model id with watsonx.ai, which
+takes several round trips. The cache keeps Model objects keyed by the model id, generation parameters,
+credentials and project, so that a repeated request with the same settings skips all of that setup.
+Generations of the cached models have a deadline and are retried if they fail (see resilience.py).
+The cache is thread-safe, evicts the least recently used models when it's full, checks the health of
+cached models periodically and counts hits and misses.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Deadlines, retries and hedging of generations
+import resilience
+
+MAX_MODELS = 32
+
+# Cached models that haven't been checked for this many seconds are checked before they're returned
+HEALTH_CHECK_INTERVAL = 15 * 60
+
+# Cached models: key -> [model, time of the last health check]
+models = OrderedDict()
+cache_lock = threading.Lock()
+# One lock per key, so that a model is created only once even if several threads request it at the same time:
+# key -> [lock, number of threads using the lock]. A lock is removed when no thread uses it and its model
+# is not cached
+key_locks = {}
+
+stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "health_check_failures": 0
+}
+
+def get_value(value):
+
+    # Enums (ModelTypes, DecodingMethods) are compared by value, lists (stop sequences) are made hashable
+    value = getattr(value, "value", value)
+    if isinstance(value, list):
+        return tuple(get_value(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((name, get_value(item)) for name, item in value.items()))
+
+    return value
+
+def get_key(model_id, params, credentials, project_id):
+
+    # The API key is part of the key as a hash, so it's not kept in the cache in plain text
+    api_key_hash = hashlib.sha256(str(credentials.get("apikey")).encode("utf-8")).hexdigest()
+
+    return (get_value(model_id), get_value(params or {}), api_key_hash, credentials.get("url"), project_id)
+
+def is_healthy(model):
+
+    # Getting the model details is a lightweight call that fails if the credentials or the model are no longer valid
+    try:
+        model.get_details()
+        return True
+    except Exception as e:
+        print(f"Cached model failed the health check: {str(e)}")
+        return False
+
+def get_model(model_id, params, credentials, project_id):
+
+    key = get_key(model_id, params, credentials, project_id)
+
+    with cache_lock:
+        key_lock_entry = key_locks.setdefault(key, [threading.Lock(), 0])
+        key_lock_entry[1] += 1
+
+    try:
+        return get_model_with_key_lock(key, key_lock_entry[0], model_id, params, credentials, project_id)
+    finally:
+        with cache_lock:
+            key_lock_entry[1] -= 1
+            if key_lock_entry[1] == 0 and key not in models:
+                key_locks.pop(key, None)
+
+def get_model_with_key_lock(key, key_lock, model_id, params, credentials, project_id):
+
+    with key_lock:
+        with cache_lock:
+            entry = models.get(key)
+            if entry is not None:
+                models.move_to_end(key)
+
+        if entry is not None and time.monotonic() - entry[1] > HEALTH_CHECK_INTERVAL:
+            if is_healthy(entry[0]):
+                entry[1] = time.monotonic()
+            else:
+                with cache_lock:
+                    stats["health_check_failures"] += 1
+                    models.pop(key, None)
+                entry = None
+
+        if entry is not None:
+            with cache_lock:
+                stats["hits"] += 1
+            return entry[0]
+
+        # Create the model outside of the cache lock, because it takes several round trips.
+        # The SDK only connects to IBM Cloud, so a local stand-in is called with the REST API.
+        # Both are imported here, so that importing the scripts doesn't load the SDK
+        from ibm_watsonx_ai.foundation_models import Model
+        import rest_model
+        model_class = rest_model.RESTModel if rest_model.is_local_url(credentials.get("url")) else Model
+        model = resilience.ResilientModel(model_class(model_id=model_id, params=params, credentials=credentials,
+                                                      project_id=project_id))
+
+        with cache_lock:
+            stats["misses"] += 1
+            models[key] = [model, time.monotonic()]
+            while len(models) > MAX_MODELS:
+                evicted_key, _ = models.popitem(last=False)
+                # The lock of a key stays while other threads use it - they'd create the model twice otherwise
+                if key_locks.get(evicted_key, [None, 1])[1] == 0:
+                    key_locks.pop(evicted_key)
+                stats["evictions"] += 1
+
+    return model
+
+def invalidate(model_id, params, credentials, project_id):
+
+    # Remove a model from the cache, for example after an authentication error
+    with cache_lock:
+        models.pop(get_key(model_id, params, credentials, project_id), None)
+
+def get_stats():
+
+    with cache_lock:
+        requests = stats["hits"] + stats["misses"]
+        return dict(stats, size=len(models), hit_ratio=stats["hits"] / requests if requests else 0.0)
+
+def clear():
+
+    with cache_lock:
+        models.clear()
+        for key in [key for key, key_lock_entry in key_locks.items() if key_lock_entry[1] == 0]:
+            key_locks.pop(key)
@@ -0,0 +1,80 @@
+"""
+This code sample shows how to share local models (embedding models, spaCy pipelines) across a process.
+
+Models are loaded lazily, the first time they're used, and only once per process. Loading torch and
+a sentence-transformers model takes seconds, so modules that use models should not load them at import time.
+Call warm_up() at application startup (for example, in a background thread) to load the models
+before the first request needs them.
+
+Embedding engines are shared through the registry too, but they load their model themselves, on the first
+embedding (see embedding_engine.py) - the engine makes sure that happens only once.
+"""
+
+import threading
+
+import embedding_engine
+
+# Loaded models, keyed by the model name and its settings
+models = {}
+# Protects the models dictionary and the per-model locks
+registry_lock = threading.Lock()
+# One lock per model, so that a model is loaded only once even if several threads request it at the same time
+model_locks = {}
+
+def get_or_create(key, factory):
+
+    # Fast path - the object has already been created
+    model = models.get(key)
+    if model is not None:
+        return model
+
+    with registry_lock:
+        model_lock = model_locks.setdefault(key, threading.Lock())
+
+    # Other threads requesting the same object wait here until the first thread has created it
+    with model_lock:
+        model = models.get(key)
+        if model is None:
+            model = factory()
+            models[key] = model
+
+    return model
+
+def get_or_load(key, loader):
+
+    # Same as get_or_create() for a loader that loads the model right away
+    def load():
+        print("Loading model: " + str(key))
+        return loader()
+
+    return get_or_create(key, load)
+
+def get_embedding_engine(model_name, batch_size=embedding_engine.DEFAULT_BATCH_SIZE, num_workers=1,
+                         backend=embedding_engine.BACKEND_TORCH, precision=embedding_engine.PRECISION_FP32):
+
+    key = ("embedding", model_name, batch_size, num_workers, backend, precision)
+
+    # Creating the engine is cheap - the engine loads the model on first use, once (see EmbeddingEngine.load)
+    return get_or_create(key, lambda: embedding_engine.EmbeddingEngine(model_name,
+                                                                     batch_size=batch_size,
+                                                                     num_workers=num_workers,
+                                                                     backend=backend,
+                                                                     precision=precision))
+
+def get_spacy_pipeline(model_name):
+
+    def load():
+        import spacy
+        return spacy.load(model_name)
+
+    return get_or_load(("spacy", model_name), load)
+
+def warm_up(model_name, batch_size=embedding_engine.DEFAULT_BATCH_SIZE, num_workers=1,
+            backend=embedding_engine.BACKEND_TORCH, precision=embedding_engine.PRECISION_FP32):
+
+    # Load the embedding model and run one embedding, so that the first request doesn't pay for
+    # model loading or for the lazy initialization that happens inside torch/ONNX Runtime on the first call
+    engine = get_embedding_engine(model_name, batch_size, num_workers, backend, precision)
+    engine.embed(["warm up"])
+
+    return engine
@@ -0,0 +1,361 @@
+"""
+This code sample shows how to stay within the rate limits of watsonx.ai when generations run in parallel.
+
+watsonx.ai rejects requests above the quota of a project with HTTP 429 (Too Many Requests), and an overloaded
+model can answer with HTTP 503. The ConcurrencyController schedules generations on the client side:
+- a token bucket per project caps the request rate (requests per second)
+- a concurrency window per model limits the requests in flight. The window grows by one request for every
+  window of successful requests and is halved when a request is throttled (additive increase,
+  multiplicative decrease - AIMD), so it settles just below the quota without manual tuning.
+  Near the window size that was throttled last, the window grows slowly
+- a throttled request is retried after the delay in the Retry-After header (if the server sent one),
+  while the other requests go on within the smaller window. Other errors (timeouts, HTTP 500, ...) leave
+  the window as it is
+The controller reports the requests in flight and the window size of every model. Threads call call(),
+coroutines call call_async() - both share the same quotas.
+"""
+
+import email.utils
+import threading
+import time
+
+# The project (or space) of a model is found the same way as for the response cache
+import response_cache
+
+# Requests per second allowed for a project. Set the quota of your plan in PROJECT_RATES
+DEFAULT_PROJECT_RATE = 8
+PROJECT_RATES = {}
+
+# Concurrent requests per model: start with INITIAL_WINDOW and never go above the model's maximum
+INITIAL_WINDOW = 4
+DEFAULT_MAX_WINDOW = 32
+MODEL_MAX_WINDOWS = {}
+MIN_WINDOW = 1
+# The window is multiplied by this factor when a request is throttled
+WINDOW_DECREASE = 0.5
+# Every throttled request costs a Retry-After pause, so near the window size that was throttled last
+# the window grows this many times slower
+CAUTIOUS_INCREASE = 0.1
+
+# HTTP status codes that mean "slow down"
+THROTTLE_STATUS_CODES = (429, 503)
+# Throttled requests are retried up to this many times
+MAX_THROTTLE_RETRIES = 5
+# Delay before a retry when the server didn't send Retry-After
+DEFAULT_RETRY_AFTER = 1.0
+# Coroutines waiting for a slot in a full window check it this often (in seconds)
+ASYNC_POLL_INTERVAL = 0.01
+
+# Controller shared by the process - created in get_controller()
+shared_controller = None
+shared_controller_lock = threading.Lock()
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst=1):
+
+        # Quotas are counted per second, so by default requests are spread evenly instead of sent in bursts
+        self.rate = rate
+        self.burst = burst
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+
+        # Takes a token and returns the time to wait until it's available. A caller that has to wait
+        # reserves its token (the balance goes negative), so callers are served in order
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def acquire(self):
+
+        # Takes a token, waiting until one is available
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AIMDWindow:
+
+    def __init__(self, initial=INITIAL_WINDOW, maximum=DEFAULT_MAX_WINDOW, minimum=MIN_WINDOW):
+
+        self.window = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+
+        self.in_flight = 0
+        # Throttled requests that started before the last decrease don't decrease the window again
+        self.last_decrease = 0.0
+        # Number of requests in flight when a request was throttled last
+        self.ceiling = None
+        self.condition = threading.Condition()
+
+        self.successes = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def acquire(self):
+
+        # Waits for a free slot in the window. Returns the start time of the request
+        with self.condition:
+            while self.in_flight >= int(self.window):
+                self.condition.wait()
+            self.in_flight += 1
+
+            return time.monotonic()
+
+    def try_acquire(self):
+
+        # Takes a free slot without waiting. Returns the start time of the request, or None if the window is full
+        with self.condition:
+            if self.in_flight >= int(self.window):
+                return None
+            self.in_flight += 1
+
+            return time.monotonic()
+
+    async def acquire_async(self):
+
+        # Waits for a free slot without blocking the event loop. Threads share the window,
+        # so coroutines poll it instead of waiting on the condition
+        import asyncio
+
+        while True:
+            start = self.try_acquire()
+            if start is not None:
+                return start
+            await asyncio.sleep(ASYNC_POLL_INTERVAL)
+
+    def release(self, start, throttled=False, failed=False):
+
+        # failed - the request failed for another reason than throttling. It says nothing about the quota,
+        # so the window neither grows nor shrinks
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if failed and not throttled:
+                self.errors += 1
+            elif throttled:
+                self.throttled += 1
+                self.ceiling = self.in_flight + 1
+                if start >= self.last_decrease:
+                    self.window = max(self.minimum, self.window * WINDOW_DECREASE)
+                    self.last_decrease = now
+            else:
+                self.successes += 1
+                # One more slot for every window of successful requests
+                increase = 1 / self.window
+                if self.ceiling is not None:
+                    if self.window + 1 >= self.ceiling:
+                        increase *= CAUTIOUS_INCREASE
+                    if self.window > self.ceiling + 1:
+                        # The quota went up - forget the old ceiling
+                        self.ceiling = None
+                self.window = min(self.maximum, self.window + increase)
+
+            self.condition.notify_all()
+
+
+class ConcurrencyController:
+
+    def __init__(self, project_rates=None, model_max_windows=None, initial_window=INITIAL_WINDOW):
+
+        self.project_rates = PROJECT_RATES if project_rates is None else project_rates
+        self.model_max_windows = MODEL_MAX_WINDOWS if model_max_windows is None else model_max_windows
+        self.initial_window = initial_window
+
+        # project id -> TokenBucket
+        self.buckets = {}
+        # (project id, model id) -> AIMDWindow
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def get_bucket(self, project_id):
+
+        with self.lock:
+            if project_id not in self.buckets:
+                self.buckets[project_id] = TokenBucket(self.project_rates.get(project_id, DEFAULT_PROJECT_RATE))
+
+            return self.buckets[project_id]
+
+    def get_window(self, project_id, model_id):
+
+        key = (project_id, model_id)
+        with self.lock:
+            if key not in self.windows:
+                maximum = self.model_max_windows.get(model_id, DEFAULT_MAX_WINDOW)
+                self.windows[key] = AIMDWindow(min(self.initial_window, maximum), maximum)
+
+            return self.windows[key]
+
+    def call(self, project_id, model_id, function):
+
+        # Runs function() (a request to watsonx.ai) within the quotas of the project and the model
+        bucket = self.get_bucket(project_id)
+        window = self.get_window(project_id, model_id)
+
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            start = window.acquire()
+            bucket.acquire()
+            try:
+                result = function()
+            except Exception as e:
+                throttled, retry_after = get_throttling(e)
+                window.release(start, throttled, failed=True)
+                if not throttled or attempt == MAX_THROTTLE_RETRIES:
+                    raise
+                print(f"Request to {model_id} was throttled, retrying in {retry_after:.1f} s (attempt {attempt + 1})")
+                time.sleep(retry_after)
+                continue
+
+            window.release(start)
+            return result
+
+    async def call_async(self, project_id, model_id, function):
+
+        # Same as call() for coroutines: awaits function() (a coroutine function that sends a request
+        # to watsonx.ai) within the quotas of the project and the model. asyncio is imported here - the event loop
+        # has loaded it already, and the threads that call call() don't need it
+        import asyncio
+
+        bucket = self.get_bucket(project_id)
+        window = self.get_window(project_id, model_id)
+
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            start = await window.acquire_async()
+            try:
+                wait = bucket.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                result = await function()
+            except asyncio.CancelledError:
+                # The slot of a cancelled request is given back
+                window.release(start, failed=True)
+                raise
+            except Exception as e:
+                throttled, retry_after = get_throttling(e)
+                window.release(start, throttled, failed=True)
+                if not throttled or attempt == MAX_THROTTLE_RETRIES:
+                    raise
+                print(f"Request to {model_id} was throttled, retrying in {retry_after:.1f} s (attempt {attempt + 1})")
+                await asyncio.sleep(retry_after)
+                continue
+
+            window.release(start)
+            return result
+
+    def get_gauges(self):
+
+        # Live values for every model: requests in flight, window size and counters
+        with self.lock:
+            windows = dict(self.windows)
+
+        gauges = {}
+        for (project_id, model_id), window in windows.items():
+            with window.condition:
+                gauges[(project_id, model_id)] = {
+                    "in_flight": window.in_flight,
+                    "window": window.window,
+                    "ceiling": window.ceiling,
+                    "successes": window.successes,
+                    "throttled": window.throttled,
+                    "errors": window.errors
+                }
+
+        return gauges
+
+
+class RateLimitedModel:
+
+    # Wraps a watsonx.ai Model object so that its generations go through the controller.
+    # Other attributes (model_id, params, ...) are the attributes of the wrapped model
+
+    def __init__(self, model, controller=None, project_id=None):
+
+        self.model = model
+        self.controller = controller or get_controller()
+        # The quota is per project: a Model of the SDK keeps its project (or space) in its API client,
+        # a RESTModel has it as an attribute
+        self.project_id = project_id or response_cache.get_scope(model)[1]
+        if self.project_id is None:
+            raise ValueError("The project or space of the model is unknown, pass project_id to RateLimitedModel")
+
+    def generate(self, prompt, params=None):
+
+        return self.controller.call(self.project_id, get_value(self.model.model_id),
+                                    lambda: self.model.generate(prompt=prompt, params=params))
+
+    def __getattr__(self, name):
+
+        return getattr(self.model, name)
+
+
+def get_value(value):
+
+    # Enums (ModelTypes) are keyed by value
+    return getattr(value, "value", value)
+
+def get_response(error):
+
+    # Returns the HTTP response of an exception raised by a request, or None. requests and httpx errors
+    # have it, and so do the request failures of the watsonx.ai SDK (ApiRequestFailure). An error that
+    # wraps another one is searched through its cause
+    while error is not None:
+        response = getattr(error, "response", None)
+        if getattr(response, "status_code", None) is not None:
+            return response
+        error = error.__cause__
+
+    return None
+
+def get_status_code(error):
+
+    # Returns the HTTP status code of an exception raised by a request, or None (no response - for example,
+    # a timeout or a connection error)
+    response = get_response(error)
+    status = response.status_code if response is not None else getattr(error, "status_code", None)
+
+    return int(status) if status is not None else None
+
+def get_throttling(error):
+
+    # Returns (throttled, Retry-After in seconds) for an exception raised by a request
+    if get_status_code(error) not in THROTTLE_STATUS_CODES:
+        return False, None
+
+    response = get_response(error)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = parse_retry_after(headers.get("Retry-After"))
+
+    return True, DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+
+def parse_retry_after(value):
+
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def get_controller():
+
+    # Returns the controller shared by the process, so all threads share the quotas
+    with shared_controller_lock:
+        if globals()["shared_controller"] is None:
+            globals()["shared_controller"] = ConcurrencyController()
+
+        return globals()["shared_controller"]
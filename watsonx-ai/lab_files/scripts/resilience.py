@@ -0,0 +1,337 @@
+"""
+This code sample shows how to protect LLM invocations from slow and failing requests.
+
+One slow replica or a dropped connection shouldn't turn into a long wait for the user. call() runs an
+invocation of watsonx.ai with:
+- a deadline for the whole call, including retries
+- retries of transient failures (timeouts, connection errors, HTTP 500/502/504) with exponential backoff
+  and full jitter, so that retries of many clients don't arrive at the same time
+- optional hedging: if the request is still running after the 95th percentile of the recent latencies
+  of the same operation, a duplicate request is sent and the first response wins
+
+Generations are idempotent (they don't change anything in watsonx.ai), so they can be retried and hedged.
+Throttling (HTTP 429/503) is not retried here - the rate limiter slows down and retries throttled requests.
+call_async() applies the same policy to coroutines (see async_generation.py).
+
+The SDK calls are blocking and can't be interrupted, so every attempt runs in its own thread - attempts
+never wait for a free worker. A request that loses a hedge or misses the deadline is abandoned: its response
+is ignored. Abandoned requests still run, so they are bounded per operation: while MAX_ABANDONED requests of
+an operation are still running, its calls are not hedged and attempts that missed their timeout are not retried.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+# Status codes of the responses attached to request errors
+import rate_limiter
+
+# Deadline of a call, including retries
+DEFAULT_DEADLINE = 60
+MAX_RETRIES = 2
+# Backoff before retry n is a random delay between 0 and min(MAX_BACKOFF, BASE_BACKOFF * 2 ** n)
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 8
+
+# HTTP status codes of transient server errors
+RETRYABLE_STATUS_CODES = (408, 500, 502, 504)
+
+# Hedging uses the latencies of the last LATENCY_WINDOW successful requests of the same operation,
+# once there are at least MIN_LATENCY_SAMPLES
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+HEDGE_PERCENTILE = 0.95
+
+# Hedge generations of the watsonx.ai Model objects (prompt template deployments are always hedged)
+HEDGE_GENERATIONS = False
+
+# Abandoned requests of an operation that may still be running before hedges and retries of timed out
+# attempts stop
+MAX_ABANDONED = 8
+
+# Statistics of every operation: name -> OperationStats
+operations = {}
+operations_lock = threading.Lock()
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class OperationStats:
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        # Abandoned requests that are still running
+        self.abandoned = 0
+        self.counters = {
+            "calls": 0,
+            "failures": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedges_won": 0,
+            "deadline_exceeded": 0
+        }
+
+    def count(self, name):
+
+        with self.lock:
+            self.counters[name] += 1
+
+    def add_latency(self, latency):
+
+        with self.lock:
+            self.latencies.append(latency)
+
+    def abandon(self, future):
+
+        # The request keeps running in its thread until it's done
+        with self.lock:
+            self.abandoned += 1
+        future.add_done_callback(self.abandoned_done)
+
+    def abandoned_done(self, future):
+
+        with self.lock:
+            self.abandoned -= 1
+
+    def is_overloaded(self):
+
+        with self.lock:
+            return self.abandoned >= MAX_ABANDONED
+
+    def get_percentile(self, percentile):
+
+        # Returns None until there are enough samples
+        with self.lock:
+            if len(self.latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            latencies = sorted(self.latencies)
+
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+
+class ResilientModel:
+
+    # Wraps a watsonx.ai Model object so that its generations go through call().
+    # Other attributes (model_id, params, ...) are the attributes of the wrapped model
+
+    def __init__(self, model, deadline=DEFAULT_DEADLINE, hedge=None):
+
+        self.model = model
+        self.deadline = deadline
+        self.hedge = HEDGE_GENERATIONS if hedge is None else hedge
+
+    def generate(self, prompt, params=None):
+
+        return call(lambda: self.model.generate(prompt=prompt, params=params),
+                    name="generate:" + str(getattr(self.model.model_id, "value", self.model.model_id)),
+                    deadline=self.deadline, hedge=self.hedge)
+
+    def __getattr__(self, name):
+
+        return getattr(self.model, name)
+
+
+def get_operation(name):
+
+    with operations_lock:
+        if name not in operations:
+            operations[name] = OperationStats()
+
+        return operations[name]
+
+def is_retryable(error):
+
+    if isinstance(error, TimeoutError):
+        return True
+
+    # From the response of the request - requests, httpx and the watsonx.ai SDK attach it to their errors
+    status = rate_limiter.get_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+
+    # Connection errors (requests exceptions are OSErrors as well)
+    return isinstance(error, (ConnectionError, OSError))
+
+def submit(function, stats):
+
+    start = time.monotonic()
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="resilience", daemon=True).start()
+
+    # Latencies of all successful requests, including abandoned ones, so that the percentile shows the real tail
+    def record(future):
+        if not future.cancelled() and future.exception() is None:
+            stats.add_latency(time.monotonic() - start)
+
+    future.add_done_callback(record)
+
+    return future
+
+def run_attempt(function, stats, timeout, hedge):
+
+    start = time.monotonic()
+    primary = submit(function, stats)
+    pending = {primary}
+
+    hedge_delay = stats.get_percentile(HEDGE_PERCENTILE) if hedge and not stats.is_overloaded() else None
+    if hedge_delay is not None and hedge_delay < timeout:
+        done, _ = wait(pending, timeout=hedge_delay)
+        if not done:
+            pending.add(submit(function, stats))
+            stats.count("hedges")
+
+    error = None
+    while pending:
+        remaining = timeout - (time.monotonic() - start)
+        done, pending = wait(pending, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                # The first response wins. Requests that haven't started are cancelled,
+                # running requests are abandoned
+                for other in pending:
+                    if not other.cancel():
+                        stats.abandon(other)
+                if future is not primary:
+                    stats.count("hedges_won")
+                return future.result()
+            error = future.exception()
+
+    if pending:
+        for other in pending:
+            if not other.cancel():
+                stats.abandon(other)
+        raise DeadlineExceeded(f"No response within {timeout:.1f} s")
+
+    raise error
+
+def call(function, name, deadline=DEFAULT_DEADLINE, max_retries=MAX_RETRIES, hedge=False, attempt_timeout=None):
+
+    # Runs function() (an idempotent request to watsonx.ai) and returns its result.
+    # attempt_timeout limits a single attempt, so a slow attempt is retried while there's time left
+    stats = get_operation(name)
+    stats.count("calls")
+    end = time.monotonic() + deadline
+
+    attempt = 0
+    while True:
+        remaining = end - time.monotonic()
+        try:
+            return run_attempt(function, stats, min(remaining, attempt_timeout or remaining), hedge)
+        except Exception as e:
+            remaining = end - time.monotonic()
+            backoff = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+            # Every timed out attempt leaves an abandoned request behind
+            overloaded = isinstance(e, DeadlineExceeded) and stats.is_overloaded()
+            if not is_retryable(e) or overloaded or attempt >= max_retries or backoff >= remaining:
+                stats.count("deadline_exceeded" if remaining <= 0 or isinstance(e, DeadlineExceeded)
+                            else "failures")
+                raise
+            print(f"{name} failed ({str(e)}), retrying in {backoff:.2f} s")
+            stats.count("retries")
+            time.sleep(backoff)
+            attempt += 1
+
+async def run_attempt_async(function, stats, timeout, hedge):
+
+    # Same as run_attempt() for coroutines. Coroutines can be cancelled, so the requests that lose a hedge
+    # or miss the deadline are cancelled instead of abandoned
+    import asyncio
+
+    async def run():
+        start = time.monotonic()
+        result = await function()
+        stats.add_latency(time.monotonic() - start)
+        return result
+
+    start = time.monotonic()
+    primary = asyncio.ensure_future(run())
+    pending = {primary}
+
+    try:
+        hedge_delay = stats.get_percentile(HEDGE_PERCENTILE) if hedge else None
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                pending.add(asyncio.ensure_future(run()))
+                stats.count("hedges")
+
+        error = None
+        while pending:
+            remaining = timeout - (time.monotonic() - start)
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, remaining),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"No response within {timeout:.1f} s")
+            # The first response wins
+            succeeded = [task for task in done if task.exception() is None]
+            if succeeded:
+                if succeeded[0] is not primary:
+                    stats.count("hedges_won")
+                return succeeded[0].result()
+            error = next(iter(done)).exception()
+
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def call_async(function, name, deadline=DEFAULT_DEADLINE, max_retries=MAX_RETRIES, hedge=False,
+                     attempt_timeout=None):
+
+    # Same as call() for coroutines: awaits function() (a coroutine function that sends an idempotent request
+    # to watsonx.ai) with the same deadline, retries and hedging. The statistics of an operation are shared
+    # with call(), so sync and async requests hedge on the same latencies
+    import asyncio
+
+    stats = get_operation(name)
+    stats.count("calls")
+    end = time.monotonic() + deadline
+
+    attempt = 0
+    while True:
+        remaining = end - time.monotonic()
+        try:
+            return await run_attempt_async(function, stats, min(remaining, attempt_timeout or remaining), hedge)
+        except Exception as e:
+            remaining = end - time.monotonic()
+            backoff = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+            if not is_retryable(e) or attempt >= max_retries or backoff >= remaining:
+                stats.count("deadline_exceeded" if remaining <= 0 or isinstance(e, DeadlineExceeded)
+                            else "failures")
+                raise
+            print(f"{name} failed ({str(e)}), retrying in {backoff:.2f} s")
+            stats.count("retries")
+            await asyncio.sleep(backoff)
+            attempt += 1
+
+def get_metrics():
+
+    # Counters and latency percentiles of every operation
+    with operations_lock:
+        items = list(operations.items())
+
+    metrics = {}
+    for name, stats in items:
+        with stats.lock:
+            metrics[name] = dict(stats.counters, abandoned_running=stats.abandoned)
+        metrics[name]["p50"] = stats.get_percentile(0.5)
+        metrics[name]["p95"] = stats.get_percentile(0.95)
+
+    return metrics
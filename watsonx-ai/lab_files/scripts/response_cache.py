@@ -0,0 +1,263 @@
+"""
+This code sample shows how to cache LLM responses of deterministic generations.
+
+With greedy decoding, the same model, parameters and prompt always generate the same text. The response
+cache stores the responses of watsonx.ai in SQLite, keyed by a hash of the watsonx.ai url, the project
+(or space), the model id, parameters and prompt - projects and regions never share responses - so a repeated
+request is answered from disk (or from memory) without calling the model. Generations with sample decoding
+are random and are never cached.
+
+Entries expire after TTL seconds, and the least recently used entries are evicted when the cache is
+larger than MAX_BYTES. The cache counts hits, misses and bypassed (not cacheable) requests.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# The cache file is shared by all scripts in this folder and survives restarts
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.db")
+
+# Entries expire after a week - models are updated from time to time
+TTL = 7 * 24 * 60 * 60
+# Maximum size of the cached responses on disk
+MAX_BYTES = 64 * 1024 * 1024
+# Most recently used responses are also kept in memory, so repeated requests don't read the disk
+MEMORY_ENTRIES = 256
+
+# Decoding methods that always generate the same response for the same prompt
+DETERMINISTIC_DECODING_METHODS = ("greedy",)
+
+# Cache shared by the process - created in get_cache()
+shared_cache = None
+shared_cache_lock = threading.Lock()
+
+
+class ResponseCache:
+
+    def __init__(self, path=None, ttl=None, max_bytes=None, memory_entries=None):
+
+        # The module settings are read here (not bound as default arguments), so that benchmarks and tests
+        # can change them, for example point CACHE_PATH to a temporary file
+        path = path or CACHE_PATH
+        self.ttl = TTL if ttl is None else ttl
+        self.max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+        self.memory_entries = MEMORY_ENTRIES if memory_entries is None else memory_entries
+
+        # Streamlit serves each user session in its own thread, so the connection is shared and locked
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # Write-ahead logging lets other processes read the cache while it's being written
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, "
+                                "size INTEGER, created REAL, last_access REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.connection.commit()
+        self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        # key -> (response, creation time)
+        self.memory = OrderedDict()
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "expired": 0,
+            "evictions": 0
+        }
+
+    def get(self, key):
+
+        # Returns the cached response or None
+        now = time.time()
+
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+
+            row = self.connection.execute("SELECT response, size, created FROM responses WHERE key = ?",
+                                          (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            response, size, created = row
+            if now - created >= self.ttl:
+                self.delete(key, size)
+                self.connection.commit()
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.stats["disk_hits"] += 1
+            response = json.loads(response)
+            self.remember(key, response, created)
+
+            return response
+
+    def put(self, key, response):
+
+        now = time.time()
+        serialized = json.dumps(response)
+        size = len(serialized)
+
+        with self.lock:
+            row = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.size -= row[0]
+            self.connection.execute("INSERT OR REPLACE INTO responses (key, response, size, created, last_access) "
+                                    "VALUES (?, ?, ?, ?, ?)", (key, serialized, size, now, now))
+            self.size += size
+            self.remember(key, response, now)
+            self.evict(now)
+            self.connection.commit()
+
+    def remember(self, key, response, created):
+
+        # Must be called with the lock held
+        self.memory[key] = (response, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def delete(self, key, size):
+
+        # Must be called with the lock held
+        self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self.memory.pop(key, None)
+        self.size -= size
+
+    def evict(self, now):
+
+        # Must be called with the lock held. Expired entries go first, then the least recently used ones
+        expired = self.connection.execute("SELECT key, size FROM responses WHERE created <= ?",
+                                          (now - self.ttl,)).fetchall()
+        for key, size in expired:
+            self.delete(key, size)
+            self.stats["expired"] += 1
+
+        while self.size > self.max_bytes:
+            rows = self.connection.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 100").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.size <= self.max_bytes:
+                    break
+                self.delete(key, size)
+                self.stats["evictions"] += 1
+
+    def bypass(self):
+
+        with self.lock:
+            self.stats["bypassed"] += 1
+
+    def get_stats(self):
+
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            stats["bytes"] = self.size
+
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = hits / lookups if lookups else 0.0
+
+        return stats
+
+    def clear(self):
+
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+            self.memory.clear()
+            self.size = 0
+
+    def close(self):
+
+        with self.lock:
+            self.connection.close()
+
+
+def get_value(value):
+
+    # Enums (ModelTypes, DecodingMethods) are hashed by value
+    return getattr(value, "value", value)
+
+def get_key(model_id, params, prompt, url=None, project_id=None):
+
+    # Canonical form: enums replaced by their values and keys sorted, so that equal requests
+    # have the same key regardless of how the parameters were built
+    canonical = json.dumps({"url": url,
+                            "project_id": project_id,
+                            "model_id": get_value(model_id),
+                            "params": {name: get_value(value) for name, value in (params or {}).items()},
+                            "prompt": prompt},
+                           sort_keys=True, separators=(",", ":"), default=get_value)
+
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def get_scope(model):
+
+    # Returns (url, project or space id) of a model. A Model of the watsonx.ai SDK has them in its API client,
+    # a RESTModel (see rest_model.py) has them as attributes
+    client = getattr(model, "_client", None)
+    if client is not None:
+        credentials = getattr(client, "credentials", None)
+        url = getattr(credentials, "url", None) or (getattr(client, "wml_credentials", None) or {}).get("url")
+        project_id = client.default_project_id or client.default_space_id
+    else:
+        url = getattr(model, "url", None)
+        project_id = getattr(model, "project_id", None)
+
+    return (url.rstrip("/") if url else url), project_id
+
+def is_cacheable(params):
+
+    # Greedy is the default decoding method of watsonx.ai
+    decoding = get_value((params or {}).get("decoding_method", "greedy"))
+
+    return str(decoding).lower() in DETERMINISTIC_DECODING_METHODS
+
+def get_cache():
+
+    # Returns the cache shared by the process
+    with shared_cache_lock:
+        if globals()["shared_cache"] is None:
+            globals()["shared_cache"] = ResponseCache()
+
+        return globals()["shared_cache"]
+
+def generate(model, prompt, params=None):
+
+    # Drop-in replacement for model.generate(prompt=prompt, params=params): returns the same response dictionary,
+    # from the cache if the same model, parameters and prompt were generated before.
+    # params override the parameters of the model for this request
+    cache = get_cache()
+    request_params = dict(model.params or {}, **(params or {}))
+
+    if not is_cacheable(request_params):
+        cache.bypass()
+        return model.generate(prompt=prompt, params=params)
+
+    url, project_id = get_scope(model)
+    key = get_key(model.model_id, request_params, prompt, url, project_id)
+    response = cache.get(key)
+    if response is None:
+        response = model.generate(prompt=prompt, params=params)
+        cache.put(key, response)
+
+    return response
+
+def get_stats():
+
+    return get_cache().get_stats()
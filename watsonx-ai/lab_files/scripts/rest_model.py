@@ -0,0 +1,136 @@
+"""
+This code sample shows how to invoke LLMs in watsonx.ai with the REST API instead of the SDK.
+
+The Model and APIClient classes of the watsonx.ai SDK only connect to IBM Cloud (https URLs of the
+watsonx.ai regions). To run the scripts against the local stand-in (watsonx_stub_server.py), enable it and
+set the url in your .env file to the address of the stand-in:
+# watsonx_stand_in=true
+# url=http://127.0.0.1:8080
+Only then do model_cache and watsonx_engine create a RESTModel or call deployments with the functions in this
+module - without the setting, the scripts always use the SDK.
+
+RESTModel has the methods of Model that the scripts use (generate, generate_text, generate_text_stream,
+get_details), so the response cache, the rate limiter and the resilience layer work the same way.
+Access tokens come from the IAM endpoint of the stand-in, connections are reused through http_transport.
+"""
+
+import json
+
+# Access tokens are shared by the process and refreshed in the background
+import iam_token
+# Connections are kept alive and reused by a process-wide HTTP transport
+import http_transport
+
+API_VERSION = "2023-05-29"
+
+
+class RESTModel:
+
+    def __init__(self, model_id, params=None, credentials=None, project_id=None):
+
+        credentials = credentials or {}
+        self.model_id = model_id
+        self.params = params
+        self.project_id = project_id
+        self.url = credentials.get("url", "").rstrip("/")
+        self.token_manager = iam_token.get_token_manager(credentials.get("apikey"),
+                                                         iam_token.get_iam_url(self.url))
+
+    def get_data(self, prompt, params):
+
+        # The SDK enums (ModelTypes, DecodingMethods) are sent to the REST API as their string values
+        parameters = dict(self.params or {}, **(params or {}))
+
+        return {
+            "model_id": get_value(self.model_id),
+            "input": prompt,
+            "parameters": {name: get_value(value) for name, value in parameters.items()},
+            "project_id": self.project_id
+        }
+
+    def generate(self, prompt, params=None):
+
+        # Returns the response of the REST API - the same dictionary that Model.generate() returns
+        return post(self.url + "/ml/v1/text/generation", self.token_manager, self.get_data(prompt, params))
+
+    def generate_text(self, prompt, params=None):
+
+        return self.generate(prompt, params)['results'][0]['generated_text']
+
+    def generate_text_stream(self, prompt, params=None):
+
+        return post_stream(self.url + "/ml/v1/text/generation_stream", self.token_manager,
+                           self.get_data(prompt, params))
+
+    def get_details(self):
+
+        response = http_transport.get_transport().get(self.url + "/ml/v1/foundation_model_specs",
+                                                      params={"version": API_VERSION,
+                                                              "filters": "modelid_" + get_value(self.model_id)})
+        response.raise_for_status()
+
+        return response.json()
+
+
+def get_value(value):
+
+    return getattr(value, "value", value)
+
+def is_local_url(url):
+
+    # True for the address of the local stand-in (only when it's enabled, see iam_token.STAND_IN_SETTING),
+    # which the watsonx.ai SDK can't connect to
+    return iam_token.get_iam_url(url) != iam_token.IAM_URL
+
+def get_headers(token_manager):
+
+    return {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Authorization": "Bearer " + token_manager.get_token()
+    }
+
+def post(url, token_manager, data):
+
+    response = http_transport.get_transport().post(url, params={"version": API_VERSION},
+                                                   headers=get_headers(token_manager), data=json.dumps(data))
+    response.raise_for_status()
+
+    return response.json()
+
+def post_stream(url, token_manager, data):
+
+    # Generator of the text chunks of a streamed generation. The REST API sends server-sent events,
+    # the result of every chunk is in a "data:" line
+    lines = http_transport.get_transport().stream_lines("POST", url, params={"version": API_VERSION},
+                                                        headers=get_headers(token_manager), data=json.dumps(data))
+
+    try:
+        for line in lines:
+            if line and line.startswith("data: "):
+                yield json.loads(line[len("data: "):])['results'][0]['generated_text']
+    finally:
+        lines.close()
+
+def get_deployment_data(prompt_variables, space_id):
+
+    return {"parameters": {"prompt_variables": prompt_variables}, "space_id": space_id}
+
+def generate_deployment_text(url, api_key, space_id, deployment_id, prompt_variables):
+
+    # REST version of client.deployments.generate_text() of the SDK
+    url = url.rstrip("/")
+    token_manager = iam_token.get_token_manager(api_key, iam_token.get_iam_url(url))
+    response = post(url + "/ml/v1/deployments/" + deployment_id + "/text/generation", token_manager,
+                    get_deployment_data(prompt_variables, space_id))
+
+    return response['results'][0]['generated_text']
+
+def generate_deployment_text_stream(url, api_key, space_id, deployment_id, prompt_variables):
+
+    # REST version of client.deployments.generate_text_stream() of the SDK
+    url = url.rstrip("/")
+    token_manager = iam_token.get_token_manager(api_key, iam_token.get_iam_url(url))
+
+    return post_stream(url + "/ml/v1/deployments/" + deployment_id + "/text/generation_stream", token_manager,
+                       get_deployment_data(prompt_variables, space_id))
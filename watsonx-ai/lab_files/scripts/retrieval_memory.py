@@ -0,0 +1,228 @@
+"""
+This code sample shows how to give the AI Assistant a long-term memory of a conversation.
+
+A sliding window forgets everything that falls out of it, and a bigger window makes every prompt bigger.
+The RetrievalMemory embeds every message of the session into a per-session vector index (HNSW) as it's
+added. The prompt with the history is made of the TOP_K earlier messages that are the most similar to the
+current prompt, plus a short window of recent messages. The prompt stays about the same size however long
+the conversation is, and an old message is still found when the user comes back to its topic.
+
+Messages are not embedded one by one: new messages wait until the next prompt is built and are embedded
+together with the current prompt, in one batch. The index of a session keeps up to MAX_INDEXED_MESSAGES
+messages and evicts the oldest ones, and the SessionStore (see session_store.py) evicts the oldest messages of
+a session over MAX_SESSION_BYTES, and whole sessions over its global memory cap. With persistent sessions,
+the store saves all the messages of the index, and the index is rebuilt when a session is loaded.
+
+# Install the packages in your Python env prior to running this example:
+# pip install sentence_transformers
+# pip install chroma-hnswlib
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+import chat_session
+# Embedding models are loaded once per process and shared with the other modules
+import model_registry
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Tokens of recent messages - the last couple of turns
+RECENT_TOKEN_BUDGET = 384
+# Earlier messages added to the prompt, if they're at least MIN_SIMILARITY similar (cosine similarity)
+TOP_K = 4
+MIN_SIMILARITY = 0.2
+# Messages kept in the index of a session - the oldest ones are evicted
+MAX_INDEXED_MESSAGES = 1000
+# The index starts with room for this many messages and grows as needed
+INITIAL_INDEX_SIZE = 64
+# Memory cap of a session in the SessionStore - about MAX_INDEXED_MESSAGES messages with 384-dimension vectors
+MAX_SESSION_BYTES = 2 * 1024 * 1024
+
+# HNSW index settings, the same as in the semantic cache
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 50
+
+RETRIEVED_PREFIX = "Earlier messages: "
+
+
+class RetrievalMemory:
+
+    def __init__(self, recent_token_budget=RECENT_TOKEN_BUDGET, top_k=TOP_K, min_similarity=MIN_SIMILARITY,
+                 max_messages=MAX_INDEXED_MESSAGES, embed=None, count_tokens=None):
+
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self.max_messages = max_messages
+        # embed(texts) returns a (len(texts), dimension) array
+        self.embed = embed or embed_with_model
+
+        self.recent = chat_session.ConversationMemory(recent_token_budget, count_tokens)
+        # label -> message, oldest first. Labels are sequence numbers of the messages
+        self.indexed = OrderedDict()
+        # Messages that are not embedded yet: (label, message)
+        self.unembedded = []
+        self.next_label = 0
+        self.message_bytes = 0
+        self.index = None
+
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "embedded": 0,
+            "embedding_batches": 0,
+            "evicted": 0,
+            "retrieved": 0
+        }
+
+    @property
+    def messages(self):
+
+        # Messages of the recent window, oldest first
+        return self.recent.messages
+
+    @property
+    def history_length(self):
+
+        # Number of the latest messages of the session that are in the index or the recent window
+        with self.lock:
+            first_labels = [self.next_label - len(self.recent.messages)]
+            if self.indexed:
+                first_labels.append(next(iter(self.indexed)))
+            if self.unembedded:
+                first_labels.append(self.unembedded[0][0])
+
+            return self.next_label - min(first_labels)
+
+    def add_message(self, message):
+
+        with self.lock:
+            self.recent.add_message(message)
+            label = self.next_label
+            self.next_label += 1
+            self.unembedded.append((label, message))
+            self.message_bytes += sys.getsizeof(message)
+
+            while len(self.indexed) + len(self.unembedded) > self.max_messages:
+                self.evict_oldest()
+
+    def drop_message(self):
+
+        # Called by the SessionStore when the session is over its memory cap. Evicts the oldest message
+        # from the index if it's older than the recent window, otherwise drops the oldest recent message
+        # (it stays in the index)
+        with self.lock:
+            first_recent_label = self.next_label - len(self.recent.messages)
+            if self.indexed and next(iter(self.indexed)) < first_recent_label:
+                return self.evict_oldest()
+
+            return self.recent.drop_message()
+
+    def evict_oldest(self):
+
+        # Must be called with the lock held. Embedded messages are older than the unembedded ones
+        if self.indexed:
+            label, message = self.indexed.popitem(last=False)
+            # The slot is reused by the next added message
+            self.index.mark_deleted(label)
+        else:
+            label, message = self.unembedded.pop(0)
+        self.message_bytes -= sys.getsizeof(message)
+        self.stats["evicted"] += 1
+
+        return message
+
+    def add_to_index(self, labels, embeddings):
+
+        # Must be called with the lock held
+        if self.index is None:
+            # Imported here, because hnswlib is only needed by the sessions that retrieve earlier messages
+            import hnswlib
+            self.index = hnswlib.Index(space="cosine", dim=embeddings.shape[1])
+            self.index.init_index(max_elements=INITIAL_INDEX_SIZE, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M,
+                                  allow_replace_deleted=True)
+            self.index.set_ef(HNSW_EF_SEARCH)
+
+        # Evicted slots are reused first, then the index grows (up to the message limit of the session)
+        needed = len(self.indexed) + len(labels)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(min(max(needed, 2 * self.index.get_max_elements()), self.max_messages))
+
+        self.index.add_items(embeddings, labels, replace_deleted=True)
+
+    def convert_to_prompt(self, query=None):
+
+        # Earlier messages similar to the query (usually the current prompt of the user) and the recent messages
+        with self.lock:
+            texts = [message for label, message in self.unembedded]
+            # The current prompt is usually the last added message, so it's embedded once
+            if query and not (texts and texts[-1] == query):
+                texts.append(query)
+
+            if texts:
+                # One batch for the new messages and the query
+                embeddings = self.embed(texts)
+                self.stats["embedding_batches"] += 1
+                if self.unembedded:
+                    self.add_to_index([label for label, message in self.unembedded],
+                                      embeddings[:len(self.unembedded)])
+                    for label, message in self.unembedded:
+                        self.indexed[label] = message
+                    self.stats["embedded"] += len(self.unembedded)
+                    self.unembedded = []
+
+            # Recent messages are in the prompt anyway
+            first_recent_label = self.next_label - len(self.recent.messages)
+            retrieved = []
+            if query and len(self.indexed) > len(self.recent.messages):
+                k = min(self.top_k + len(self.recent.messages), len(self.indexed))
+                while True:
+                    try:
+                        labels, distances = self.index.knn_query(embeddings[-1], k=k)
+                        break
+                    except RuntimeError:
+                        # After many evictions, fewer than k messages can be reachable in the graph
+                        if k == 1:
+                            labels, distances = [[]], [[]]
+                            break
+                        k //= 2
+                for label, distance in zip(labels[0], distances[0]):
+                    # hnswlib returns the cosine distance: 1 - cosine similarity
+                    if label < first_recent_label and 1 - distance >= self.min_similarity:
+                        retrieved.append(int(label))
+                # In the order of the conversation
+                retrieved = sorted(retrieved[:self.top_k])
+                self.stats["retrieved"] += len(retrieved)
+
+            parts = []
+            if retrieved:
+                parts.append(RETRIEVED_PREFIX + chat_session.SEPARATOR.join(self.indexed[label] for label in retrieved))
+            recent_prompt = self.recent.convert_to_prompt()
+            if recent_prompt:
+                parts.append(recent_prompt)
+
+        return chat_session.SEPARATOR.join(parts)
+
+    def get_size(self):
+
+        # Bytes held by the messages, the recent window and the index: a float32 vector, the links of the
+        # bottom layer of the graph and a label for every indexed message. The slots of evicted messages are
+        # reused, so dropping messages frees room in the index
+        with self.lock:
+            index_bytes = 0
+            if self.index is not None:
+                index_bytes = len(self.indexed) * (self.index.dim * 4 + 2 * HNSW_M * 4 + 8)
+
+            return self.recent.get_size() + self.message_bytes + index_bytes
+
+    def get_stats(self):
+
+        with self.lock:
+            return dict(self.stats, indexed_messages=len(self.indexed), unembedded_messages=len(self.unembedded))
+
+
+def embed_with_model(texts):
+
+    return model_registry.get_embedding_engine(EMBEDDING_MODEL_NAME).embed(texts)
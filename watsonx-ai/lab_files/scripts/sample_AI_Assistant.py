@@ -11,17 +11,41 @@ This code sample shows how to implement a simple UI for an AI Assistant applicat
 import os
 from dotenv import load_dotenv
 
+# Every user session has its own id and chat history
+import uuid
+
 # All UI capabilities are provided by Streamlit
 import streamlit as st
 
 import chat_session
+# Chat history of every user session
+import session_store
+# Time to first token and total time of streamed responses
+import streaming
+# Classification and the task prompt at the same time
+import speculative_routing
+# Local classification of messages, without an LLM invocation
+import task_router
 # A Python module that implements calls to LLMs
 from watsonx_engine import *
 from chat_session import *
 
 TASK_GENERIC = "generic"
+# The classification prompt returns "general" for generic tasks
+TASK_GENERAL = "general"
 TASK_PROGRAMMING = "programming"
 
+# Classify messages locally (in under a millisecond) and invoke the classification prompt only
+# when the local router is not confident. The router learns the classes that the prompt returns.
+# Used only when the classification and programming prompts are deployed (Part 3 of the lab)
+LOCAL_TASK_ROUTER = True
+
+# Invoke the classification prompt and the prompt of the most likely task at the same time.
+# The response of the task prompt is used if the classification agrees, so most messages
+# take one LLM round trip instead of two. A message routed to another task costs an extra invocation.
+# Used only when the classification prompt is deployed, for the messages the local router is not confident about
+SPECULATIVE_ROUTING = True
+
 # These global variables will be updated in get_credentials() functions
 watsonx_project_id = ""
 api_key = ""
@@ -63,9 +87,33 @@ def main():
         st.session_state["messages"] = [{"role": "assistant",
                                          "content": "I am a technical AI assistant powered by watsonx."}]
 
+    # The chat history for the LLM is kept per user session - all sessions are served by this process
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = str(uuid.uuid4())
+
+    # Hit rate and saved latency of the speculative routing
+    if SPECULATIVE_ROUTING:
+        routing_stats = speculative_routing.get_router().get_stats()
+        st.sidebar.caption(f"Speculative routing - hit rate: {routing_stats['hit_rate']:.0%}, "
+                           f"average latency saved: {routing_stats['average_latency_saved']:.2f} s, "
+                           f"wasted invocations: {routing_stats['wasted_invocations']}")
+    # The store is created by the first message of Part 4 of the lab
+    if session_store.shared_store is not None:
+        store_gauges = session_store.shared_store.get_gauges()
+        st.sidebar.caption(f"Chat sessions - active: {store_gauges['active_sessions']}, "
+                           f"memory held: {store_gauges['bytes_held'] / 1024:.0f} KB")
+    if LOCAL_TASK_ROUTER:
+        router_stats = task_router.get_router().get_stats()
+        st.sidebar.caption(f"Local task router - classification prompt invoked for "
+                           f"{router_stats['fallback_rate']:.0%} of the messages, "
+                           f"average routing time: {router_stats['average_route_time'] * 1e6:.0f} µs")
+
     # Display previous messages in the UI
     for msg in st.session_state.messages:
-        st.chat_message(msg["role"]).write(msg["content"])
+        with st.chat_message(msg["role"]):
+            st.write(msg["content"])
+            if "timings" in msg:
+                st.caption(streaming.format_timings(msg["timings"]))
 
     # Get the prompt from the input box in the UI
     if prompt := st.chat_input():
@@ -76,6 +124,8 @@ def main():
         # ***********************  Part 1 of the lab ****************************
         # Echo input - comment out this line after implementing the call to the LLM
         msg = "Testing UI: " + prompt
+        # Streamed response - set in the parts of the lab below
+        stream = None
 
         # ***********************  Part 2 of the lab ****************************
         # This code is used in the 2nd part of the lab as we're deploying and testing prompts
@@ -88,20 +138,38 @@ def main():
         # Invoke the sequence of prompts - first, classification, then task
         # This code should be commented out until you deploy classification, question, and programming prompts
         # msg = generate_response(prompt)
+        # To display the response as it's generated, use the streamed version instead
+        # stream = generate_response_stream(prompt)
 
         # ***********************  Part 4 of the lab ****************************
-        # Add the prompt to chat history
-        # chat_session.add_message(prompt)
-        # prompt_with_history = chat_session.convert_to_prompt()
+        # Add the prompt to the chat history of this user session. To keep the context of long chats in a
+        # short prompt, set session_store.SUMMARIZE_HISTORY = True - older messages are then summarized - or
+        # session_store.RETRIEVE_HISTORY = True - the older messages relevant to the prompt are then retrieved
+        # session_id = st.session_state["session_id"]
+        # session_store.get_store().add_message(session_id, prompt)
+        # prompt_with_history = session_store.get_store().get_prompt(session_id, query=prompt)
         # Invoke the LLM
         # msg = generate_response_with_history(prompt,prompt_with_history)
-        # Add response to chat history
-        # chat_session.add_message(msg)
+        # To display the response as it's generated, use the streamed version instead
+        # stream = generate_response_stream(prompt, prompt_with_history)
+        # Add response to chat history - for a streamed response, move this line after the response is displayed
+        # session_store.get_store().add_message(session_id, msg)
 
-        # Save the response in the Streamlit session state (for UI)
-        st.session_state.messages.append({"role": "assistant", "content": msg})
         # Display the message in the UI
-        st.chat_message("assistant").write(msg)
+        with st.chat_message("assistant"):
+            if stream is None:
+                st.write(msg)
+                message = {"role": "assistant", "content": msg}
+            else:
+                # Chunks are rendered as they arrive. write_stream returns the whole response
+                timings = {}
+                msg = st.write_stream(streaming.timed_stream(stream, timings))
+                # Perceived latency is the time to the first token
+                st.caption(streaming.format_timings(timings))
+                message = {"role": "assistant", "content": msg, "timings": timings}
+
+        # Save the response in the Streamlit session state (for UI)
+        st.session_state.messages.append(message)
 
 def get_deployment_id():
 
@@ -117,7 +185,7 @@ def get_deployment_id():
 
     return current_deployment_id
 
-def generate_response(prompt):
+def get_task_deployment_id(prompt):
 
     # Since we're using the same function in watsonx_engine to invoke prompt templates,
     # we need to determine which deployment ID to use
@@ -132,8 +200,16 @@ def generate_response(prompt):
     task_formatted = task.replace('"', '')
     print("Task type: " + task_formatted)
 
+    # The local router learns the classes of the classification prompt
+    if use_local_task_router() and task_formatted in (TASK_GENERAL, TASK_PROGRAMMING):
+        task_router.get_router().add_example(prompt, task_formatted)
+
+    return get_task_deployment_id_for(task_formatted)
+
+def get_task_deployment_id_for(task_formatted):
+
     # Determine which prompt to use based on task classification
-    if task_formatted == TASK_GENERIC:
+    if task_formatted in (TASK_GENERIC, TASK_GENERAL):
         current_deployment_id = question_deployment_id
         print("Assigned question deployment id")
     elif task_formatted == TASK_PROGRAMMING:
@@ -143,43 +219,75 @@ def generate_response(prompt):
         print("Task was not determined - missing classification prompt deployment. Using the question prompt.")
         current_deployment_id = question_deployment_id
 
-    # Invoke the assigned deployment id (question OR programming prompt)
-    response = invoke_prompt_template(url, api_key, space_id, current_deployment_id, prompt)
+    return current_deployment_id
+
+def use_local_task_router():
+
+    # The router can return any task - without the classification and programming prompts
+    # every message goes to the question prompt instead
+    return LOCAL_TASK_ROUTER and bool(classification_deployment_id) and bool(programming_deployment_id)
+
+def use_speculative_routing():
+
+    # Without the classification prompt, the question prompt classifies the message - a speculative
+    # invocation of the same prompt would only double the cost
+    return SPECULATIVE_ROUTING and bool(classification_deployment_id)
+
+def invoke_task(prompt, prompt_for_task):
+
+    # Classifies the prompt and invokes the assigned deployment id (question OR programming prompt)
+    # with prompt_for_task
+    if use_local_task_router():
+        # None if the local router is not confident - then the classification prompt decides
+        task = task_router.get_router().route(prompt)
+        if task is not None:
+            print("Task type (local router): " + task)
+            current_deployment_id = get_task_deployment_id_for(task)
+            return invoke_prompt_template(url, api_key, space_id, current_deployment_id, prompt_for_task)
+
+    if use_speculative_routing():
+        return speculative_routing.get_router().call(
+            lambda: get_task_deployment_id(prompt),
+            lambda deployment_id: invoke_prompt_template(url, api_key, space_id, deployment_id, prompt_for_task),
+            question_deployment_id)
+
+    current_deployment_id = get_task_deployment_id(prompt)
+
+    return invoke_prompt_template(url, api_key, space_id, current_deployment_id, prompt_for_task)
+
+def generate_response(prompt):
+
+    # Invoke the prompt to determine task type, then the prompt of the task
+    response = invoke_task(prompt, prompt)
 
     return response
 
 def generate_response_with_history(prompt,prompt_with_history):
 
-    # Since we're using the same function in watsonx_engine to invoke prompt templates,
-    # we need to determine which deployment ID to use
+    # Invoke the prompt to determine task type - question or programming
+    # We do not need chat history to determine the quesiton type.
+    # The prompt of the task contains previous prompts and responses
+    response = invoke_task(prompt, prompt_with_history)
 
-    # If the classification template has been deployed, we will use it, if not, we will use the
-    # question template
-    current_deployment_id = get_deployment_id()
+    return response
 
-    # Invoke the prompt to determine task type - question or programming
-    # We do not need chat history to determine the quesiton type
-    task = invoke_prompt_template(url, api_key, space_id, current_deployment_id, prompt)
-    # The classification prompt returns response in double quotes. We're removing them
-    task_formatted = task.replace('"', '')
-    print("Task type: " + task_formatted)
+def generate_response_stream(prompt, prompt_with_history=None):
 
-    # Determine which prompt to use based on task classification
-    if task_formatted == TASK_GENERIC:
-        current_deployment_id = question_deployment_id
-        print("Assigned question deployment id")
-    elif task_formatted == TASK_PROGRAMMING:
-        current_deployment_id = programming_deployment_id
-        print("Assigned programming deployment id")
-    else:
-        print("Task was not determined - missing classification prompt deployment. Using the question prompt.")
-        current_deployment_id = question_deployment_id
+    # Same as generate_response() (or generate_response_with_history() if prompt_with_history is set),
+    # but yields the response as a stream of text chunks.
+    # The classification prompt is not streamed - we need its whole response to choose the task prompt
 
-    # Invoke the assigned deployment id (question OR programming prompt)
-    # Our prompt contains previous prompts and responses
-    response = invoke_prompt_template(url, api_key, space_id, current_deployment_id, prompt_with_history)
+    # Determine task type - question or programming - locally or with the classification prompt
+    # We do not need chat history to determine the question type
+    task = task_router.get_router().route(prompt) if use_local_task_router() else None
+    if task is not None:
+        current_deployment_id = get_task_deployment_id_for(task)
+    else:
+        current_deployment_id = get_task_deployment_id(prompt)
 
-    return response
+    # Stream the response of the assigned deployment id (question OR programming prompt)
+    yield from invoke_prompt_template_stream(url, api_key, space_id, current_deployment_id,
+                                             prompt_with_history or prompt)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+This code sample shows how to reuse LLM answers for questions that are asked in different words.
+
+Users ask the same question in many ways ("What is IBM?", "what's ibm"). The semantic cache embeds every
+question with the same MiniLM model that the RAG use cases use and looks up the most similar cached question
+in an approximate nearest neighbor (HNSW) index. If the cosine similarity is above SIMILARITY_THRESHOLD,
+the cached answer is returned instead of generating a new one.
+
+The cache is partitioned by LLM, because different models give different answers to the same question.
+Each partition keeps up to MAX_ENTRIES answers and evicts the least recently used ones. The cache counts
+hits and misses and adds up the generation time saved by the hits.
+
+# Install the packages in your Python env prior to running this example:
+# pip install sentence_transformers
+# pip install chroma-hnswlib
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Embedding models are loaded once per process and shared with the other modules
+import model_registry
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Questions at least this similar (cosine similarity) get the same answer. A lower threshold gives
+# more hits, but also more answers to questions that are similar but not the same
+SIMILARITY_THRESHOLD = 0.9
+# Answers kept per LLM
+MAX_ENTRIES = 1000
+
+# HNSW index settings: higher values give more accurate lookups, but slower inserts and lookups
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 50
+
+# Cache shared by the process - created in get_cache()
+shared_cache = None
+shared_cache_lock = threading.Lock()
+
+
+class CachePartition:
+
+    # Cached answers of one LLM
+
+    def __init__(self, dimension, max_entries):
+
+        # Imported here, because hnswlib is only needed when semantic caching is enabled
+        import hnswlib
+
+        # The index reuses the slots of evicted (deleted) entries, so it never grows beyond max_entries
+        self.index = hnswlib.Index(space="cosine", dim=dimension)
+        self.index.init_index(max_elements=max_entries, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M,
+                              allow_replace_deleted=True)
+        self.index.set_ef(HNSW_EF_SEARCH)
+
+        # label -> [question, answer, generation latency], least recently used first
+        self.entries = OrderedDict()
+        self.next_label = 0
+
+
+class SemanticCache:
+
+    def __init__(self, similarity_threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES,
+                 model_name=EMBEDDING_MODEL_NAME):
+
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.model_name = model_name
+
+        # LLM model id -> CachePartition
+        self.partitions = {}
+        # hnswlib indexes are not safe for concurrent inserts, deletes and queries
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "latency_saved": 0.0,
+            "lookup_time": 0.0
+        }
+
+    def embed(self, question):
+
+        return model_registry.get_embedding_engine(self.model_name).embed([question])[0]
+
+    def lookup(self, model_id, question):
+
+        # Returns (cached answer or None, embedding of the question). Pass the embedding to add()
+        # so that the question is not embedded twice
+        start = time.perf_counter()
+        embedding = self.embed(question)
+
+        with self.lock:
+            answer = None
+            partition = self.partitions.get(model_id)
+            if partition is not None and partition.entries:
+                labels, distances = partition.index.knn_query(embedding, k=1)
+                label = int(labels[0][0])
+                # hnswlib returns the cosine distance: 1 - cosine similarity
+                if 1 - distances[0][0] >= self.similarity_threshold and label in partition.entries:
+                    partition.entries.move_to_end(label)
+                    cached_question, answer, latency = partition.entries[label]
+                    self.stats["latency_saved"] += latency
+                    print(f"Semantic cache hit: '{question}' matched '{cached_question}'")
+
+            self.stats["hits" if answer is not None else "misses"] += 1
+            self.stats["lookup_time"] += time.perf_counter() - start
+
+        return answer, embedding
+
+    def add(self, model_id, question, answer, latency, embedding=None):
+
+        # latency is the time it took to generate the answer - the time saved by every hit
+        if embedding is None:
+            embedding = self.embed(question)
+
+        with self.lock:
+            partition = self.partitions.get(model_id)
+            if partition is None:
+                partition = CachePartition(len(embedding), self.max_entries)
+                self.partitions[model_id] = partition
+
+            if len(partition.entries) >= self.max_entries:
+                evicted_label, _ = partition.entries.popitem(last=False)
+                partition.index.mark_deleted(evicted_label)
+                self.stats["evictions"] += 1
+
+            label = partition.next_label
+            partition.next_label += 1
+            partition.index.add_items([embedding], [label], replace_deleted=True)
+            partition.entries[label] = [question, answer, latency]
+
+    def get_answer(self, model_id, question, generate):
+
+        # Returns the cached answer of a similar question, or calls generate() and caches its answer
+        answer, embedding = self.lookup(model_id, question)
+        if answer is None:
+            start = time.perf_counter()
+            answer = generate()
+            self.add(model_id, question, answer, time.perf_counter() - start, embedding)
+
+        return answer
+
+    def get_stats(self):
+
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = {model_id: len(partition.entries) for model_id, partition in self.partitions.items()}
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["average_lookup_time"] = stats["lookup_time"] / lookups if lookups else 0.0
+
+        return stats
+
+    def clear(self):
+
+        with self.lock:
+            self.partitions.clear()
+
+
+def get_cache():
+
+    # Returns the cache shared by the process (Streamlit reruns the script, but imported modules are kept)
+    with shared_cache_lock:
+        if globals()["shared_cache"] is None:
+            globals()["shared_cache"] = SemanticCache()
+
+        return globals()["shared_cache"]
@@ -0,0 +1,296 @@
+"""
+This code sample shows how to keep a separate chat history for every user session of the AI Assistant.
+
+A Streamlit application serves all user sessions from one process, so a module-global chat history would
+be shared (and mixed up) by all users and would grow with every session that was ever opened. The
+SessionStore keeps one ConversationMemory (see chat_session.py) per session id, with:
+- a memory cap per session (the oldest messages are dropped) and for all sessions together
+  (the least recently used sessions are evicted)
+- an idle timeout: sessions that haven't been used for IDLE_TTL seconds are removed
+- optional persistence in SQLite (write-ahead logging), so that sessions survive restarts and can be
+  served by several worker processes. Evicted sessions are loaded from SQLite when they're used again
+- gauges for the active sessions and the memory they hold
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import chat_session
+
+# Memory caps, in bytes, for one session and for all sessions of the process
+MAX_SESSION_BYTES = 256 * 1024
+MAX_TOTAL_BYTES = 64 * 1024 * 1024
+# Sessions that haven't been used for this many seconds are removed
+IDLE_TTL = 60 * 60
+# Expired sessions are deleted from SQLite at most once per SWEEP_INTERVAL seconds
+SWEEP_INTERVAL = 60
+
+# Persist the sessions of the shared store in SESSIONS_PATH
+PERSIST_SESSIONS = False
+# Fold the messages dropped from the history of the shared store into a running summary (see summary_memory.py).
+# Summaries are kept in memory only - persisted sessions keep their recent messages
+SUMMARIZE_HISTORY = False
+# Retrieve the earlier messages that are relevant to the current prompt from a per-session vector index
+# (see retrieval_memory.py). Persisted sessions keep all indexed messages - the index is rebuilt when they're loaded
+RETRIEVE_HISTORY = False
+SESSIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_sessions.db")
+
+# Store shared by the process - created in get_store()
+shared_store = None
+shared_store_lock = threading.Lock()
+
+
+class Session:
+
+    def __init__(self, memory, version=0, next_seq=0):
+
+        self.memory = memory
+        # Number of changes saved in SQLite - another process changed the session if the numbers differ
+        self.version = version
+        # Sequence number of the next message
+        self.next_seq = next_seq
+        self.last_access = time.time()
+        self.size = memory.get_size()
+
+
+class SessionStore:
+
+    def __init__(self, token_budget=chat_session.TOKEN_BUDGET, max_session_bytes=MAX_SESSION_BYTES,
+                 max_total_bytes=MAX_TOTAL_BYTES, idle_ttl=IDLE_TTL, path=None, create_memory=None):
+
+        self.token_budget = token_budget
+        # Creates the memory of a new session - a ConversationMemory by default
+        self.create_memory = create_memory or (lambda: chat_session.ConversationMemory(self.token_budget))
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.idle_ttl = idle_ttl
+
+        # session id -> Session, least recently used first
+        self.sessions = OrderedDict()
+        self.total_bytes = 0
+        # Streamlit serves each user session in its own thread
+        self.lock = threading.Lock()
+        self.last_sweep = 0.0
+
+        self.connection = None
+        if path:
+            # Transactions are started explicitly, so that a change of a session is atomic across processes
+            self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            # Write-ahead logging lets other processes read the sessions while they're being written
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA busy_timeout=5000")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, "
+                                    "version INTEGER, last_access REAL)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS messages (session_id TEXT, seq INTEGER, "
+                                    "message TEXT, PRIMARY KEY (session_id, seq))")
+
+        self.stats = {
+            "created": 0,
+            "loaded": 0,
+            "expired": 0,
+            "evicted": 0,
+            "trimmed_messages": 0
+        }
+
+    def add_message(self, session_id, message):
+
+        with self.lock:
+            if self.connection is not None:
+                # Other processes wait until the message is saved
+                self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                session = self.get_session(session_id)
+                memory = session.memory
+                memory.add_message(message)
+                seq = session.next_seq
+                session.next_seq += 1
+
+                # Drop the oldest messages of a session that is over its memory cap. A SummarizingMemory
+                # discards the messages that are waiting to be summarized first
+                while len(memory.messages) > 1 and memory.get_size() > self.max_session_bytes:
+                    memory.drop_message()
+                    self.stats["trimmed_messages"] += 1
+                self.update_size(session)
+
+                if self.connection is not None:
+                    self.save(session_id, session, seq, message)
+                    self.connection.execute("COMMIT")
+            except Exception:
+                if self.connection is not None:
+                    self.connection.execute("ROLLBACK")
+                    # The memory already has the message - the session is loaded again from SQLite
+                    # on its next use, so memory and SQLite stay the same
+                    self.remove(session_id)
+                raise
+
+            self.evict()
+
+    def get_prompt(self, session_id, query=None):
+
+        # The query (the current prompt) selects the earlier messages of a RetrievalMemory
+        with self.lock:
+            memory = self.get_session(session_id).memory
+
+        # Every memory has its own lock, so the prompt is built outside the store lock and embedding the
+        # messages of one session doesn't block the other sessions
+        return memory.convert_to_prompt(query)
+
+    def get_messages(self, session_id):
+
+        with self.lock:
+            return list(self.get_session(session_id).memory.messages)
+
+    def delete_session(self, session_id):
+
+        with self.lock:
+            self.remove(session_id)
+            if self.connection is not None:
+                self.delete_saved([session_id])
+
+    def get_session(self, session_id):
+
+        # Must be called with the lock held. Returns the session, loading it from SQLite if it's not in
+        # memory or another process changed it, or creating it
+        now = time.time()
+        self.expire(now)
+        session = self.sessions.get(session_id)
+
+        if self.connection is not None:
+            row = self.connection.execute("SELECT version FROM sessions WHERE session_id = ?",
+                                          (session_id,)).fetchone()
+            if row is None and session is not None and session.version > 0:
+                # Another process removed the session
+                self.remove(session_id)
+                session = None
+            elif row is not None and (session is None or session.version != row[0]):
+                session = self.load(session_id, row[0])
+
+        if session is None:
+            session = Session(self.create_memory())
+            self.sessions[session_id] = session
+            self.total_bytes += session.size
+            self.stats["created"] += 1
+
+        self.sessions.move_to_end(session_id)
+        session.last_access = now
+
+        return session
+
+    def load(self, session_id, version):
+
+        # Must be called with the lock held
+        rows = self.connection.execute("SELECT seq, message FROM messages WHERE session_id = ? ORDER BY seq",
+                                       (session_id,)).fetchall()
+        memory = self.create_memory()
+        for seq, message in rows:
+            memory.add_message(message)
+
+        self.remove(session_id)
+        session = Session(memory, version, rows[-1][0] + 1 if rows else 0)
+        self.sessions[session_id] = session
+        self.total_bytes += session.size
+        self.stats["loaded"] += 1
+
+        return session
+
+    def save(self, session_id, session, seq, message):
+
+        # Must be called with the lock held, in a transaction. Messages that were dropped from the memory
+        # are deleted
+        first_seq = session.next_seq - session.memory.history_length
+        session.version += 1
+        self.connection.execute("INSERT INTO messages (session_id, seq, message) VALUES (?, ?, ?)",
+                                (session_id, seq, message))
+        self.connection.execute("DELETE FROM messages WHERE session_id = ? AND seq < ?", (session_id, first_seq))
+        self.connection.execute("INSERT OR REPLACE INTO sessions (session_id, version, last_access) VALUES (?, ?, ?)",
+                                (session_id, session.version, session.last_access))
+
+    def update_size(self, session):
+
+        # Must be called with the lock held
+        size = session.memory.get_size()
+        self.total_bytes += size - session.size
+        session.size = size
+
+    def remove(self, session_id):
+
+        # Must be called with the lock held. Removes the session from memory
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self.total_bytes -= session.size
+
+    def delete_saved(self, session_ids):
+
+        # Must be called with the lock held
+        for session_id in session_ids:
+            self.connection.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self.connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def expire(self, now):
+
+        # Must be called with the lock held. The sessions are ordered by last access, so the idle
+        # sessions are at the beginning
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if now - session.last_access < self.idle_ttl:
+                break
+            self.remove(session_id)
+            self.stats["expired"] += 1
+
+        if self.connection is not None and now - self.last_sweep > SWEEP_INTERVAL:
+            self.last_sweep = now
+            # Sessions in memory were used recently, even if their last change is older
+            expired = [row[0] for row in self.connection.execute(
+                "SELECT session_id FROM sessions WHERE last_access < ?", (now - self.idle_ttl,)).fetchall()
+                       if row[0] not in self.sessions]
+            self.delete_saved(expired)
+
+    def evict(self):
+
+        # Must be called with the lock held. The most recently used session is never evicted
+        while self.total_bytes > self.max_total_bytes and len(self.sessions) > 1:
+            session_id = next(iter(self.sessions))
+            self.remove(session_id)
+            self.stats["evicted"] += 1
+
+    def get_gauges(self):
+
+        with self.lock:
+            gauges = dict(self.stats, active_sessions=len(self.sessions), bytes_held=self.total_bytes)
+            if self.connection is not None:
+                gauges["saved_sessions"] = self.connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+        return gauges
+
+    def close(self):
+
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+def get_store():
+
+    # Returns the store shared by the process, so all user sessions of the application use it
+    with shared_store_lock:
+        if globals()["shared_store"] is None:
+            create_memory = None
+            max_session_bytes = MAX_SESSION_BYTES
+            if RETRIEVE_HISTORY:
+                # Imported here, because it needs the embedding model packages
+                import retrieval_memory
+                create_memory = retrieval_memory.RetrievalMemory
+                max_session_bytes = retrieval_memory.MAX_SESSION_BYTES
+            elif SUMMARIZE_HISTORY:
+                # Imported here, because it loads the watsonx.ai SDK
+                import summary_memory
+                create_memory = summary_memory.SummarizingMemory
+            globals()["shared_store"] = SessionStore(max_session_bytes=max_session_bytes,
+                                                     path=SESSIONS_PATH if PERSIST_SESSIONS else None,
+                                                     create_memory=create_memory)
+
+        return globals()["shared_store"]
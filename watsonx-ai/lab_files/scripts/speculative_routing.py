@@ -0,0 +1,115 @@
+"""
+This code sample shows how to route a request to a task prompt without waiting for the classifier.
+
+The AI Assistant first classifies a message (question or programming) and then invokes the prompt of the
+task, so every message takes two LLM round trips one after the other. The SpeculativeRouter starts the
+classification and the prompt of the most likely task at the same time. The most likely task is the most
+frequent task of the last HISTORY_SIZE messages. When the classifier agrees, the speculative response is
+returned and the classification latency is saved. Otherwise the speculative response is discarded and the
+prompt of the right task is invoked - as slow as without speculation, plus one wasted invocation.
+
+The router reports the hit rate of the speculation and the latency it saved.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Tasks of the last HISTORY_SIZE messages are used to predict the task of the next message
+HISTORY_SIZE = 100
+
+# Worker threads that run the speculative invocations - shared by all routers
+executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="speculative")
+
+# Router shared by the process - created in get_router()
+shared_router = None
+shared_router_lock = threading.Lock()
+
+
+class SpeculativeRouter:
+
+    def __init__(self, history_size=HISTORY_SIZE):
+
+        self.history = deque(maxlen=history_size)
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "calls": 0,
+            "hits": 0,
+            "misses": 0,
+            "wasted_invocations": 0,
+            "latency_saved": 0.0
+        }
+
+    def predict(self, default_route):
+
+        # The most frequent route of the recent messages, or the default route until there's a history
+        with self.lock:
+            counts = Counter(self.history)
+        if not counts:
+            return default_route
+
+        return counts.most_common(1)[0][0]
+
+    def call(self, classify, invoke, default_route):
+
+        # classify() returns the route of the message (for example, the deployment id of the task prompt),
+        # invoke(route) returns the response of that route. Both run at the same time
+        start = time.perf_counter()
+        predicted_route = self.predict(default_route)
+
+        speculative = executor.submit(timed, invoke, predicted_route)
+        route, classify_latency = timed(classify)
+
+        if route == predicted_route:
+            response, invoke_latency = speculative.result()
+            hit = True
+        else:
+            # The speculative invocation can't be stopped - its response is ignored
+            speculative.cancel()
+            response, invoke_latency = timed(invoke, route)
+            hit = False
+
+        # Without speculation, the classification and the invocation run one after the other
+        latency_saved = classify_latency + invoke_latency - (time.perf_counter() - start)
+
+        with self.lock:
+            self.history.append(route)
+            self.stats["calls"] += 1
+            self.stats["hits" if hit else "misses"] += 1
+            if not hit:
+                self.stats["wasted_invocations"] += 1
+            self.stats["latency_saved"] += latency_saved
+
+        return response
+
+    def get_stats(self):
+
+        with self.lock:
+            stats = dict(self.stats)
+            stats["routes"] = dict(Counter(self.history))
+
+        calls = stats["calls"]
+        stats["hit_rate"] = stats["hits"] / calls if calls else 0.0
+        stats["average_latency_saved"] = stats["latency_saved"] / calls if calls else 0.0
+
+        return stats
+
+
+def timed(function, *args):
+
+    # Returns the result of the function and its latency in seconds
+    start = time.perf_counter()
+    result = function(*args)
+
+    return result, time.perf_counter() - start
+
+def get_router():
+
+    # Returns the router shared by the process, so all sessions share the history of tasks
+    with shared_router_lock:
+        if globals()["shared_router"] is None:
+            globals()["shared_router"] = SpeculativeRouter()
+
+        return globals()["shared_router"]
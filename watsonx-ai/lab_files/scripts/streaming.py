@@ -0,0 +1,38 @@
+"""
+This code sample shows how to measure the latency of streamed LLM responses.
+
+With streaming, the UI renders the response as the LLM generates it, so the latency that users perceive
+is the time to the first token rather than the time to the full response. timed_stream() passes the
+chunks of a stream through (for example, to st.write_stream) and records both times.
+"""
+
+import time
+
+
+def timed_stream(chunks, timings):
+
+    # The timings dictionary is updated while the stream is consumed:
+    # - time_to_first_token: seconds until the first non-empty chunk
+    # - total_time: seconds until the end of the stream
+    # - chunks: number of chunks received
+    # Timing starts when the stream is first read, which is when generator-based streams send their request
+    start = time.perf_counter()
+    timings["time_to_first_token"] = None
+    timings["chunks"] = 0
+
+    try:
+        for chunk in chunks:
+            if chunk and timings["time_to_first_token"] is None:
+                timings["time_to_first_token"] = time.perf_counter() - start
+            timings["chunks"] += 1
+            yield chunk
+    finally:
+        timings["total_time"] = time.perf_counter() - start
+        print(format_timings(timings))
+
+def format_timings(timings):
+
+    time_to_first_token = timings.get("time_to_first_token")
+    first_token = f"{time_to_first_token:.2f} s" if time_to_first_token is not None else "n/a"
+
+    return f"First token: {first_token}, total: {timings.get('total_time', 0.0):.2f} s"
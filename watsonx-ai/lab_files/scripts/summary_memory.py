@@ -0,0 +1,247 @@
+"""
+This code sample shows how to keep the context of a long conversation without sending all of it to the LLM.
+
+The ConversationMemory of chat_session drops the oldest messages when the history doesn't fit its token
+budget, and their context is lost. The SummarizingMemory keeps a short window of recent messages, and the
+dropped messages are folded into a running summary by a small model. The prompt with the history is the
+summary plus the recent messages, so its size stays about the same however long the conversation is.
+
+Summaries are generated in a background thread, off the request path: dropped messages are collected until
+there are SUMMARY_BATCH_TOKENS of them, then one invocation folds them into the summary. Until then, they're
+sent in the prompt as they are, so no context is lost while the summary is being generated.
+"""
+
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
+from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMethods
+
+import chat_session
+# Cache of watsonx.ai Model objects
+import model_cache
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+
+# Tokens of recent messages sent as they are
+RECENT_TOKEN_BUDGET = 512
+# Dropped messages are folded into the summary once there are this many tokens of them
+SUMMARY_BATCH_TOKENS = 256
+# If summaries fail or can't keep up, the oldest dropped messages are discarded above this many batches
+MAX_PENDING_BATCHES = 4
+
+# A small, fast model writes the summaries
+SUMMARY_MODEL_ID = ModelTypes.GRANITE_13B_INSTRUCT_V2
+SUMMARY_MAX_TOKENS = 200
+
+SUMMARY_PROMPT = """Update the summary of a conversation between a user and an AI assistant with the new messages.
+Keep the facts, names, numbers, decisions and open questions. Write at most 150 words.
+
+Summary so far: {summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+# Worker threads that generate the summaries - shared by all memories
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summarizer")
+
+
+class SummarizingMemory:
+
+    def __init__(self, recent_token_budget=RECENT_TOKEN_BUDGET, batch_tokens=SUMMARY_BATCH_TOKENS,
+                 summarize=None, count_tokens=None):
+
+        self.batch_tokens = batch_tokens
+        self.max_pending_tokens = MAX_PENDING_BATCHES * batch_tokens
+        # summarize(summary, messages) returns the new summary
+        self.summarize = summarize or summarize_with_llm
+        self.count_tokens = count_tokens or chat_session.count_tokens
+
+        self.recent = chat_session.ConversationMemory(recent_token_budget, self.count_tokens, on_drop=self.on_drop)
+        # Dropped messages that are not in the summary yet: (message, tokens)
+        self.pending = deque()
+        self.pending_tokens = 0
+        # Number of pending messages (the oldest ones) that the summary being generated contains
+        self.summarizing_count = 0
+        # Set while drop_message() discards a message of the recent window
+        self.discarding = False
+        self.summary = ""
+        self.summary_tokens = 0
+
+        self.lock = threading.Lock()
+        # Notified when a summary is done
+        self.summary_done = threading.Condition(self.lock)
+        self.summarizing = False
+
+        self.stats = {
+            "summaries": 0,
+            "summarized_messages": 0,
+            "failures": 0,
+            "discarded_messages": 0
+        }
+
+    @property
+    def messages(self):
+
+        # Messages of the recent window, oldest first
+        return self.recent.messages
+
+    @property
+    def history_length(self):
+
+        # The messages waiting for the summary and the recent window. The summary itself is not saved
+        with self.lock:
+            return len(self.pending) + len(self.recent.messages)
+
+    @property
+    def total_tokens(self):
+
+        # Tokens of the prompt with the history
+        with self.lock:
+            return self.summary_tokens + self.pending_tokens + self.recent.total_tokens
+
+    def add_message(self, message):
+
+        with self.lock:
+            self.recent.add_message(message)
+            self.schedule_summary()
+
+    def drop_message(self):
+
+        # Discards the oldest message that is not in the summary, to free memory (see session_store.py).
+        # The message is not summarized: pending messages go first, then the oldest recent message
+        with self.lock:
+            if self.pending:
+                message = self.discard_pending()
+            else:
+                self.discarding = True
+                try:
+                    message = self.recent.drop_message()
+                finally:
+                    self.discarding = False
+                if message is not None:
+                    self.stats["discarded_messages"] += 1
+
+        return message
+
+    def on_drop(self, message, tokens):
+
+        # Called by the recent window with the lock held
+        if self.discarding:
+            return
+        self.pending.append((message, tokens))
+        self.pending_tokens += tokens
+        # Messages of a summary that is being generated can be discarded too - the summary contains them
+        while self.pending_tokens > self.max_pending_tokens and len(self.pending) > 1:
+            self.discard_pending()
+
+    def discard_pending(self):
+
+        # Must be called with the lock held
+        message, tokens = self.pending.popleft()
+        self.pending_tokens -= tokens
+        if self.summarizing_count:
+            self.summarizing_count -= 1
+        self.stats["discarded_messages"] += 1
+
+        return message
+
+    def schedule_summary(self):
+
+        # Must be called with the lock held. One summary at a time per conversation, so the summaries
+        # are applied in order
+        if self.summarizing or self.pending_tokens < self.batch_tokens:
+            return
+
+        self.summarizing = True
+        self.summarizing_count = len(self.pending)
+        executor.submit(self.fold, self.summary, [message for message, tokens in self.pending])
+
+    def fold(self, summary, messages):
+
+        try:
+            new_summary = self.summarize(summary, messages).strip()
+            new_summary_tokens = self.count_tokens(new_summary)
+        except Exception as e:
+            # The messages stay in the prompt, the next dropped message retries
+            print(f"Summary of the chat history failed: {str(e)}")
+            with self.lock:
+                self.stats["failures"] += 1
+                self.summarizing = False
+                self.summarizing_count = 0
+                self.summary_done.notify_all()
+            return
+
+        with self.lock:
+            self.summary = new_summary
+            self.summary_tokens = new_summary_tokens
+            # Messages of the summary that were discarded in the meantime are no longer in the queue
+            for _ in range(self.summarizing_count):
+                message, tokens = self.pending.popleft()
+                self.pending_tokens -= tokens
+            self.summarizing_count = 0
+            self.stats["summaries"] += 1
+            self.stats["summarized_messages"] += len(messages)
+            self.summarizing = False
+            self.summary_done.notify_all()
+            # Messages dropped while the summary was generated
+            self.schedule_summary()
+
+    def wait_for_summary(self, timeout=None):
+
+        # Waits until no summary is being generated. Returns False on timeout
+        with self.lock:
+            return self.summary_done.wait_for(lambda: not self.summarizing, timeout)
+
+    def convert_to_prompt(self, query=None):
+
+        with self.lock:
+            parts = []
+            if self.summary:
+                parts.append(SUMMARY_PREFIX + self.summary)
+            parts.extend(message for message, tokens in self.pending)
+            recent_prompt = self.recent.convert_to_prompt()
+            if recent_prompt:
+                parts.append(recent_prompt)
+
+        return chat_session.SEPARATOR.join(parts)
+
+    def get_size(self):
+
+        with self.lock:
+            return (self.recent.get_size() + sys.getsizeof(self.summary)
+                    + sum(sys.getsizeof(message) for message, tokens in self.pending))
+
+    def get_stats(self):
+
+        with self.lock:
+            return dict(self.stats, summary_tokens=self.summary_tokens, pending_tokens=self.pending_tokens,
+                        recent_tokens=self.recent.total_tokens)
+
+
+def summarize_with_llm(summary, messages):
+
+    load_dotenv()
+
+    generate_params = {
+        GenParams.MAX_NEW_TOKENS: SUMMARY_MAX_TOKENS,
+        GenParams.MIN_NEW_TOKENS: 1,
+        GenParams.DECODING_METHOD: DecodingMethods.GREEDY
+    }
+
+    model = model_cache.get_model(SUMMARY_MODEL_ID, generate_params,
+                                  {"apikey": os.getenv("api_key", None), "url": os.getenv("url", None)},
+                                  os.getenv("project_id", None))
+
+    prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", messages="\n".join(messages))
+    generated_response = response_cache.generate(model, prompt)
+
+    return generated_response['results'][0]['generated_text']
@@ -0,0 +1,253 @@
+"""
+This code sample shows how to classify the messages of the AI Assistant locally instead of with an LLM.
+
+The AI Assistant invokes a classification prompt to decide whether a message is a general question or a
+programming task - a whole LLM round trip for a one-word answer. The TaskRouter classifies the message on
+the CPU in well under a millisecond:
+- the message is embedded with a hashed bag of words and character trigrams (no model to download),
+  or optionally with a sentence-transformers model
+- the class is the nearest class centroid (cosine similarity)
+- the confidence is the margin between the two nearest centroids. Below CONFIDENCE_THRESHOLD the router
+  falls back to the LLM classifier and learns the class that the LLM returned
+
+The router is trained with the examples of the classification prompt (prompts/Classification_prompt_llama3.txt)
+and the labelled messages in EXAMPLES_PATH. The router replaces that prompt, so it uses its classes (general,
+programming) - prompts/Classify_as_question_or_problem.txt sorts customer messages into other classes
+(Question, Problem) and has no labelled examples. The classes returned by the LLM fallback are added to that file,
+so the router learns from the messages of your users. The file keeps the newest MAX_SAVED_EXAMPLES messages.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SEED_PROMPT_PATH = os.path.join(SCRIPT_DIR, "..", "prompts", "Classification_prompt_llama3.txt")
+# Labelled messages, one JSON object per line: {"text": ..., "label": ...}
+EXAMPLES_PATH = os.path.join(SCRIPT_DIR, "task_router_examples.jsonl")
+
+LABEL_GENERAL = "general"
+LABEL_PROGRAMMING = "programming"
+
+# More examples than the few-shot examples of the classification prompt, for the kinds of messages
+# the assistant gets
+SEED_EXAMPLES = [
+    ("How do I reverse a linked list in Java?", LABEL_PROGRAMMING),
+    ("Fix the syntax error in this SQL query: SELECT name FROM customers WHERE", LABEL_PROGRAMMING),
+    ("Write a JavaScript function that validates an email address.", LABEL_PROGRAMMING),
+    ("Why does my Python code raise a KeyError when I read the dictionary?", LABEL_PROGRAMMING),
+    ("Generate a SQL query that returns the top 10 customers by revenue.", LABEL_PROGRAMMING),
+    ("Convert this loop into a list comprehension.", LABEL_PROGRAMMING),
+    ("Write a unit test for a function that parses dates.", LABEL_PROGRAMMING),
+    ("Explain what this regular expression does: ^[a-z0-9]+$", LABEL_PROGRAMMING),
+    ("What is the capital of France?", LABEL_GENERAL),
+    ("Summarize the main benefits of cloud computing for a small business.", LABEL_GENERAL),
+    ("What are the opening hours of the customer service team?", LABEL_GENERAL),
+    ("Explain the difference between a fixed and a variable interest rate.", LABEL_GENERAL),
+    ("Write an email to a customer apologizing for the late delivery.", LABEL_GENERAL),
+    ("How many vacation days do new employees get?", LABEL_GENERAL),
+    ("What were the main reasons for the drop in sales last quarter?", LABEL_GENERAL),
+    ("Give me three ideas for a team building event.", LABEL_GENERAL)
+]
+
+# The router answers when the margin between the two nearest centroids is at least this large.
+# With the seed examples only, 0.15 sends about half of the messages to the classification prompt
+# (see benchmark_task_router.py) - the share goes down as the router learns from them
+CONFIDENCE_THRESHOLD = 0.15
+# Dimension of the hashed embedding
+HASH_DIMENSION = 4096
+# EXAMPLES_PATH keeps at most this many labelled messages. When it is full, the oldest half is dropped
+MAX_SAVED_EXAMPLES = 5000
+
+# Router shared by the process - created in get_router()
+shared_router = None
+shared_router_lock = threading.Lock()
+
+
+class TaskRouter:
+
+    def __init__(self, examples=None, confidence_threshold=CONFIDENCE_THRESHOLD, embedding_model_name=None,
+                 examples_path=EXAMPLES_PATH):
+
+        self.confidence_threshold = confidence_threshold
+        # None - hashed embedding, otherwise the name of a sentence-transformers model
+        self.embedding_model_name = embedding_model_name
+        self.examples_path = examples_path
+        # Number of lines in examples_path - counted when the file is first appended to
+        self.saved_examples = None
+
+        # label -> sum of the normalized embeddings of its examples
+        self.sums = {}
+        self.labels = []
+        self.centroids = None
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "routed": 0,
+            "fallbacks": 0,
+            "total_route_time": 0.0
+        }
+
+        if examples is None:
+            examples = load_seed_examples() + load_examples(examples_path)
+        for text, label in examples:
+            self.add_example(text, label, save=False)
+
+    def embed(self, text):
+
+        if self.embedding_model_name is None:
+            embedding = get_hashed_embedding(text)
+        else:
+            import model_registry
+            embedding = model_registry.get_embedding_engine(self.embedding_model_name).embed([text])[0]
+
+        norm = np.linalg.norm(embedding)
+
+        return embedding / norm if norm else embedding
+
+    def add_example(self, text, label, save=True):
+
+        embedding = self.embed(text)
+        with self.lock:
+            self.sums[label] = self.sums.get(label, 0) + embedding
+            # The centroids are kept in one matrix, so a prediction is a single matrix-vector product
+            self.labels = list(self.sums)
+            centroids = np.array([self.sums[name] for name in self.labels], dtype=np.float32)
+            self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+        if save and self.examples_path:
+            with self.lock:
+                self.save_example(text, label)
+
+    def save_example(self, text, label):
+
+        # Called with the lock held
+        if self.saved_examples is None:
+            self.saved_examples = len(load_examples(self.examples_path))
+        if self.saved_examples >= MAX_SAVED_EXAMPLES:
+            # Rotate - keep the newest half. The centroids already contain the dropped examples
+            kept = load_examples(self.examples_path)[-(MAX_SAVED_EXAMPLES // 2):]
+            temporary_path = self.examples_path + ".tmp"
+            with open(temporary_path, "w", encoding="utf-8") as examples_file:
+                for kept_text, kept_label in kept:
+                    examples_file.write(json.dumps({"text": kept_text, "label": kept_label}) + "\n")
+            os.replace(temporary_path, self.examples_path)
+            self.saved_examples = len(kept)
+
+        with open(self.examples_path, "a", encoding="utf-8") as examples_file:
+            examples_file.write(json.dumps({"text": text, "label": label}) + "\n")
+        self.saved_examples += 1
+
+    def predict(self, text):
+
+        # Returns (label, confidence), or (None, 0.0) if the router has no examples
+        embedding = self.embed(text)
+        with self.lock:
+            labels, centroids = self.labels, self.centroids
+        if centroids is None:
+            return None, 0.0
+
+        similarities = centroids @ embedding
+        order = np.argsort(similarities)[::-1]
+        best = similarities[order[0]]
+        confidence = best - similarities[order[1]] if len(order) > 1 else best
+
+        return labels[order[0]], float(confidence)
+
+    def route(self, text, fallback=None):
+
+        # Returns the label of the message. Below the confidence threshold, fallback() (the LLM classifier)
+        # is called and the router learns its label. Without a fallback, None is returned below the threshold
+        start = time.perf_counter()
+        label, confidence = self.predict(text)
+        route_time = time.perf_counter() - start
+
+        confident = label is not None and confidence >= self.confidence_threshold
+        with self.lock:
+            self.stats["routed"] += 1
+            self.stats["total_route_time"] += route_time
+            if not confident:
+                self.stats["fallbacks"] += 1
+
+        if confident:
+            return label
+        if fallback is None:
+            return None
+
+        label = normalize_label(fallback())
+        if label:
+            self.add_example(text, label)
+
+        return label
+
+    def get_stats(self):
+
+        with self.lock:
+            stats = dict(self.stats)
+
+        routed = stats["routed"]
+        stats["fallback_rate"] = stats["fallbacks"] / routed if routed else 0.0
+        stats["average_route_time"] = stats["total_route_time"] / routed if routed else 0.0
+
+        return stats
+
+
+def get_hashed_embedding(text):
+
+    # Words and character trigrams of the words are hashed into a fixed number of buckets.
+    # crc32 is used instead of hash(), which is different in every process
+    embedding = np.zeros(HASH_DIMENSION, dtype=np.float32)
+    for word in re.findall(r"\w+|[^\w\s]", text.lower()):
+        embedding[zlib.crc32(word.encode("utf-8")) % HASH_DIMENSION] += 1.0
+        padded = f"<{word}>"
+        for start in range(len(padded) - 2):
+            embedding[zlib.crc32(padded[start:start + 3].encode("utf-8")) % HASH_DIMENSION] += 0.5
+
+    return embedding
+
+def normalize_label(label):
+
+    # The classification prompt returns the class in double quotes
+    return label.replace('"', '').strip().lower() if label else label
+
+def load_seed_examples(path=SEED_PROMPT_PATH):
+
+    # Few-shot examples of the classification prompt ("Task: ..." followed by "Class: ...") and SEED_EXAMPLES
+    examples = list(SEED_EXAMPLES)
+    try:
+        with open(path, encoding="utf-8") as prompt_file:
+            prompt = prompt_file.read()
+    except OSError:
+        return examples
+
+    for text, label in re.findall(r"Task:\s*(.+?)\s*\nClass:\s*(\S+)", prompt):
+        if text != "{task}":
+            examples.append((text, normalize_label(label)))
+
+    return examples
+
+def load_examples(path=EXAMPLES_PATH):
+
+    examples = []
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as examples_file:
+            for line in examples_file:
+                if line.strip():
+                    example = json.loads(line)
+                    examples.append((example["text"], example["label"]))
+
+    return examples
+
+def get_router():
+
+    # Returns the router shared by the process
+    with shared_router_lock:
+        if globals()["shared_router"] is None:
+            globals()["shared_router"] = TaskRouter()
+
+        return globals()["shared_router"]
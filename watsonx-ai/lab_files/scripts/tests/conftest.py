@@ -0,0 +1,11 @@
+"""
+Behaviour checks of the scripts. Run from the scripts directory:
+# pip install pytest
+# python -m pytest tests
+"""
+
+import os
+import sys
+
+# The scripts are modules in the parent directory, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
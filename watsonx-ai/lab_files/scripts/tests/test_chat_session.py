@@ -0,0 +1,37 @@
+import chat_session
+
+
+def count_words(text):
+
+    return len(text.split())
+
+def test_prompt_is_kept_up_to_date_when_messages_are_added_and_dropped():
+
+    dropped = []
+    memory = chat_session.ConversationMemory(5, count_words, on_drop=lambda message, tokens: dropped.append(message))
+
+    for message in ["one two", "three", "four five", "six seven", "", "eight"]:
+        memory.add_message(message)
+        assert memory.convert_to_prompt() == chat_session.SEPARATOR.join(memory.messages)
+        assert memory.total_tokens == sum(count_words(message) for message in memory.messages)
+        assert memory.total_tokens <= 5
+
+    assert dropped == ["one two", "three"]
+
+def test_message_over_the_budget_is_kept_on_its_own():
+
+    memory = chat_session.ConversationMemory(3, count_words)
+    memory.add_message("one")
+    memory.add_message("two three four five")
+
+    assert memory.convert_to_prompt() == "two three four five"
+    assert memory.total_tokens == 4
+
+def test_clear_empties_the_prompt():
+
+    memory = chat_session.ConversationMemory(10, count_words)
+    memory.add_message("one two")
+    memory.clear()
+    memory.add_message("three")
+
+    assert memory.convert_to_prompt() == "three"
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import embedding_engine
+import model_registry
+
+
+def run_in_threads(function, count=8):
+
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        function()
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_model_is_loaded_once_by_concurrent_callers(monkeypatch):
+
+    loads = []
+
+    def load_torch_model(model_name):
+        loads.append(model_name)
+        time.sleep(0.05)
+        return object()
+
+    monkeypatch.setattr(embedding_engine, "load_torch_model", load_torch_model)
+    engine = embedding_engine.EmbeddingEngine("all-MiniLM-L6-v2")
+    run_in_threads(engine.load)
+
+    assert loads == ["all-MiniLM-L6-v2"]
+    assert engine.is_loaded()
+
+def test_process_pool_is_started_once_by_concurrent_callers(monkeypatch):
+
+    pools = []
+
+    class FakePool:
+
+        def __init__(self, **kwargs):
+            pools.append(self)
+            time.sleep(0.05)
+
+        def shutdown(self):
+            pools.remove(self)
+
+    monkeypatch.setattr(embedding_engine, "ProcessPoolExecutor", FakePool)
+    engine = embedding_engine.EmbeddingEngine("all-MiniLM-L6-v2", num_workers=2)
+    run_in_threads(engine.get_pool)
+
+    assert len(pools) == 1
+    engine.close()
+    assert pools == []
+
+def test_registry_engine_loads_model_once(monkeypatch):
+
+    loads = []
+
+    def load_torch_model(model_name):
+        loads.append(model_name)
+        time.sleep(0.05)
+        return object()
+
+    monkeypatch.setattr(embedding_engine, "load_torch_model", load_torch_model)
+    monkeypatch.setattr(model_registry, "models", {})
+
+    def load():
+        model_registry.get_embedding_engine("all-MiniLM-L6-v2").load()
+
+    run_in_threads(load)
+
+    assert loads == ["all-MiniLM-L6-v2"]
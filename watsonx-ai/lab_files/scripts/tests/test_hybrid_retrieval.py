@@ -0,0 +1,87 @@
+import bm25_index
+import use_case_RAG
+
+CHUNKS = [
+    "Policy HX-4471 covers water damage caused by burst pipes.",
+    "Claims for storm damage must be filed within 30 days.",
+    "The deductible of a home insurance policy is paid by the insured.",
+    "Flood damage is not covered by a standard home insurance policy.",
+]
+IDS = [use_case_RAG.get_chunk_id(chunk) for chunk in CHUNKS]
+
+
+class FakeCollection:
+
+    # Vector search results that the test decides, in the format of chromadb's collection.query()
+
+    name = "test"
+
+    def __init__(self, ranked_indexes):
+
+        self.ranked_indexes = ranked_indexes
+        self.queries = []
+
+    def query(self, query_texts, n_results):
+
+        self.queries.append(query_texts)
+        ranked = self.ranked_indexes[:n_results]
+        return {"ids": [[IDS[i] for i in ranked] for _ in query_texts],
+                "documents": [[CHUNKS[i] for i in ranked] for _ in query_texts]}
+
+
+def get_index(tmp_path):
+
+    index = bm25_index.BM25Index(str(tmp_path / "bm25.sqlite3"), "test")
+    index.add(IDS, CHUNKS)
+    return index
+
+def use_index(monkeypatch, index):
+
+    monkeypatch.setattr(use_case_RAG, "get_bm25_index", lambda collection_name: index)
+
+def test_bm25_ranks_exact_terms_first(tmp_path):
+
+    results = get_index(tmp_path).search("What does policy HX-4471 cover?", 4)
+
+    assert results[0] == (IDS[0], CHUNKS[0])
+
+def test_bm25_matches_other_forms_of_a_word(tmp_path):
+
+    results = get_index(tmp_path).search("claim", 4)
+
+    assert [chunk_id for chunk_id, _ in results] == [IDS[1]]
+
+def test_reciprocal_rank_fusion_ranks_chunks_found_by_both_searches_first():
+
+    dense = [("a", "A"), ("b", "B"), ("c", "C")]
+    lexical = [("c", "C"), ("d", "D")]
+
+    fused = bm25_index.reciprocal_rank_fusion([dense, lexical], 3)
+
+    # c is in both lists, a is first in one list. b and d tie - the first list wins
+    assert [chunk_id for chunk_id, _ in fused] == ["c", "a", "b"]
+
+def test_hybrid_retrieval_fuses_vector_and_keyword_results(tmp_path, monkeypatch):
+
+    use_index(monkeypatch, get_index(tmp_path))
+    # The vector search misses the chunk with the policy number, the keyword search finds it
+    collection = FakeCollection([3, 2, 1])
+
+    results = use_case_RAG.retrieve(collection, ["Is policy HX-4471 valid?"], 3, use_case_RAG.RETRIEVAL_HYBRID)
+
+    # The chunks found by both searches come first, then the best keyword match.
+    # The chunk found only by the vector search, in the last place, is left out
+    assert set(results[0][:2]) == {CHUNKS[2], CHUNKS[3]}
+    assert results[0][2] == CHUNKS[0]
+
+def test_lexical_retrieval_falls_back_to_vector_search(tmp_path, monkeypatch):
+
+    use_index(monkeypatch, get_index(tmp_path))
+    collection = FakeCollection([2, 0])
+
+    results = use_case_RAG.retrieve(collection, ["burst pipes", "xyzzy"], 2, use_case_RAG.RETRIEVAL_LEXICAL)
+
+    assert results[0] == [CHUNKS[0]]
+    assert results[1] == [CHUNKS[2], CHUNKS[0]]
+    # Only the question without keyword matches is embedded
+    assert collection.queries == [["xyzzy"]]
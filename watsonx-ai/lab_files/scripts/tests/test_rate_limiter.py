@@ -0,0 +1,43 @@
+import types
+
+import pytest
+
+import rate_limiter
+
+
+def get_sdk_model(project_id=None, space_id=None):
+
+    # Same attributes as a Model of ibm_watsonx_ai 1.0: the project is kept in the API client
+    client = types.SimpleNamespace(default_project_id=project_id, default_space_id=space_id,
+                                   credentials=types.SimpleNamespace(url="https://us-south.ml.cloud.ibm.com"))
+    return types.SimpleNamespace(model_id="meta-llama/llama-2-70b-chat", _client=client,
+                                 generate=lambda prompt, params=None: {"results": [{"generated_text": prompt}]})
+
+def test_sdk_model_is_scoped_by_its_project():
+
+    controller = rate_limiter.ConcurrencyController()
+    first = rate_limiter.RateLimitedModel(get_sdk_model("project-1"), controller)
+    second = rate_limiter.RateLimitedModel(get_sdk_model("project-2"), controller)
+    first.generate("a")
+    second.generate("b")
+
+    assert set(controller.get_gauges()) == {("project-1", "meta-llama/llama-2-70b-chat"),
+                                            ("project-2", "meta-llama/llama-2-70b-chat")}
+    assert set(controller.buckets) == {"project-1", "project-2"}
+
+def test_sdk_model_falls_back_to_its_space():
+
+    model = rate_limiter.RateLimitedModel(get_sdk_model(space_id="space-1"), rate_limiter.ConcurrencyController())
+
+    assert model.project_id == "space-1"
+
+def test_rest_model_is_scoped_by_its_project_attribute():
+
+    model = types.SimpleNamespace(model_id="m", project_id="project-3", url="http://127.0.0.1:8080")
+
+    assert rate_limiter.RateLimitedModel(model, rate_limiter.ConcurrencyController()).project_id == "project-3"
+
+def test_model_without_a_scope_is_rejected():
+
+    with pytest.raises(ValueError):
+        rate_limiter.RateLimitedModel(get_sdk_model(), rate_limiter.ConcurrencyController())
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+import resilience
+
+
+def test_call_async_retries_transient_failures(monkeypatch):
+
+    monkeypatch.setattr(resilience, "BASE_BACKOFF", 0.001)
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("connection reset")
+        return "response"
+
+    assert asyncio.run(resilience.call_async(request, name="test:retry")) == "response"
+    assert len(attempts) == 3
+
+def test_call_async_does_not_retry_other_errors():
+
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(resilience.call_async(request, name="test:no-retry"))
+    assert len(attempts) == 1
+
+def test_call_async_cancels_the_request_at_the_deadline():
+
+    cancelled = []
+
+    async def request():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    with pytest.raises(resilience.DeadlineExceeded):
+        asyncio.run(resilience.call_async(request, name="test:deadline", deadline=0.1, max_retries=0))
+    assert cancelled == [1]
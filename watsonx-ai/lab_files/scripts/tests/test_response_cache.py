@@ -0,0 +1,79 @@
+import os
+
+import response_cache
+
+
+def get_cache(tmp_path, **settings):
+
+    return response_cache.ResponseCache(str(tmp_path / "response_cache.db"), **settings)
+
+def set_time(monkeypatch, now):
+
+    monkeypatch.setattr(response_cache.time, "time", lambda: now)
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+
+    cache = get_cache(tmp_path, ttl=60)
+    set_time(monkeypatch, 1000.0)
+    cache.put("key", {"text": "cached"})
+
+    set_time(monkeypatch, 1059.0)
+    assert cache.get("key") == {"text": "cached"}
+
+    set_time(monkeypatch, 1060.0)
+    assert cache.get("key") is None
+    stats = cache.get_stats()
+    assert stats["expired"] == 1
+    assert stats["entries"] == 0
+    assert stats["bytes"] == 0
+
+def test_expired_entries_are_not_served_from_disk(tmp_path, monkeypatch):
+
+    # A new cache on the same file has an empty memory, so the entry is read from disk
+    set_time(monkeypatch, 1000.0)
+    get_cache(tmp_path, ttl=60).put("key", {"text": "cached"})
+
+    set_time(monkeypatch, 2000.0)
+    cache = get_cache(tmp_path, ttl=60)
+    assert cache.get("key") is None
+    assert cache.get_stats()["misses"] == 1
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+
+    response = {"text": "x" * 100}
+    entry_size = len(response_cache.json.dumps(response))
+    cache = get_cache(tmp_path, max_bytes=3 * entry_size, memory_entries=0)
+
+    for now, key in enumerate(["a", "b", "c"]):
+        set_time(monkeypatch, 1000.0 + now)
+        cache.put(key, response)
+
+    # Reading "a" makes "b" the least recently used entry
+    set_time(monkeypatch, 1010.0)
+    assert cache.get("a") == response
+
+    set_time(monkeypatch, 1011.0)
+    cache.put("d", response)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == response
+    assert cache.get("c") == response
+    assert cache.get("d") == response
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 3 * entry_size
+
+def test_cache_path_is_read_when_the_cache_is_created(tmp_path, monkeypatch):
+
+    path = str(tmp_path / "patched.db")
+    monkeypatch.setattr(response_cache, "CACHE_PATH", path)
+
+    response_cache.ResponseCache().close()
+
+    assert os.path.exists(path)
+
+def test_only_greedy_decoding_is_cacheable():
+
+    assert response_cache.is_cacheable({})
+    assert response_cache.is_cacheable({"decoding_method": "greedy"})
+    assert not response_cache.is_cacheable({"decoding_method": "sample"})
@@ -0,0 +1,43 @@
+import threading
+
+import chat_session
+import session_store
+
+
+def count_words(text):
+
+    return len(text.split())
+
+def test_prompt_is_consistent_while_messages_are_added():
+
+    store = session_store.SessionStore(create_memory=lambda: chat_session.ConversationMemory(50, count_words))
+    done = threading.Event()
+    prompts = []
+
+    def read():
+        while not done.is_set():
+            prompts.append(store.get_prompt("session"))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for number in range(500):
+        store.add_message("session", f"message {number}")
+    done.set()
+    reader.join()
+
+    # Every prompt is a whole number of messages: "message <number>" joined with the separator
+    for prompt in prompts:
+        words = prompt.split(chat_session.SEPARATOR) if prompt else []
+        assert len(words) % 2 == 0
+        assert all(word == "message" for word in words[::2])
+    assert store.get_prompt("session") == chat_session.SEPARATOR.join(store.get_messages("session"))
+
+def test_get_prompt_does_not_change_the_memory():
+
+    memory = chat_session.ConversationMemory(50, count_words)
+    store = session_store.SessionStore(create_memory=lambda: memory)
+    store.add_message("session", "hello")
+    attributes = set(vars(memory))
+
+    assert store.get_prompt("session") == "hello"
+    assert set(vars(memory)) == attributes
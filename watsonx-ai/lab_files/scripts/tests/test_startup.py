@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that the RAG modules must not load at import time (see benchmark_startup.py)
+HEAVY_PACKAGES = ["torch", "sentence_transformers", "numpy", "chromadb", "langchain",
+                  "ibm_watsonx_ai", "httpx", "requests", "bs4"]
+
+
+@pytest.mark.parametrize("module", ["use_case_RAG", "use_case_RAG_Web"])
+def test_import_does_not_load_heavy_packages(module):
+
+    code = f"import sys, {module}; print(','.join(name for name in {HEAVY_PACKAGES} if name in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
@@ -0,0 +1,50 @@
+"""
+This code sample shows how to count the tokens of a text for a token budget (chat history, RAG context).
+
+Tokens are counted with the tokenizer of the model that receives the text. Tokenizers are loaded once per
+process through the model registry. If a tokenizer can't be loaded (the tokenizers package is not installed,
+or the model repository is gated and HF_TOKEN is not set), tokens are estimated, with the same estimate for
+every caller, so that all budgets agree about the same text.
+
+# Install the tokenizers package in your Python env to count tokens exactly:
+# pip install tokenizers
+"""
+
+import math
+import os
+import re
+
+import model_registry
+
+# Tokenizer used when the caller doesn't name one - the tokenizer of the Llama 3 models.
+# The Llama repositories on Hugging Face are gated: accept the license of the model and set HF_TOKEN
+TOKENIZER_NAME = "meta-llama/Meta-Llama-3-8B-Instruct"
+# The estimate counts at least one token per this many characters, so that texts stay within their budget
+# (Llama tokens are about 4 characters of English text, rare words are split into several tokens)
+MIN_CHARS_PER_TOKEN = 3
+
+def get_tokenizer(tokenizer_name=TOKENIZER_NAME):
+
+    # Returns None if the tokenizer can't be loaded. The failure is remembered, so it's only reported once
+    def load():
+        try:
+            from tokenizers import Tokenizer
+            return Tokenizer.from_pretrained(tokenizer_name, token=os.getenv("HF_TOKEN"))
+        except Exception as e:
+            print(f"Tokenizer {tokenizer_name} is not available ({str(e)}), token counts are estimated")
+            return False
+
+    return model_registry.get_or_load(("tokenizer", tokenizer_name), load) or None
+
+def estimate_tokens(text):
+
+    # Words and punctuation marks, or one token per MIN_CHARS_PER_TOKEN characters - whichever is more
+    return max(len(re.findall(r"\w+|[^\w\s]", text)), math.ceil(len(text) / MIN_CHARS_PER_TOKEN))
+
+def count_tokens(text, tokenizer_name=TOKENIZER_NAME):
+
+    tokenizer = get_tokenizer(tokenizer_name)
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    return estimate_tokens(text)
@@ -26,27 +26,89 @@ This example shows a Question and Answer use case for a provided document
 
 IMPORTANT: Be aware of the disk space that will be taken up by documents when they're loaded into
 chromadb on your laptop. The size in chroma will likely be the same as .txt file size
+
+Embeddings are saved in a persistent chromadb index in INDEX_DIR. The index for a document is keyed
+by the hash of the document content plus the chunking and embedding settings, so a document is loaded
+only once - subsequent questions (including after a restart of the app) only embed the question.
+
+Importing this module doesn't import chromadb, langchain, the watsonx.ai SDK or httpx - each of them is
+imported by the function that uses it first, so that an app that imports the module starts in milliseconds
+(see benchmark_startup.py).
 """
 
 # For reading credentials from the .env file
 import os
+import time
+import hashlib
 from dotenv import load_dotenv
 
-import chromadb
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders import PyPDFLoader
-from sentence_transformers import SentenceTransformer
-from chromadb.api.types import EmbeddingFunction
+# Batched embedding engine (torch or ONNX Runtime backend), loaded lazily through the model registry
+import embedding_engine
+import model_registry
+
+# Keyword (BM25) index maintained next to the chromadb collection
+import bm25_index
+# Builds the context of the prompt within a token budget
+import context_packer
 
-# watsonx.ai python SDK
-from ibm_watsonx_ai.foundation_models import Model
-from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
-from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMethods
+# Cache of watsonx.ai Model objects
+import model_cache
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+# Concurrent generations of a batch of prompts
+import batch_generation
 
 FILE_TYPE_TXT = "txt"
 FILE_TYPE_PDF = "pdf"
 
+# Settings that determine the content of the index. If any of these change, the document is re-indexed
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# Embedding engine settings. The batch size caps peak memory while embedding large documents.
+# Set EMBEDDING_WORKERS > 1 to embed batches in a process pool, and EMBEDDING_BACKEND to
+# embedding_engine.BACKEND_ONNX to use ONNX Runtime (EMBEDDING_PRECISION: fp32 or int8 - fp16 needs a CUDA GPU)
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_WORKERS = 1
+EMBEDDING_BACKEND = embedding_engine.BACKEND_TORCH
+EMBEDDING_PRECISION = embedding_engine.PRECISION_FP32
+
+# Documents are ingested as a stream: .txt files are read in blocks of TXT_BLOCK_SIZE characters,
+# .pdf files page by page, and chunks are embedded and saved INGEST_BATCH_SIZE at a time.
+# Peak memory depends on these settings, not on the size of the document
+TXT_BLOCK_SIZE = 1024 * 1024
+INGEST_BATCH_SIZE = 256
+
+# Directory of the persistent chromadb index. It survives restarts of the demo_streamlit_RAG app
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chroma_index")
+
+# Persistent chromadb client - created once per process in get_chroma_client()
+chroma_client = None
+
+# Retrieval modes: vector search only, keyword (BM25) search only, or both combined with reciprocal rank fusion.
+# The keyword search doesn't need to embed the question, so RETRIEVAL_LEXICAL is the fastest mode
+RETRIEVAL_DENSE = "dense"
+RETRIEVAL_LEXICAL = "lexical"
+RETRIEVAL_HYBRID = "hybrid"
+RETRIEVAL_MODE = RETRIEVAL_HYBRID
+N_RESULTS = 5
+
+# Maximum number of tokens of retrieved text in the prompt
+CONTEXT_TOKEN_BUDGET = context_packer.CONTEXT_TOKEN_BUDGET
+
+# Keyword indexes, one per collection - opened once per process in get_bm25_index()
+bm25_indexes = {}
+
+# Model parameters of answer_questions_from_doc(), answer_questions_from_doc_batch()
+# and answer_questions_from_doc_async()
+MODEL_TYPE = "meta-llama/llama-2-70b-chat"
+MAX_TOKENS = 300
+MIN_TOKENS = 100
+# DecodingMethods.GREEDY of the watsonx.ai SDK
+DECODING = "greedy"
+TEMPERATURE = 0.7
+
 # Important: hardcoding the API key in Python code is not a best practice. We are using
 # this approach for the ease of demo setup. In a production application these variables
 # can be stored in an .env or a properties file
@@ -65,75 +127,372 @@ def get_credentials():
     globals()["watsonx_project_id"] = os.getenv("project_id", None)
     globals()["url"] = os.getenv("url", None)
 
-# The get_model function creates an LLM model object with the specified parameters
+# Generation parameters of the model and of the async requests
+def get_generate_params(max_tokens,min_tokens,decoding,temperature):
 
-def get_model(model_type,max_tokens,min_tokens,decoding,temperature):
+    # watsonx.ai python SDK
+    from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
 
-    generate_params = {
+    return {
         GenParams.MAX_NEW_TOKENS: max_tokens,
         GenParams.MIN_NEW_TOKENS: min_tokens,
         GenParams.DECODING_METHOD: decoding,
         GenParams.TEMPERATURE: temperature
     }
 
-    model = Model(
-        model_id=model_type,
-        params=generate_params,
-        credentials={
-            "apikey": api_key,
-            "url": url
-        },
-        project_id=watsonx_project_id
-        )
+# The get_model function creates an LLM model object with the specified parameters
+def get_model(model_type,max_tokens,min_tokens,decoding,temperature):
+
+    generate_params = get_generate_params(max_tokens, min_tokens, decoding, temperature)
+
+    # Model objects are cached and reused by requests with the same settings, so only the first
+    # request pays for authentication and validation of the model
+    model = model_cache.get_model(model_type, generate_params,
+                                  {"apikey": api_key, "url": url},
+                                  watsonx_project_id)
 
     return model
 
 
-# Embedding function
-class MiniLML6V2EmbeddingFunction(EmbeddingFunction):
+# Embedding function. The class derives from a chromadb class, so it's created when chromadb is first used
+def get_embedding_function():
 
-    MODEL = SentenceTransformer('all-MiniLM-L6-v2')
+    from chromadb.api.types import EmbeddingFunction
 
-    def __call__(self, texts):
-        return MiniLML6V2EmbeddingFunction.MODEL.encode(texts).tolist()
+    class MiniLML6V2EmbeddingFunction(EmbeddingFunction):
 
-def create_embeddings(file_path,file_type,collection_name):
+        def __call__(self, texts):
+            # The engine returns a float32 NumPy array. chromadb 0.5 only accepts embeddings as lists,
+            # so we convert once here, at the chromadb boundary
+            return get_embedding_engine().embed(texts).tolist()
+
+    return MiniLML6V2EmbeddingFunction()
+
+def get_embedding_engine():
+
+    # The model is loaded on first use (not at import time) and shared by all callers in the process
+    return model_registry.get_embedding_engine(EMBEDDING_MODEL_NAME,
+                                               batch_size=EMBEDDING_BATCH_SIZE,
+                                               num_workers=EMBEDDING_WORKERS,
+                                               backend=EMBEDDING_BACKEND,
+                                               precision=EMBEDDING_PRECISION)
+
+def warm_up():
+
+    # Call at application startup to load the embedding model before the first question is asked
+    model_registry.warm_up(EMBEDDING_MODEL_NAME,
+                           batch_size=EMBEDDING_BATCH_SIZE,
+                           num_workers=EMBEDDING_WORKERS,
+                           backend=EMBEDDING_BACKEND,
+                           precision=EMBEDDING_PRECISION)
+
+def get_chroma_client():
+
+    # Opening a persistent client loads the index from disk, so we only do it once per process
+    if globals()["chroma_client"] is None:
+        import chromadb
+        globals()["chroma_client"] = chromadb.PersistentClient(path=INDEX_DIR)
+
+    return globals()["chroma_client"]
+
+def get_bm25_index(collection_name):
+
+    # The keyword indexes are saved next to the chromadb index, so they also survive restarts
+    if collection_name not in bm25_indexes:
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        bm25_indexes[collection_name] = bm25_index.BM25Index(os.path.join(INDEX_DIR, "bm25.sqlite3"),
+                                                             collection_name)
+
+    return bm25_indexes[collection_name]
+
+def sync_bm25_index(collection, bm25):
 
+    # Rebuild the keyword index from the collection if they're out of sync (for example, if the
+    # keyword index was deleted or the collection was built before the keyword index existed)
+    if bm25.count() == collection.count():
+        return
+
+    print("Rebuilding the keyword index for " + collection.name)
+    bm25.clear()
+    offset = 0
+    while True:
+        batch = collection.get(include=["documents"], limit=INGEST_BATCH_SIZE, offset=offset)
+        if not batch["ids"]:
+            break
+        bm25.add(batch["ids"], batch["documents"])
+        offset += len(batch["ids"])
+
+def get_index_settings():
+
+    # The backend and precision change the embeddings, so they are part of the index settings
+    return f"{EMBEDDING_MODEL_NAME}|{EMBEDDING_BACKEND}|{EMBEDDING_PRECISION}|{CHUNK_SIZE}|{CHUNK_OVERLAP}"
+
+def get_index_key(file_path):
+
+    # The key identifies the content of the index: the document bytes plus the settings used to build it
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+
+    settings = get_index_settings()
+    digest.update(settings.encode("utf-8"))
+
+    return digest.hexdigest()
+
+def get_index_collection_name(collection_name):
+
+    # Chroma collection names are limited to 63 characters. We add a short hash of the settings so that
+    # indexes built with different chunking/embedding settings never share a collection
+    settings = get_index_settings()
+    settings_hash = hashlib.sha256(settings.encode("utf-8")).hexdigest()[:8]
+
+    return f"{collection_name[:50]}_{settings_hash}"
+
+def get_chunk_id(chunk):
+
+    # Chunk ids are derived from the chunk content, so an unchanged chunk keeps its id (and its embedding)
+    # across versions of a document. Identical chunks share one id and are stored once
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+class StageCounter:
+
+    # Throughput counter for one stage of the ingestion pipeline
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def add(self, items, size, seconds):
+        self.items += items
+        self.bytes += size
+        self.seconds += seconds
+
+    def report(self):
+        rate = self.items / self.seconds if self.seconds else 0.0
+        megabytes = self.bytes / (1024 * 1024)
+        print(f"{self.name:<8} {self.items:>9} {self.unit:<7} {megabytes:10.2f} MB {self.seconds:9.2f} s "
+              f"{rate:12.1f} {self.unit}/s")
+
+def get_ingestion_counters():
+
+    return {
+        "load": StageCounter("load", "pages"),
+        "split": StageCounter("split", "chunks"),
+        "embed": StageCounter("embed", "chunks"),
+        "upsert": StageCounter("upsert", "chunks")
+    }
+
+def read_txt_blocks(file_path):
+
+    # Read a text file in blocks of about TXT_BLOCK_SIZE characters. Blocks end on a paragraph boundary
+    # (an empty line), which is where the text splitter splits anyway. The chunks at the two sides of a
+    # block boundary don't overlap (CHUNK_OVERLAP is not carried across blocks), so there is one chunk
+    # boundary without overlap per TXT_BLOCK_SIZE characters of the document
+    block = []
+    block_size = 0
+    with open(file_path, "r", encoding="1252") as file:
+        for line in file:
+            block.append(line)
+            block_size += len(line)
+            at_paragraph_end = not line.strip()
+            if (block_size >= TXT_BLOCK_SIZE and at_paragraph_end) or block_size >= 2 * TXT_BLOCK_SIZE:
+                yield "".join(block)
+                block = []
+                block_size = 0
+    if block:
+        yield "".join(block)
+
+def load_pages(file_path, file_type, counters):
+
+    # Generator of the text of a document, one page (PDF) or block (TXT) at a time
     if file_type == FILE_TYPE_TXT:
-        loader = TextLoader(file_path,encoding="1252")
-        documents = loader.load()
+        pages = read_txt_blocks(file_path)
     elif file_type == FILE_TYPE_PDF:
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
+        from langchain_community.document_loaders import PyPDFLoader
+        pages = (page.page_content for page in PyPDFLoader(file_path).lazy_load())
+    else:
+        raise ValueError("Unsupported file type: " + str(file_type))
+
+    while True:
+        start = time.perf_counter()
+        page = next(pages, None)
+        if page is None:
+            return
+        counters["load"].add(1, len(page.encode("utf-8")), time.perf_counter() - start)
+        yield page
+
+def split_pages(pages, counters):
+
+    from langchain.text_splitter import CharacterTextSplitter
+    text_splitter = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    for page in pages:
+        start = time.perf_counter()
+        chunks = text_splitter.split_text(page)
+        counters["split"].add(len(chunks), sum(len(chunk.encode("utf-8")) for chunk in chunks),
+                              time.perf_counter() - start)
+        yield from chunks
+
+def batched(items, batch_size):
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def sync_chunks(collection, bm25, chunks, index_key, counters):
+
+    # Diff the chunks of the document against the chunks already in the collection, one batch at a time:
+    # only new chunks are embedded, chunks that are still in the document are tagged with the new index key,
+    # and chunks that were not tagged (they are no longer in the document, or they were saved before chunks
+    # were tagged) are deleted at the end.
+    # Only one batch of chunks and embeddings is held in memory, regardless of the document size.
+    # The keyword index gets the same changes as the collection
+    added = 0
+    kept = 0
+
+    for batch in batched(chunks, INGEST_BATCH_SIZE):
+        batch_chunks = {get_chunk_id(chunk): chunk for chunk in batch}
+        existing_ids = set(collection.get(ids=list(batch_chunks.keys()), include=[])["ids"])
+
+        new_chunks = {chunk_id: chunk for chunk_id, chunk in batch_chunks.items() if chunk_id not in existing_ids}
+        kept_ids = [chunk_id for chunk_id in batch_chunks if chunk_id in existing_ids]
+
+        if new_chunks:
+            start = time.perf_counter()
+            embeddings = get_embedding_engine().embed(list(new_chunks.values()))
+            counters["embed"].add(len(new_chunks), embeddings.nbytes, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            collection.upsert(
+                ids=list(new_chunks.keys()),
+                documents=list(new_chunks.values()),
+                # chromadb 0.5 only accepts embeddings as lists
+                embeddings=embeddings.tolist(),
+                metadatas=[{"index_key": index_key}] * len(new_chunks)
+            )
+            bm25.add(list(new_chunks.keys()), list(new_chunks.values()))
+            counters["upsert"].add(len(new_chunks), embeddings.nbytes, time.perf_counter() - start)
+            added += len(new_chunks)
+
+        if kept_ids:
+            # Updating metadata only does not re-embed the chunks
+            collection.update(ids=kept_ids, metadatas=[{"index_key": index_key}] * len(kept_ids))
+            kept += len(kept_ids)
+
+    removed_ids = get_stale_chunk_ids(collection, index_key)
+    if removed_ids:
+        collection.delete(ids=removed_ids)
+        bm25.delete(removed_ids)
+
+    diff = {
+        "added": added,
+        "kept": kept,
+        "removed": len(removed_ids)
+    }
+    print(f"Index update - added: {diff['added']}, kept: {diff['kept']}, removed: {diff['removed']}")
 
-    text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    texts = text_splitter.split_documents(documents)
+    return diff
 
-    print(type(texts))
+def get_stale_chunk_ids(collection, index_key):
 
-    # Load chunks into chromadb
-    client = chromadb.Client()
-    collection = client.get_or_create_collection(collection_name,embedding_function=MiniLML6V2EmbeddingFunction())
-    collection.upsert(
-        documents=[doc.page_content for doc in texts],
-        ids=[str(i) for i in range(len(texts))],  # unique for each doc
-    )
+    # Ids of the chunks that are not tagged with index_key. A where filter can't be used here: chromadb's
+    # $ne doesn't match chunks without an index_key (saved by earlier versions of this module)
+    stale_ids = []
+    offset = 0
+    while True:
+        batch = collection.get(include=["metadatas"], limit=INGEST_BATCH_SIZE, offset=offset)
+        if not batch["ids"]:
+            break
+        stale_ids.extend(chunk_id for chunk_id, metadata in zip(batch["ids"], batch["metadatas"])
+                         if not metadata or metadata.get("index_key") != index_key)
+        offset += len(batch["ids"])
+
+    return stale_ids
+
+def create_embeddings(file_path,file_type,collection_name):
+
+    index_key = get_index_key(file_path)
+
+    client = get_chroma_client()
+    collection = client.get_or_create_collection(get_index_collection_name(collection_name),
+                                                 embedding_function=get_embedding_function())
+
+    bm25 = get_bm25_index(collection.name)
+    sync_bm25_index(collection, bm25)
+
+    # If the index for this exact document and settings has already been built, reuse it
+    if collection.metadata and collection.metadata.get("index_key") == index_key:
+        print("Reusing existing index for " + file_path)
+        return collection
+
+    # Streaming pipeline: load page by page -> split -> embed and upsert in batches
+    counters = get_ingestion_counters()
+    chunks = split_pages(load_pages(file_path, file_type, counters), counters)
+
+    # Load only the chunks that changed since the previous version of the document into chromadb
+    sync_chunks(collection, bm25, chunks, index_key, counters)
+
+    print("--------------------------------- Ingestion throughput -----------------------------------")
+    for counter in counters.values():
+        counter.report()
+
+    # Record the key only after all chunks were saved, so an interrupted load is rebuilt on the next call
+    collection.modify(metadata={"index_key": index_key})
 
     return collection
 
-def create_prompt(file_path, file_type, question, collection_name):
+def retrieve(collection, questions, n_results=N_RESULTS, retrieval_mode=RETRIEVAL_MODE):
+
+    # Returns the list of relevant chunks for each question
+    bm25 = get_bm25_index(collection.name)
+
+    if retrieval_mode == RETRIEVAL_LEXICAL:
+        # Fast path - keyword search only, the questions are not embedded
+        results = [[chunk for _, chunk in bm25.search(question, n_results)] for question in questions]
+        # Questions without any keyword match fall back to vector search
+        missing = [i for i, chunks in enumerate(results) if not chunks]
+        if missing:
+            dense = collection.query(query_texts=[questions[i] for i in missing], n_results=n_results)
+            for i, chunks in zip(missing, dense["documents"]):
+                results[i] = chunks
+        return results
+
+    # Embed all questions and query relevant information in one call
+    dense = collection.query(query_texts=questions, n_results=n_results)
+    if retrieval_mode == RETRIEVAL_DENSE:
+        return dense["documents"]
+
+    results = []
+    for question, chunk_ids, chunks in zip(questions, dense["ids"], dense["documents"]):
+        lexical = bm25.search(question, n_results)
+        fused = bm25_index.reciprocal_rank_fusion([list(zip(chunk_ids, chunks)), lexical], n_results)
+        results.append([chunk for _, chunk in fused])
+
+    return results
+
+def create_prompt(file_path, file_type, question, collection_name, retrieval_mode=RETRIEVAL_MODE):
 
     # Create embeddings for the text file
     collection = create_embeddings(file_path,file_type,collection_name)
 
     # Query relevant information
-    # You can try retrieving different number of chunks (n_results)
-    relevant_chunks = collection.query(
-        query_texts=[question],
-        n_results=5,
-    )
+    # You can try retrieving different number of chunks (n_results) and retrieval modes
+    relevant_chunks = retrieve(collection, [question], N_RESULTS, retrieval_mode)
 
-    context = "\n\n\n".join(relevant_chunks["documents"][0])
+    return get_prompt(relevant_chunks[0], question)
+
+def get_prompt(relevant_chunks, question):
+
+    # Chunks are in score order. Overlapping text is removed and chunks are added until the token budget is used
+    context = context_packer.pack(relevant_chunks, CONTEXT_TOKEN_BUDGET)
     # Please note that this is a generic format. You can change this format to be specific to llama
     prompt = (f"{context}\n\nPlease answer a question using this "
               + f"text. "
@@ -142,6 +501,16 @@ def create_prompt(file_path, file_type, question, collection_name):
 
     return prompt
 
+def create_prompts(file_path, file_type, questions, collection_name, retrieval_mode=RETRIEVAL_MODE):
+
+    # Create embeddings for the text file once for all questions
+    collection = create_embeddings(file_path,file_type,collection_name)
+
+    # Query relevant information for all questions at once
+    relevant_chunks = retrieve(collection, questions, N_RESULTS, retrieval_mode)
+
+    return [get_prompt(chunks, question) for chunks, question in zip(relevant_chunks, questions)]
+
 def main():
 
     # Get the API key and project id and update global variables
@@ -181,15 +550,8 @@ def answer_questions_from_doc(request_api_key, request_project_id, file_path,fil
     globals()["api_key"] = request_api_key
     globals()["watsonx_project_id"] = request_project_id
 
-    # Specify model parameters
-    model_type = "meta-llama/llama-2-70b-chat"
-    max_tokens = 300
-    min_tokens = 100
-    decoding = DecodingMethods.GREEDY
-    temperature = 0.7
-
     # Get the watsonx model
-    model = get_model(model_type, max_tokens, min_tokens, decoding, temperature)
+    model = get_model(MODEL_TYPE, MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
 
     # Get the prompt
     complete_prompt = create_prompt(file_path, file_type, question, collection_name)
@@ -199,7 +561,7 @@ def answer_questions_from_doc(request_api_key, request_project_id, file_path,fil
     print("*** Prompt:" + complete_prompt + "***")
     print("----------------------------------------------------------------------------------------------------")
 
-    generated_response = model.generate(prompt=complete_prompt)
+    generated_response = response_cache.generate(model, complete_prompt)
     response_text = generated_response['results'][0]['generated_text']
 
     # print model response
@@ -209,6 +571,59 @@ def answer_questions_from_doc(request_api_key, request_project_id, file_path,fil
 
     return response_text
 
+# Batch mode: answer several questions about the same document. The document is indexed once,
+# all questions are embedded in one query, and up to max_concurrency generations run at the same time
+def answer_questions_from_doc_batch(request_api_key, request_project_id, file_path, file_type, questions,
+                                    collection_name, max_concurrency=4):
+
+    # Retrieve variables for invoking llms
+    get_credentials()
+
+    # Update the global variable
+    globals()["api_key"] = request_api_key
+    globals()["watsonx_project_id"] = request_project_id
+
+    # Get the watsonx model - one model object is shared by all generations
+    model = get_model(MODEL_TYPE, MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
+
+    # Get the prompts
+    complete_prompts = create_prompts(file_path, file_type, questions, collection_name)
+
+    # Concurrent generations stay within the rate limits of the project and the model.
+    # The results are in the same order as the questions
+    batch = batch_generation.generate_batch(model, complete_prompts, max_concurrency)
+
+    results = []
+    for question, result in zip(questions, batch["results"]):
+        response_text = batch_generation.get_text(result)
+        results.append({"question": question, "answer": response_text, "latency": result["latency"]})
+        print(f"Question: {question} ({result['latency']:.2f} s)")
+        print("Answer: " + response_text)
+
+    return results
+
+
+# Async version of answer_questions_from_doc - it can be awaited from asyncio code
+async def answer_questions_from_doc_async(request_api_key, request_project_id, file_path, file_type, question,
+                                          collection_name):
+
+    # asyncio is already loaded by the event loop. The async generation client is imported here, because it loads httpx
+    import asyncio
+    import async_generation
+
+    # Retrieve variables for invoking llms. The credentials of the request are passed to async_generation
+    # (not saved in global variables), because concurrent calls may use different credentials
+    get_credentials()
+
+    # Indexing the document and retrieval are blocking (local CPU work), so they run in a worker thread
+    complete_prompt = await asyncio.to_thread(create_prompt, file_path, file_type, question, collection_name)
+
+    generate_params = get_generate_params(MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
+    response_text = await async_generation.generate_text(url, request_api_key, request_project_id, MODEL_TYPE,
+                                                         complete_prompt, generate_params)
+
+    return response_text
+
 
 # Invoke the main function
 if __name__ == "__main__":
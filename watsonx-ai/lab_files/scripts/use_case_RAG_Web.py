@@ -16,25 +16,43 @@ This example shows a Question and Answer use case for a provided web site
 
 IMPORTANT: Be aware of the disk space that will be taken up by documents when they're loaded into
 chromadb on your laptop. The size in chroma will likely be the same as .txt file size
+
+Importing this module doesn't import chromadb, the watsonx.ai SDK, httpx, requests or BeautifulSoup - each of
+them is imported by the function that uses it first, so that an app that imports the module starts in
+milliseconds (see benchmark_startup.py).
 """
 
 # For reading credentials from the .env file
 import os
 from dotenv import load_dotenv
 
-from sentence_transformers import SentenceTransformer
-from chromadb.api.types import EmbeddingFunction
-
-# WML python SDK
-from ibm_watsonx_ai.foundation_models import Model
-from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
-from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMethods
-
-import requests
-from bs4 import BeautifulSoup
-import spacy
-import chromadb
-import en_core_web_md
+# Local models (embedding model, spaCy pipeline) are loaded lazily and shared through the model registry
+import model_registry
+# Builds the context of the prompt within a token budget
+import context_packer
+
+# Cache of watsonx.ai Model objects
+import model_cache
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+# Concurrent generations of a batch of prompts
+import batch_generation
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+SPACY_MODEL_NAME = "en_core_web_md"
+
+# Maximum number of tokens of retrieved text in the prompt
+CONTEXT_TOKEN_BUDGET = context_packer.CONTEXT_TOKEN_BUDGET
+
+# Model parameters of answer_questions_from_web(), answer_questions_from_web_batch()
+# and answer_questions_from_web_async()
+MODEL_TYPE = "meta-llama/llama-2-70b-chat"
+MAX_TOKENS = 100
+MIN_TOKENS = 50
+TOP_K = 50
+TOP_P = 1
+DECODING = "greedy"
+TEMPERATURE = 0.7
 
 # These global variables will be updated in get_credentials() functions
 watsonx_project_id = ""
@@ -50,10 +68,13 @@ def get_credentials():
     globals()["watsonx_project_id"] = os.getenv("project_id", None)
     globals()["url"] = os.getenv("url", None)
 
-# The get_model function creates an LLM model object with the specified parameters
+# Generation parameters of the model and of the async requests
+def get_generate_params(max_tokens, min_tokens, decoding, temperature, top_k, top_p):
 
-def get_model(model_type, max_tokens, min_tokens, decoding, temperature, top_k, top_p):
-    generate_params = {
+    # watsonx.ai python SDK
+    from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
+
+    return {
         GenParams.MAX_NEW_TOKENS: max_tokens,
         GenParams.MIN_NEW_TOKENS: min_tokens,
         GenParams.DECODING_METHOD: decoding,
@@ -62,20 +83,24 @@ def get_model(model_type, max_tokens, min_tokens, decoding, temperature, top_k,
         GenParams.TOP_P: top_p,
     }
 
-    model = Model(
-        model_id=model_type,
-        params=generate_params,
-        credentials={
-            "apikey": api_key,
-            "url": url
-        },
-        project_id=watsonx_project_id
-    )
+
+# The get_model function creates an LLM model object with the specified parameters
+def get_model(model_type, max_tokens, min_tokens, decoding, temperature, top_k, top_p):
+
+    generate_params = get_generate_params(max_tokens, min_tokens, decoding, temperature, top_k, top_p)
+
+    # Model objects are cached and reused by requests with the same settings, so only the first
+    # request pays for authentication and validation of the model
+    model = model_cache.get_model(model_type, generate_params,
+                                  {"apikey": api_key, "url": url},
+                                  watsonx_project_id)
 
     return model
 
 
 def get_model_test(model_type, max_tokens, min_tokens, decoding, temperature):
+    from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
+
     generate_params = {
         GenParams.MAX_NEW_TOKENS: max_tokens,
         GenParams.MIN_NEW_TOKENS: min_tokens,
@@ -83,28 +108,33 @@ def get_model_test(model_type, max_tokens, min_tokens, decoding, temperature):
         GenParams.TEMPERATURE: temperature
     }
 
-    model = Model(
-        model_id=model_type,
-        params=generate_params,
-        credentials={
-            "apikey": api_key,
-            "url": url
-        },
-        project_id=watsonx_project_id
-    )
+    # Model objects are cached and reused by requests with the same settings, so only the first
+    # request pays for authentication and validation of the model
+    model = model_cache.get_model(model_type, generate_params,
+                                  {"apikey": api_key, "url": url},
+                                  watsonx_project_id)
 
     return model
 
 
-# Embedding function
-class MiniLML6V2EmbeddingFunction(EmbeddingFunction):
-    MODEL = SentenceTransformer('all-MiniLM-L6-v2')
+# Embedding function. The class derives from a chromadb class, so it's created when chromadb is first used
+def get_embedding_function():
+
+    from chromadb.api.types import EmbeddingFunction
+
+    class MiniLML6V2EmbeddingFunction(EmbeddingFunction):
 
-    def __call__(self, texts):
-        return MiniLML6V2EmbeddingFunction.MODEL.encode(texts).tolist()
+        def __call__(self, texts):
+            # The model is loaded on first use (not at import time) and shared by all callers in the process
+            return model_registry.get_embedding_engine(EMBEDDING_MODEL_NAME).embed(texts).tolist()
+
+    return MiniLML6V2EmbeddingFunction()
 
 
 def extract_text(url):
+    import requests
+    from bs4 import BeautifulSoup
+
     try:
         # Send an HTTP GET request to the URL
         response = requests.get(url)
@@ -134,7 +164,8 @@ def extract_text(url):
 
 
 def split_text_into_sentences(text):
-    nlp = spacy.load("en_core_web_md")
+    # The spaCy pipeline is loaded once per process instead of on every call
+    nlp = model_registry.get_spacy_pipeline(SPACY_MODEL_NAME)
     doc = nlp(text)
     sentences = [sent.text for sent in doc.sents]
     cleaned_sentences = [s.strip() for s in sentences]
@@ -145,6 +176,7 @@ def create_embedding(url, collection_name):
     cleaned_text = extract_text(url)
     cleaned_sentences = split_text_into_sentences(cleaned_text)
 
+    import chromadb
     client = chromadb.Client()
 
     collection = client.get_or_create_collection(collection_name)
@@ -168,7 +200,12 @@ def create_prompt(url, question, collection_name):
         query_texts=[question],
         n_results=5,
     )
-    context = "\n\n\n".join(relevant_chunks["documents"][0])
+    return get_prompt(relevant_chunks["documents"][0], question)
+
+
+def get_prompt(relevant_chunks, question):
+    # Chunks are in score order. Overlapping text is removed and chunks are added until the token budget is used
+    context = context_packer.pack(relevant_chunks, CONTEXT_TOKEN_BUDGET)
     # Please note that this is a generic format. You can change this format to be specific to llama
     prompt = (f"{context}\n\nPlease answer the following question in one sentence using this "
               + f"text. "
@@ -178,6 +215,19 @@ def create_prompt(url, question, collection_name):
     return prompt
 
 
+def create_prompts(url, questions, collection_name):
+    # Load the web page once for all questions
+    collection = create_embedding(url, collection_name)
+
+    # Embed all questions and query relevant information in one call
+    relevant_chunks = collection.query(
+        query_texts=questions,
+        n_results=5,
+    )
+
+    return [get_prompt(chunks, question) for chunks, question in zip(relevant_chunks["documents"], questions)]
+
+
 def main():
 
     # Get the API key and project id and update global variables
@@ -203,17 +253,8 @@ def answer_questions_from_web(request_api_key, request_project_id, url, question
     globals()["api_key"] = request_api_key
     globals()["watsonx_project_id"] = request_project_id
 
-    # Specify model parameters
-    model_type = "meta-llama/llama-2-70b-chat"
-    max_tokens = 100
-    min_tokens = 50
-    top_k = 50
-    top_p = 1
-    decoding = DecodingMethods.GREEDY
-    temperature = 0.7
-
     # Get the watsonx model = try both options
-    model = get_model(model_type, max_tokens, min_tokens, decoding, temperature, top_k, top_p)
+    model = get_model(MODEL_TYPE, MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE, TOP_K, TOP_P)
 
     # Get the prompt
     complete_prompt = create_prompt(url, question, collection_name)
@@ -223,7 +264,7 @@ def answer_questions_from_web(request_api_key, request_project_id, url, question
     print("*** Prompt:" + complete_prompt + "***")
     print("----------------------------------------------------------------------------------------------------")
 
-    generated_response = model.generate(prompt=complete_prompt)
+    generated_response = response_cache.generate(model, complete_prompt)
     response_text = generated_response['results'][0]['generated_text']
 
     # Remove trailing white spaces
@@ -237,6 +278,60 @@ def answer_questions_from_web(request_api_key, request_project_id, url, question
     return response_text
 
 
+# Batch mode: answer several questions about the same web page. The page is loaded once,
+# all questions are embedded in one query, and up to max_concurrency generations run at the same time
+def answer_questions_from_web_batch(request_api_key, request_project_id, url, questions, collection_name,
+                                    max_concurrency=4):
+
+    # Retrieve variables for invoking llms
+    get_credentials()
+
+    # Update the global variable
+    globals()["api_key"] = request_api_key
+    globals()["watsonx_project_id"] = request_project_id
+
+    # Get the watsonx model - one model object is shared by all generations
+    model = get_model(MODEL_TYPE, MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE, TOP_K, TOP_P)
+
+    # Get the prompts
+    complete_prompts = create_prompts(url, questions, collection_name)
+
+    # Concurrent generations stay within the rate limits of the project and the model.
+    # The results are in the same order as the questions
+    batch = batch_generation.generate_batch(model, complete_prompts, max_concurrency)
+
+    results = []
+    for question, result in zip(questions, batch["results"]):
+        response_text = batch_generation.get_text(result).strip()
+        results.append({"question": question, "answer": response_text, "latency": result["latency"]})
+        print(f"Question: {question} ({result['latency']:.2f} s)")
+        print("Answer: " + response_text)
+
+    return results
+
+
+# Async version of answer_questions_from_web - it can be awaited from asyncio code
+async def answer_questions_from_web_async(request_api_key, request_project_id, url, question, collection_name):
+
+    # asyncio is already loaded by the event loop. The async generation client is imported here, because it loads httpx
+    import asyncio
+    import async_generation
+
+    # Retrieve variables for invoking llms. The credentials of the request are passed to async_generation
+    # (not saved in global variables), because concurrent calls may use different credentials
+    get_credentials()
+
+    # Loading the web page and retrieval are blocking, so they run in a worker thread
+    complete_prompt = await asyncio.to_thread(create_prompt, url, question, collection_name)
+
+    generate_params = get_generate_params(MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE, TOP_K, TOP_P)
+    # The url parameter is the web page, the watsonx.ai url is the global variable
+    response_text = await async_generation.generate_text(globals()["url"], request_api_key, request_project_id,
+                                                         MODEL_TYPE, complete_prompt, generate_params)
+
+    return response_text.strip()
+
+
 # Invoke the main function
 if __name__ == "__main__":
     main()
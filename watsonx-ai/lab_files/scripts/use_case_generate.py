@@ -15,13 +15,26 @@ This example shows a Generate use case
 import os
 from dotenv import load_dotenv
 
-from ibm_watsonx_ai.foundation_models import Model
 from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
 from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMethods
 
+# Cache of watsonx.ai Model objects
+import model_cache
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+
+# Async generation client (used by the async versions of the entry points)
+import async_generation
+
 TASK_DEFAULT = "default"
 TASK_GENERATE_EMAIL = "generate email"
 
+# Model parameters of generate() and generate_async()
+MAX_TOKENS = 150
+MIN_TOKENS = 100
+DECODING = DecodingMethods.SAMPLE
+TEMPERATURE = 0.7
+
 # These global variables will be updated in get_credentials() functions
 watsonx_project_id = ""
 api_key = ""
@@ -36,24 +49,25 @@ def get_credentials():
     globals()["watsonx_project_id"] = os.getenv("project_id", None)
     globals()["url"] = os.getenv("url", None)
 
-def get_model(model_type,max_tokens,min_tokens,decoding,temperature):
+# Generation parameters of the model and of the async requests
+def get_generate_params(max_tokens,min_tokens,decoding,temperature):
 
-    generate_params = {
+    return {
         GenParams.MAX_NEW_TOKENS: max_tokens,
         GenParams.MIN_NEW_TOKENS: min_tokens,
         GenParams.DECODING_METHOD: decoding,
         GenParams.TEMPERATURE: temperature
     }
 
-    model = Model(
-        model_id=model_type,
-        params=generate_params,
-        credentials={
-            "apikey": api_key,
-            "url": url
-        },
-        project_id=watsonx_project_id
-        )
+def get_model(model_type,max_tokens,min_tokens,decoding,temperature):
+
+    generate_params = get_generate_params(max_tokens, min_tokens, decoding, temperature)
+
+    # Model objects are cached and reused by requests with the same settings, so only the first
+    # request pays for authentication and validation of the model
+    model = model_cache.get_model(model_type, generate_params,
+                                  {"apikey": api_key, "url": url},
+                                  watsonx_project_id)
 
     return model
 
@@ -133,7 +147,7 @@ def main():
     review = get_review()
     complete_prompt = get_prompt(review, TASK_GENERATE_EMAIL, "negative")
 
-    generated_response = model.generate(prompt=complete_prompt)
+    generated_response = response_cache.generate(model, complete_prompt)
     response_text = generated_response['results'][0]['generated_text']
 
     # print model response
@@ -155,24 +169,33 @@ def generate(request_api_key, request_project_id, review, task,model_type):
     globals()["api_key"] = request_api_key
     globals()["watsonx_project_id"] = request_project_id
 
-    # Specify model parameters
-    max_tokens = 150
-    min_tokens = 100
-    decoding = DecodingMethods.SAMPLE
-    temperature = 0.7
-
     # Instantiate the model
-    model = get_model(model_type, max_tokens, min_tokens, decoding, temperature)
+    model = get_model(model_type, MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
 
     complete_prompt = get_prompt(review, task, "negative")
 
-    generated_response = model.generate(prompt=complete_prompt)
+    generated_response = response_cache.generate(model, complete_prompt)
     response_text = generated_response['results'][0]['generated_text']
 
     print("*************************************************************")
     print("Function invocation test result:" + response_text)
 
 
+# Async version of generate - it can be awaited from asyncio code and many calls can run concurrently
+async def generate_async(request_api_key, request_project_id, review, task, model_type):
+
+    # Retrieve variables for invoking llms. The credentials of the request are passed to async_generation
+    # (not saved in global variables), because concurrent calls may use different credentials
+    get_credentials()
+
+    complete_prompt = get_prompt(review, task, "negative")
+
+    generate_params = get_generate_params(MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
+    response_text = await async_generation.generate_text(url, request_api_key, request_project_id, model_type,
+                                                         complete_prompt, generate_params)
+
+    return response_text
+
 # Invoke the main function
 if __name__ == "__main__":
     main()
@@ -15,14 +15,32 @@ This example shows several examples of inference with LLMs
 import os
 from dotenv import load_dotenv
 
-from ibm_watsonx_ai.foundation_models import Model
 from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
 from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMethods
 
+# Cache of watsonx.ai Model objects
+import model_cache
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+
+# Concurrent generation of several prompts
+import batch_generation
+
+# Async generation client (used by the async versions of the entry points)
+import async_generation
+
 TASK_SENTIMENT = "Sentiment"
 TASK_EMOTIONS = "Emotions"
 TASK_ENTITY = "Entities"
 
+# Model parameters of extract() and extract_async()
+MAX_TOKENS = 100
+MIN_TOKENS = 30
+DECODING = DecodingMethods.GREEDY
+TEMPERATURE = 0.7
+# Max repition penalty, 1 is min
+REPETITION_PENALTY = 2
+
 # These global variables will be updated in get_credentials() functions
 watsonx_project_id = ""
 api_key = ""
@@ -37,10 +55,10 @@ def get_credentials():
     globals()["watsonx_project_id"] = os.getenv("project_id", None)
     globals()["url"] = os.getenv("url", None)
 
-# This function creates a model object with the specified parameters
-def get_model(model_type,max_tokens,min_tokens,decoding,temperature,repetition_penalty):
+# Generation parameters of the model and of the async requests
+def get_generate_params(max_tokens,min_tokens,decoding,temperature,repetition_penalty):
 
-    generate_params = {
+    return {
         GenParams.MAX_NEW_TOKENS: max_tokens,
         GenParams.MIN_NEW_TOKENS: min_tokens,
         GenParams.DECODING_METHOD: decoding,
@@ -48,15 +66,16 @@ def get_model(model_type,max_tokens,min_tokens,decoding,temperature,repetition_p
         GenParams.REPETITION_PENALTY:repetition_penalty
     }
 
-    model = Model(
-        model_id=model_type,
-        params=generate_params,
-        credentials={
-            "apikey": api_key,
-            "url": url
-        },
-        project_id=watsonx_project_id
-        )
+# This function creates a model object with the specified parameters
+def get_model(model_type,max_tokens,min_tokens,decoding,temperature,repetition_penalty):
+
+    generate_params = get_generate_params(max_tokens, min_tokens, decoding, temperature, repetition_penalty)
+
+    # Model objects are cached and reused by requests with the same settings, so only the first
+    # request pays for authentication and validation of the model
+    model = model_cache.get_model(model_type, generate_params,
+                                  {"apikey": api_key, "url": url},
+                                  watsonx_project_id)
 
     return model
 
@@ -150,9 +169,13 @@ def main():
     complete_prompt2 = get_prompt(review, TASK_EMOTIONS)
     complete_prompt3 = get_prompt(review, TASK_ENTITY)
 
-    # Invoke the model
-    generated_response = model.generate(prompt=complete_prompt1)
-    response_text = generated_response['results'][0]['generated_text']
+    # Generate all responses at the same time. The wall time is close to the slowest generation
+    # instead of the sum of all generations. Results are in the same order as the prompts
+    batch = batch_generation.generate_batch(model, [complete_prompt1, complete_prompt2, complete_prompt3])
+    results = batch["results"]
+
+    # Sentiment
+    response_text = batch_generation.get_text(results[0])
     # print model response
     print("--------------------------------- Sentiment -----------------------------------")
     print("Prompt: " + complete_prompt1.strip())
@@ -161,8 +184,7 @@ def main():
     print("*********************************************************************************************")
 
     # Emotions
-    generated_response = model.generate(prompt=complete_prompt2)
-    response_text = generated_response['results'][0]['generated_text']
+    response_text = batch_generation.get_text(results[1])
     # print model response
     print("--------------------------------- Emotions -----------------------------------")
     print("Prompt: " + complete_prompt2.strip())
@@ -171,8 +193,7 @@ def main():
     print("*********************************************************************************************")
 
     # Entity
-    generated_response = model.generate(prompt=complete_prompt3)
-    response_text = generated_response['results'][0]['generated_text']
+    response_text = batch_generation.get_text(results[2])
     # print model response
     print("--------------------------------- Entities -----------------------------------")
     print("Prompt: " + complete_prompt3.strip())
@@ -194,26 +215,35 @@ def extract(request_api_key, request_project_id, review, task_type,model_type):
     globals()["api_key"] = request_api_key
     globals()["watsonx_project_id"] = request_project_id
 
-    # Specify model parameters
-    max_tokens = 100
-    min_tokens = 30
-    decoding = DecodingMethods.GREEDY
-    temperature = 0.7
-    # Max repition penalty, 1 is min
-    repetition_penalty = 2
-
     # Instantiate the model
-    model = get_model(model_type, max_tokens, min_tokens, decoding, temperature, repetition_penalty)
+    model = get_model(model_type, MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE, REPETITION_PENALTY)
 
     # Construct the prompt
     complete_prompt = get_prompt(review, task_type)
 
     # Invoke the model
-    generated_response = model.generate(prompt=complete_prompt)
+    generated_response = response_cache.generate(model, complete_prompt)
     response_text = generated_response['results'][0]['generated_text']
 
     return response_text
 
+# Async version of extract - it can be awaited from asyncio code and many calls can run concurrently
+async def extract_async(request_api_key, request_project_id, review, task_type, model_type):
+
+    # Retrieve variables for invoking llms. The credentials of the request are passed to async_generation
+    # (not saved in global variables), because concurrent calls may use different credentials
+    get_credentials()
+
+    # Construct the prompt
+    complete_prompt = get_prompt(review, task_type)
+
+    # Invoke the model
+    generate_params = get_generate_params(MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE, REPETITION_PENALTY)
+    response_text = await async_generation.generate_text(url, request_api_key, request_project_id, model_type,
+                                                         complete_prompt, generate_params)
+
+    return response_text
+
 # Invoke the main function
 if __name__ == "__main__":
     main()
@@ -15,16 +15,32 @@ This example shows a simple summary use case without comprehensive prompt tuning
 import os
 from dotenv import load_dotenv
 
-import ibm_watsonx_ai.foundation_models
 from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
 from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMethods
 
+# Cache of watsonx.ai Model objects
+import model_cache
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+
+# Concurrent generation of several prompts
+import batch_generation
+
+# Async generation client (used by the async versions of the entry points)
+import async_generation
+
 REVIEW_TYPE_DEFAULT = "Default"
 REVIEW_TYPE_NEGATIVE = "Negative"
 REVIEW_TYPE_POSITIVE = "Positive"
 REVIEW_TYPE_KEYWORD_INTEREST = "Interest Rate"
 REVIEW_TYPE_BULLET_POINTS = "Bullet Points"
 
+# Model parameters of get_summary() and get_summary_async()
+MAX_TOKENS = 300
+MIN_TOKENS = 50
+DECODING = DecodingMethods.SAMPLE
+TEMPERATURE = 0.7
+
 # These global variables will be updated in get_credentials() functions
 watsonx_project_id = ""
 api_key = ""
@@ -39,25 +55,26 @@ def get_credentials():
     globals()["watsonx_project_id"] = os.getenv("project_id", None)
     globals()["url"] = os.getenv("url", None)
 
-# This function creates a model object with the specified parameters
-def get_model(model_type,max_tokens,min_tokens,decoding,temperature):
+# Generation parameters of the model and of the async requests
+def get_generate_params(max_tokens,min_tokens,decoding,temperature):
 
-    generate_params = {
+    return {
         GenParams.MAX_NEW_TOKENS: max_tokens,
         GenParams.MIN_NEW_TOKENS: min_tokens,
         GenParams.DECODING_METHOD: decoding,
         GenParams.TEMPERATURE: temperature
     }
 
-    model = ibm_watsonx_ai.foundation_models.Model(
-        model_id=model_type,
-        params=generate_params,
-        credentials={
-            "apikey": api_key,
-            "url": url
-        },
-        project_id=watsonx_project_id
-        )
+# This function creates a model object with the specified parameters
+def get_model(model_type,max_tokens,min_tokens,decoding,temperature):
+
+    generate_params = get_generate_params(max_tokens, min_tokens, decoding, temperature)
+
+    # Model objects are cached and reused by requests with the same settings, so only the first
+    # request pays for authentication and validation of the model
+    model = model_cache.get_model(model_type, generate_params,
+                                  {"apikey": api_key, "url": url},
+                                  watsonx_project_id)
 
     return model
 
@@ -213,51 +230,47 @@ def main():
     # Instantiate the model
     model = get_model(model_type, max_tokens, min_tokens, decoding, temperature)
 
+    # Generate all responses at the same time. The wall time is close to the slowest generation
+    # instead of the sum of all generations. Results are in the same order as the prompts
+    batch = batch_generation.generate_batch(model, [complete_prompt1, complete_prompt2, complete_prompt3,
+                                                     complete_prompt4, complete_prompt5])
+    results = batch["results"]
+
     # Default summary
-    # Invoke the model and print the results
-    generated_response = model.generate(prompt=complete_prompt1)
     # print model response
     print("--------------------------------- Default Review Summary -----------------------------------")
     print("Prompt: " + complete_prompt1.strip())
     print("---------------------------------------------------------------------------------------------")
-    print("Default Summary: " + generated_response['results'][0]['generated_text'])
+    print("Default Summary: " + batch_generation.get_text(results[0]))
     print("*********************************************************************************************")
 
     # Negative summary
-    # Invoke the model and print the results
-    generated_response = model.generate(prompt=complete_prompt2)
     # print model response
     print("--------------------------------- Negative Review Summary -----------------------------------")
     print("Prompt: " + complete_prompt1.strip())
     print("---------------------------------------------------------------------------------------------")
-    print("Negative Summary: " + generated_response['results'][0]['generated_text'])
+    print("Negative Summary: " + batch_generation.get_text(results[1]))
 
     # Positive summary
-    # Invoke the model and print the results
-    generated_response = model.generate(prompt=complete_prompt3)
     # print model response
     print("--------------------------------- Positive Review Summary -----------------------------------")
     print("Prompt: " + complete_prompt1.strip())
     print("---------------------------------------------------------------------------------------------")
-    print("Positive Summary: " + generated_response['results'][0]['generated_text'])
+    print("Positive Summary: " + batch_generation.get_text(results[2]))
 
     # Keyword summary
-    # Invoke the model and print the results
-    generated_response = model.generate(prompt=complete_prompt4)
     # print model response
     print("--------------------------------- Keyword  Summary -----------------------------------")
     print("Prompt: " + complete_prompt1.strip())
     print("---------------------------------------------------------------------------------------------")
-    print("Keyword Summary: " + generated_response['results'][0]['generated_text'])
+    print("Keyword Summary: " + batch_generation.get_text(results[3]))
 
     # Bullet points summary
-    # Invoke the model and print the results
-    generated_response = model.generate(prompt=complete_prompt5)
     # print model response
     print("--------------------------------- Bullet Points Summary -----------------------------------")
     print("Prompt: " + complete_prompt1.strip())
     print("---------------------------------------------------------------------------------------------")
-    print("Bullet Points Summary: " + generated_response['results'][0]['generated_text'])
+    print("Bullet Points Summary: " + batch_generation.get_text(results[4]))
 
     # Test modular function invocation
     get_summary(api_key, watsonx_project_id, review,REVIEW_TYPE_DEFAULT,model_type)
@@ -272,18 +285,12 @@ def get_summary(request_api_key, request_project_id, review,review_type,model_ty
     globals()["api_key"] = request_api_key
     globals()["watsonx_project_id"] = request_project_id
 
-    # Specify model parameters
-    max_tokens = 300
-    min_tokens = 50
-    decoding = DecodingMethods.SAMPLE
-    temperature = 0.7
-
     # Instantiate the model
-    model = get_model(model_type, max_tokens, min_tokens, decoding, temperature)
+    model = get_model(model_type, MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
 
     complete_prompt = get_prompt(review, review_type)
 
-    generated_response = model.generate(prompt=complete_prompt)
+    generated_response = response_cache.generate(model, complete_prompt)
     response_text = generated_response['results'][0]['generated_text']
 
     print("Prompt: " + complete_prompt)
@@ -292,6 +299,21 @@ def get_summary(request_api_key, request_project_id, review,review_type,model_ty
 
     return response_text
 
+# Async version of get_summary - it can be awaited from asyncio code and many calls can run concurrently
+async def get_summary_async(request_api_key, request_project_id, review, review_type, model_type):
+
+    # Retrieve variables for invoking llms. The credentials of the request are passed to async_generation
+    # (not saved in global variables), because concurrent calls may use different credentials
+    get_credentials()
+
+    complete_prompt = get_prompt(review, review_type)
+
+    generate_params = get_generate_params(MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
+    response_text = await async_generation.generate_text(url, request_api_key, request_project_id, model_type,
+                                                         complete_prompt, generate_params)
+
+    return response_text
+
 # Invoke the main function
 if __name__ == "__main__":
     main()
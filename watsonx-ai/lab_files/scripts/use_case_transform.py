@@ -15,15 +15,31 @@ This example shows a Transform use case
 import os
 from dotenv import load_dotenv
 
-from ibm_watsonx_ai.foundation_models import Model
 from ibm_watsonx_ai.metanames import GenTextParamsMetaNames as GenParams
 from ibm_watsonx_ai.foundation_models.utils.enums import ModelTypes, DecodingMethods
 
+# Cache of watsonx.ai Model objects
+import model_cache
+# Cache of responses of deterministic (greedy) generations
+import response_cache
+
+# Concurrent generation of several prompts
+import batch_generation
+
+# Async generation client (used by the async versions of the entry points)
+import async_generation
+
 TASK_BULLET_POINTS = "points"
 TASK_COMPLEX_JSON_FORMAT = "json"
 TASK_HTML_FORMAT = "html"
 TASK_EXTRACT_EMAIL = "email"
 
+# Model parameters of transform() and transform_async()
+MAX_TOKENS = 300
+MIN_TOKENS = 30
+DECODING = DecodingMethods.GREEDY
+TEMPERATURE = 0.5
+
 # These global variables will be updated in get_credentials() functions
 watsonx_project_id = ""
 api_key = ""
@@ -38,24 +54,25 @@ def get_credentials():
     globals()["watsonx_project_id"] = os.getenv("project_id", None)
     globals()["url"] = os.getenv("url", None)
 
-def get_model(model_type,max_tokens,min_tokens,decoding,temperature):
+# Generation parameters of the model and of the async requests
+def get_generate_params(max_tokens,min_tokens,decoding,temperature):
 
-    generate_params = {
+    return {
         GenParams.MAX_NEW_TOKENS: max_tokens,
         GenParams.MIN_NEW_TOKENS: min_tokens,
         GenParams.DECODING_METHOD: decoding,
         GenParams.TEMPERATURE: temperature
     }
 
-    model = Model(
-        model_id=model_type,
-        params=generate_params,
-        credentials={
-            "apikey": api_key,
-            "url": url
-        },
-        project_id=watsonx_project_id
-        )
+def get_model(model_type,max_tokens,min_tokens,decoding,temperature):
+
+    generate_params = get_generate_params(max_tokens, min_tokens, decoding, temperature)
+
+    # Model objects are cached and reused by requests with the same settings, so only the first
+    # request pays for authentication and validation of the model
+    model = model_cache.get_model(model_type, generate_params,
+                                  {"apikey": api_key, "url": url},
+                                  watsonx_project_id)
 
     return model
 
@@ -167,8 +184,13 @@ def main():
     # For the JSON format, the sample text includes the prompt
     complete_prompt4 = sample_text4
 
-    generated_response = model.generate(prompt=complete_prompt1)
-    response_text = generated_response['results'][0]['generated_text']
+    # Generate all responses at the same time. The wall time is close to the slowest generation
+    # instead of the sum of all generations. Results are in the same order as the prompts
+    batch = batch_generation.generate_batch(model, [complete_prompt1, complete_prompt2, complete_prompt3,
+                                                     complete_prompt4])
+    results = batch["results"]
+
+    response_text = batch_generation.get_text(results[0])
 
     # print model response
     print("--------------------------------- Bullet points from text -----------------------------------")
@@ -178,8 +200,7 @@ def main():
     print("*********************************************************************************************")
 
     # HTMl format
-    generated_response = model.generate(prompt=complete_prompt2)
-    response_text = generated_response['results'][0]['generated_text']
+    response_text = batch_generation.get_text(results[1])
     # print model response
     print("--------------------------------- Transformed Format: HTML -----------------------------------")
     print("Prompt: " + complete_prompt2.strip())
@@ -188,8 +209,7 @@ def main():
     print("*********************************************************************************************")
 
     # HTMl format
-    generated_response = model.generate(prompt=complete_prompt3)
-    response_text = generated_response['results'][0]['generated_text']
+    response_text = batch_generation.get_text(results[2])
     # print model response
     print("--------------------------------- Transformed Format: EMAIL -----------------------------------")
     print("Prompt: " + complete_prompt3.strip())
@@ -198,8 +218,7 @@ def main():
     print("*********************************************************************************************")
 
     # JSON format
-    generated_response = model.generate(prompt=complete_prompt4)
-    response_text = generated_response['results'][0]['generated_text']
+    response_text = batch_generation.get_text(results[3])
     # print model response
     print("--------------------------------- Transformed Format: JSON -----------------------------------")
     print("Prompt: " + complete_prompt4.strip())
@@ -219,18 +238,12 @@ def transform(request_api_key, request_project_id, sample_text,task,model_type):
     globals()["api_key"] = request_api_key
     globals()["watsonx_project_id"] = request_project_id
 
-    # Specify model parameters
-    max_tokens = 300
-    min_tokens = 30
-    decoding = DecodingMethods.GREEDY
-    temperature = 0.5
-
     # Instantiate the model
-    model = get_model(model_type, max_tokens, min_tokens, decoding, temperature)
+    model = get_model(model_type, MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
 
     complete_prompt = get_prompt(sample_text,task)
 
-    generated_response = model.generate(prompt=complete_prompt)
+    generated_response = response_cache.generate(model, complete_prompt)
     response_text = generated_response['results'][0]['generated_text']
 
     print("*************************************************************")
@@ -238,6 +251,21 @@ def transform(request_api_key, request_project_id, sample_text,task,model_type):
 
     return response_text
 
+# Async version of transform - it can be awaited from asyncio code and many calls can run concurrently
+async def transform_async(request_api_key, request_project_id, sample_text, task, model_type):
+
+    # Retrieve variables for invoking llms. The credentials of the request are passed to async_generation
+    # (not saved in global variables), because concurrent calls may use different credentials
+    get_credentials()
+
+    complete_prompt = get_prompt(sample_text, task)
+
+    generate_params = get_generate_params(MAX_TOKENS, MIN_TOKENS, DECODING, TEMPERATURE)
+    response_text = await async_generation.generate_text(url, request_api_key, request_project_id, model_type,
+                                                         complete_prompt, generate_params)
+
+    return response_text
+
 # Invoke the main function
 if __name__ == "__main__":
     main()
@@ -7,17 +7,30 @@ AI Assistant application that's running in watsonx.ai
 
 from ibm_watsonx_ai import APIClient
 
+# Deadlines, retries and hedging of invocations
+import resilience
+# REST invocations for a local stand-in of watsonx.ai
+import rest_model
+
 def invoke_prompt_template(url,api_key,space_id, deployment_id,task):
 
-    credentials = {
-        "url": url,
-        "apikey": api_key
-    }
+    if rest_model.is_local_url(url):
+        # The SDK only connects to IBM Cloud, a local stand-in is called with the REST API
+        generate_text = lambda: rest_model.generate_deployment_text(url, api_key, space_id, deployment_id,
+                                                                    {"task": task})
+    else:
+        credentials = {
+            "url": url,
+            "apikey": api_key
+        }
 
-    client = APIClient(credentials)
-    client.set.default_space(space_id)
+        client = APIClient(credentials)
+        client.set.default_space(space_id)
+        generate_text = lambda: client.deployments.generate_text(deployment_id,params={"prompt_variables": {"task": task}})
 
-    generated_response = client.deployments.generate_text(deployment_id,params={"prompt_variables": {"task": task}})
+    # A slow invocation is hedged with a duplicate after the 95th percentile of recent latencies of the
+    # deployment, and transient failures are retried
+    generated_response = resilience.call(generate_text, name="deployment:" + deployment_id, hedge=True)
 
     print("--------------------------Invocation of a prompt template -------------------------------------------")
     print("Task: " + task)
@@ -25,3 +38,23 @@ def invoke_prompt_template(url,api_key,space_id, deployment_id,task):
     print("------------------------------------------------------------------------------------------------------")
 
     return generated_response
+
+def invoke_prompt_template_stream(url,api_key,space_id, deployment_id,task):
+
+    # Same as invoke_prompt_template(), but returns the response as a stream of text chunks
+    print("--------------------------Streamed invocation of a prompt template ----------------------------------")
+    print("Task: " + task)
+    print("------------------------------------------------------------------------------------------------------")
+
+    if rest_model.is_local_url(url):
+        return rest_model.generate_deployment_text_stream(url, api_key, space_id, deployment_id, {"task": task})
+
+    credentials = {
+        "url": url,
+        "apikey": api_key
+    }
+
+    client = APIClient(credentials)
+    client.set.default_space(space_id)
+
+    return client.deployments.generate_text_stream(deployment_id,params={"prompt_variables": {"task": task}})
@@ -0,0 +1,299 @@
+"""
+This code sample is a local stand-in for watsonx.ai, for offline load and performance testing.
+
+It serves the REST endpoints that the scripts in this folder call:
+- POST /identity/token (IBM Cloud IAM)
+- POST /ml/v1/text/generation and /ml/v1/text/generation_stream
+- POST /ml/v1/deployments/{deployment_id}/text/generation and .../generation_stream (prompt templates)
+- GET /ml/v1/foundation_model_specs
+- GET /stub/stats (statistics of the stand-in)
+
+Responses take a configurable time: a time to first token drawn from a log-normal distribution (plus the
+time to read the prompt, if prompt_tokens_per_second is set), then a fixed number of tokens per second.
+A share of the requests can be slow (stragglers), fail with HTTP 500 or be throttled with HTTP 429 and
+Retry-After. Requests above the concurrency quota are throttled as well.
+The generated text is made up, but it's the same for the same prompt.
+
+To use it, start the server, enable the stand-in and set the url in your .env file to the address of the server:
+# pip install fastapi uvicorn
+# python watsonx_stub_server.py --port 8080 --tokens-per-second 30 --throttle-rate 0.02
+# watsonx_stand_in=true
+# url=http://127.0.0.1:8080
+
+When the stand-in is enabled and the url is a local address, the scripts get the access token from the stand-in
+and call the REST API directly (see rest_model.py), because the watsonx.ai SDK only connects to IBM Cloud. For the
+watsonx.governance demo, set auth_url and prompt_url to the addresses of the stand-in.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Settings of the stand-in. They can be changed with command line arguments or by the tests that run it
+config = {
+    # Median time to first token in seconds, and the spread of its log-normal distribution
+    "time_to_first_token": 0.3,
+    "time_to_first_token_sigma": 0.3,
+    "tokens_per_second": 40,
+    # Prompt tokens read per second before the first token (0 - the prompt length doesn't matter).
+    # Prompt tokens are counted as words
+    "prompt_tokens_per_second": 0,
+    # Tokens generated when the request doesn't set max_new_tokens
+    "default_max_new_tokens": 50,
+    # Share of requests that take straggler_latency seconds more
+    "straggler_rate": 0.0,
+    "straggler_latency": 5.0,
+    # Share of requests that fail with HTTP 500
+    "error_rate": 0.0,
+    # Share of requests that are throttled with HTTP 429, and the Retry-After value
+    "throttle_rate": 0.0,
+    "retry_after": 1,
+    # Requests in flight above this number are throttled (0 - no limit)
+    "max_concurrency": 0,
+    # Lifetime of the access tokens issued by the IAM endpoint
+    "token_lifetime": 3600
+}
+
+# Settings that are whole numbers. All other settings are floats, even if their default is a whole number
+INTEGER_SETTINGS = ("default_max_new_tokens", "retry_after", "max_concurrency", "token_lifetime")
+
+# Seconds that start_server() waits for the stand-in to accept requests
+START_TIMEOUT = 10
+
+stats = {
+    "requests": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "throttled": 0,
+    "errors": 0,
+    "tokens_issued": 0,
+    "generated_tokens": 0
+}
+
+WORDS = ("the", "model", "answer", "customer", "review", "loan", "service", "process", "watsonx", "summary",
+         "interest", "rate", "question", "document", "helpful", "response", "data", "team", "result", "time")
+
+app = FastAPI(title="watsonx.ai stand-in")
+
+
+def get_generated_tokens(prompt, max_new_tokens):
+
+    # Made-up text that is the same for the same prompt
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    generator = random.Random(seed)
+
+    return [generator.choice(WORDS) for _ in range(max_new_tokens)]
+
+def get_time_to_first_token(prompt):
+
+    latency = config["time_to_first_token"] * math.exp(random.gauss(0, config["time_to_first_token_sigma"]))
+    if config["prompt_tokens_per_second"]:
+        latency += len(prompt.split()) / config["prompt_tokens_per_second"]
+    if random.random() < config["straggler_rate"]:
+        latency += config["straggler_latency"]
+
+    return latency
+
+def check_request(request):
+
+    # Returns an error response, or None if the request should be served
+    if not request.headers.get("Authorization", "").startswith("Bearer "):
+        return JSONResponse({"errors": [{"code": "authentication_token_not_valid"}]}, status_code=401)
+
+    max_concurrency = config["max_concurrency"]
+    if random.random() < config["throttle_rate"] or (max_concurrency and stats["in_flight"] >= max_concurrency):
+        stats["throttled"] += 1
+        return JSONResponse({"errors": [{"code": "too_many_requests", "message": "Rate limit exceeded"}]},
+                            status_code=429, headers={"Retry-After": str(config["retry_after"])})
+
+    if random.random() < config["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse({"errors": [{"code": "internal_server_error"}]}, status_code=500)
+
+    return None
+
+def get_result(model_id, generated_text, generated_tokens, input_tokens, stop_reason):
+
+    return {
+        "model_id": model_id,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+        "results": [{
+            "generated_text": generated_text,
+            "generated_token_count": generated_tokens,
+            "input_token_count": input_tokens,
+            "stop_reason": stop_reason
+        }]
+    }
+
+def get_prompt_and_tokens(body):
+
+    # The prompt of a deployed prompt template is made of its prompt variables
+    parameters = body.get("parameters") or {}
+    prompt = body.get("input") or json.dumps(parameters.get("prompt_variables", {}), sort_keys=True)
+    max_new_tokens = parameters.get("max_new_tokens") or config["default_max_new_tokens"]
+
+    return prompt, get_generated_tokens(prompt, max_new_tokens)
+
+async def generate(request, model_id):
+
+    stats["requests"] += 1
+    error = check_request(request)
+    if error is not None:
+        return error
+
+    body = await request.json()
+    prompt, tokens = get_prompt_and_tokens(body)
+
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(get_time_to_first_token(prompt) + len(tokens) / config["tokens_per_second"])
+    finally:
+        stats["in_flight"] -= 1
+    stats["generated_tokens"] += len(tokens)
+
+    return JSONResponse(get_result(model_id or body.get("model_id"), " ".join(tokens), len(tokens),
+                                   len(prompt.split()), "max_tokens"))
+
+async def generate_stream(request, model_id):
+
+    stats["requests"] += 1
+    error = check_request(request)
+    if error is not None:
+        return error
+
+    body = await request.json()
+    prompt, tokens = get_prompt_and_tokens(body)
+    model_id = model_id or body.get("model_id")
+
+    # Server-sent events, one token per event, like watsonx.ai
+    async def events():
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(get_time_to_first_token(prompt))
+            for index, token in enumerate(tokens):
+                if index:
+                    await asyncio.sleep(1 / config["tokens_per_second"])
+                stop_reason = "max_tokens" if index == len(tokens) - 1 else "not_finished"
+                result = get_result(model_id, (" " if index else "") + token, index + 1, len(prompt.split()),
+                                    stop_reason)
+                stats["generated_tokens"] += 1
+                yield f"id: {index + 1}\nevent: message\ndata: {json.dumps(result)}\n\n"
+        finally:
+            stats["in_flight"] -= 1
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/identity/token")
+async def get_token(request: Request):
+
+    form = await request.form()
+    if not form.get("apikey"):
+        return JSONResponse({"errorCode": "BXNIM0415E", "errorMessage": "Provided API key could not be found"},
+                            status_code=400)
+
+    stats["tokens_issued"] += 1
+    now = int(time.time())
+
+    return {
+        "access_token": f"stub-token-{stats['tokens_issued']}",
+        "refresh_token": "not_supported",
+        "token_type": "Bearer",
+        "expires_in": config["token_lifetime"],
+        "expiration": now + config["token_lifetime"]
+    }
+
+@app.post("/ml/v1/text/generation")
+async def text_generation(request: Request):
+
+    return await generate(request, None)
+
+@app.post("/ml/v1/text/generation_stream")
+async def text_generation_stream(request: Request):
+
+    return await generate_stream(request, None)
+
+@app.post("/ml/v1/deployments/{deployment_id}/text/generation")
+async def deployment_text_generation(deployment_id: str, request: Request):
+
+    return await generate(request, "deployment/" + deployment_id)
+
+@app.post("/ml/v1/deployments/{deployment_id}/text/generation_stream")
+async def deployment_text_generation_stream(deployment_id: str, request: Request):
+
+    return await generate_stream(request, "deployment/" + deployment_id)
+
+@app.get("/ml/v1/foundation_model_specs")
+async def foundation_model_specs():
+
+    model_ids = ["google/flan-ul2", "ibm/granite-13b-instruct-v2", "meta-llama/llama-2-70b-chat",
+                 "elyza/elyza-japanese-llama-2-7b-instruct"]
+
+    return {"total_count": len(model_ids), "resources": [{"model_id": model_id} for model_id in model_ids]}
+
+@app.get("/stub/stats")
+async def get_stats():
+
+    return stats
+
+def start_server(port, host="127.0.0.1"):
+
+    # Runs the stand-in in a background thread of this process (for load tests and benchmarks).
+    # Set server.should_exit = True to stop it
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    errors = []
+
+    def run():
+        try:
+            server.run()
+        except BaseException as e:
+            # uvicorn exits (SystemExit) if it can't bind the port
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while not server.started:
+        if not thread.is_alive():
+            cause = errors[0] if errors else None
+            raise RuntimeError(f"The stand-in could not start on {host}:{port}") from cause
+        if time.monotonic() > deadline:
+            server.should_exit = True
+            raise TimeoutError(f"The stand-in did not start on {host}:{port} within {START_TIMEOUT} seconds")
+        time.sleep(0.05)
+
+    return server
+
+def add_config_arguments(parser):
+
+    # One command line argument per setting, for example --time-to-first-token 0.5
+    for name, value in config.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=int if name in INTEGER_SETTINGS else float,
+                            default=value)
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Local stand-in for watsonx.ai")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_config_arguments(parser)
+    arguments = parser.parse_args()
+
+    for name in config:
+        config[name] = getattr(arguments, name)
+
+    uvicorn.run(app, host=arguments.host, port=arguments.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ This code sample shows how to invoke prompt templates deployed in watsonx
 
 import requests, json
 
+# Caches the IAM access token and reuses connections for all prompt invocations
+import watsonx_session
+
 # Replace with your IBM Cloud API key
 cloud_api_key = ''
 # In most cases the URL for authentication should be this value.
@@ -17,32 +20,14 @@ prompt_url = ''
 
 def get_credentials():
 
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Accept': 'application/json',
-    }
-    data = {
-        'grant_type': 'urn:ibm:params:oauth:grant-type:apikey',
-        'apikey': cloud_api_key,
-    }
-    # Use the requests library to make the HTTP request
-    response = requests.post(auth_url, headers=headers, data=data, verify=False)
-
-    # Check if the request was successful (status code 200)
-    if response.status_code == 200:
-        # Parse the JSON response
-        json_data = response.json()
-
-        # Access the token from the JSON data
-        access_token = json_data.get('access_token', None)
-
-        if access_token:
-            print(f'The access token is: {access_token}')
-        else:
-            print('Access token not found in the JSON response.')
-    else:
-        print(f'Request failed with status code: {response.status_code}')
-        print(f'Response content: {response.text}')
+    # The access token is cached by the process until shortly before it expires,
+    # so only the first invocation waits for authentication
+    try:
+        access_token = watsonx_session.get_token(cloud_api_key, auth_url, verify=False)
+        print(f'The access token is: {access_token}')
+    except (requests.exceptions.RequestException, KeyError) as e:
+        print(f'Request failed: {str(e)}')
+        access_token = None
 
     return access_token
 
@@ -62,8 +47,8 @@ def invoke_prompt(access_token):
         }
     }
 
-    # Use the requests library to make the HTTP request
-    response = requests.post(prompt_url, headers=headers, json=data)
+    # The shared session reuses an open connection instead of opening a new TCP/TLS connection for every call
+    response = watsonx_session.post(prompt_url, headers=headers, json=data)
 
     # Check if the request was successful (status code 200)
     if response.status_code == 200:
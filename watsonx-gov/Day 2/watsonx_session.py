@@ -0,0 +1,68 @@
+"""
+This code sample shows how to reuse IAM access tokens and HTTP connections when invoking prompt templates.
+
+Requesting a new IAM token and opening a new TCP/TLS connection for every invocation adds two round trips
+to every request. This module keeps one access token per API key until shortly before it expires, and one
+requests.Session whose connection pool is shared by all invocations of the process.
+The watsonx.ai lab scripts have a full version with background refresh and metrics (iam_token.py,
+http_transport.py in watsonx-ai/lab_files/scripts).
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+IAM_URL = "https://iam.cloud.ibm.com/identity/token"
+# Tokens that expire within this many seconds are requested again
+EXPIRY_SAFETY_MARGIN = 60
+# Connections kept open per host
+POOL_SIZE = 10
+TIMEOUT = (10, 120)
+
+# Cached tokens, keyed by the API key and IAM URL: (access token, expiration time)
+tokens = {}
+# Held while a token is requested, so that concurrent callers send only one request
+tokens_lock = threading.Lock()
+
+# Session shared by the process - created in get_session()
+shared_session = None
+shared_session_lock = threading.Lock()
+
+def get_token(api_key, iam_url=IAM_URL, verify=True):
+
+    with tokens_lock:
+        access_token, expiration = tokens.get((api_key, iam_url), (None, 0))
+        if access_token and time.time() < expiration - EXPIRY_SAFETY_MARGIN:
+            return access_token
+
+        response = get_session().post(
+            iam_url,
+            headers={"Content-Type": "application/x-www-form-urlencoded", "Accept": "application/json"},
+            data={"grant_type": "urn:ibm:params:oauth:grant-type:apikey", "apikey": api_key},
+            verify=verify)
+        response.raise_for_status()
+        token = response.json()
+        tokens[(api_key, iam_url)] = (token["access_token"], token["expiration"])
+
+        return token["access_token"]
+
+def get_session():
+
+    if shared_session is None:
+        with shared_session_lock:
+            if globals()["shared_session"] is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                globals()["shared_session"] = session
+
+    return shared_session
+
+def post(url, **kwargs):
+
+    # POST through the shared connection pool
+    kwargs.setdefault("timeout", TIMEOUT)
+    return get_session().post(url, **kwargs)